@@ -1,7 +1,13 @@
+import asyncio
 import os
+import time
+
+import aiohttp
 import requests
 import logging
 
+from lookup_cache import get_lookup_cache, normalize_query
+
 # Ensure logging is configured the same as main.py
 logging.basicConfig(
     level=logging.INFO,
@@ -10,15 +16,24 @@ logging.basicConfig(
 
 API_NINJAS_TOKEN = os.getenv("API_NINJAS_TOKEN")
 API_NINJAS_CARS_URL = "https://api.api-ninjas.com/v1/cars"
+# Клиентский лимит запросов асинхронного клиента: в секунду и размер всплеска
+API_NINJAS_RATE = float(os.getenv("API_NINJAS_RATE", 5))
+API_NINJAS_BURST = int(os.getenv("API_NINJAS_BURST", 5))
+API_NINJAS_TIMEOUT = float(os.getenv("API_NINJAS_TIMEOUT", 10))
 
 
 def get_car_info_from_ninjas(description: str):
     """
     Uses API Ninjas Cars API to get car brand and model by description.
     Returns a dict with 'make' and 'model' if found, else None.
+    Answers are taken from / stored in the lookup cache when it is enabled.
     """
-    print(f"[TEST] Query: {description}")
-    logging.info(f"[TEST] Query: {description}")
+    logging.debug(f"[API NINJAS] Lookup: {description}")
+    cache = get_lookup_cache()
+    if cache is not None:
+        hit, info = cache.get(description)
+        if hit:
+            return info
     if not API_NINJAS_TOKEN:
         raise ValueError("API_NINJAS_TOKEN is not set in environment")
 
@@ -31,10 +46,167 @@ def get_car_info_from_ninjas(description: str):
     logging.info(f"[API NINJAS RESPONSE] Status: {response.status_code}, Body: {response.text}")
 
     if response.status_code == 200:
-        data = response.json()
-        if data:
-            # API returns a list of dicts with keys like 'make', 'model', etc.
-            return {"make": data[0].get("make"), "model": data[0].get("model")}
-        return None
+        # API returns a list of dicts with keys like 'make', 'model', etc.
+        info = _car_info(response.json())
     else:
-        return None
+        info = None
+    _remember(description, response.status_code, info)
+    return info
+
+
+def _car_info(data) -> dict | None:
+    if data:
+        return {"make": data[0].get("make"), "model": data[0].get("model")}
+    return None
+
+
+# Ответы "не найдено", которые можно кэшировать как промах. 401/403 (токен), 429 (лимит)
+# и 5xx — временные: с ними запрос повторяется, а не блокируется на negative_ttl
+_NOT_FOUND_STATUSES = frozenset((400, 404))
+
+
+def _remember(description: str, status: int, info: dict | None):
+    # Найденное и пустой ответ 200 кэшируются, 400/404 — как промах, остальное — нет
+    cache = get_lookup_cache()
+    if cache is not None and (status == 200 or status in _NOT_FOUND_STATUSES):
+        cache.put(description, info)
+
+
+class RateLimiter:
+    """Token bucket: в среднем rate запросов в секунду, всплеск до burst подряд."""
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = None
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Ожидающие выстраиваются в очередь, токены выдаются по порядку
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class NinjasClient:
+    """
+    Асинхронный клиент API Ninjas для event loop бота.
+
+    Все запросы идут через одну aiohttp-сессию с keep-alive, одинаковые
+    (с точностью до регистра и пробелов) одновременные запросы ждут один
+    и тот же ответ, а RateLimiter держит темп ниже лимитов API.
+    Ответ — как у get_car_info_from_ninjas: {"make", "model"} или None.
+    """
+
+    def __init__(self, token: str = None, url: str = API_NINJAS_CARS_URL, rate: float = API_NINJAS_RATE,
+                 burst: int = API_NINJAS_BURST, timeout: float = API_NINJAS_TIMEOUT, max_connections: int = 4):
+        self.token = token if token is not None else API_NINJAS_TOKEN
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._rate = rate
+        self._burst = burst
+        self._session = None
+        self._loop = None
+        self._limiter = None
+        self._inflight = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            # Закрыть чужую сессию из этого loop нельзя, а бросить — значит потерять её соединения
+            raise RuntimeError("NinjasClient is bound to another event loop; close() it there first")
+        if self._session is None or self._session.closed:
+            # Сессия и очередь ожидания привязаны к event loop, в котором созданы
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"X-Api-Key": self.token or ""},
+            )
+            self._loop = loop
+            self._limiter = RateLimiter(self._rate, self._burst)
+            self._inflight = {}
+        return self._session
+
+    async def get_car_info(self, description: str) -> dict | None:
+        cache = get_lookup_cache()
+        if cache is not None:
+            # SQLite — в пуле потоков, чтобы не блокировать event loop
+            hit, info = await asyncio.to_thread(cache.get, description)
+            if hit:
+                return info
+        if not self.token:
+            raise ValueError("API_NINJAS_TOKEN is not set in environment")
+        self._ensure_session()
+        key = normalize_query(description)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(description))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(task)
+
+    async def _fetch(self, description: str) -> dict | None:
+        session = self._ensure_session()
+        await self._limiter.acquire()
+        self.requests += 1
+        logging.info(f"[API NINJAS REQUEST] Query: {description}")
+        try:
+            async with session.get(self.url, params={"limit": 1, "query": description}) as response:
+                body = await response.text()
+                logging.info(f"[API NINJAS RESPONSE] Status: {response.status}, Body: {body}")
+                info = _car_info(await response.json(content_type=None)) if response.status == 200 else None
+                await asyncio.to_thread(_remember, description, response.status, info)
+                return info
+        except Exception:
+            self.errors += 1
+            raise
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "coalesced": self.coalesced, "errors": self.errors,
+                "inflight": len(self._inflight)}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+_client = None
+
+
+def get_ninjas_client() -> NinjasClient:
+    """Общий асинхронный клиент процесса."""
+    global _client
+    if _client is None:
+        _client = NinjasClient()
+    return _client
+
+
+async def close_ninjas_client():
+    if _client is not None:
+        await _client.close()
@@ -0,0 +1,357 @@
+"""
+Микробенчмарк парсера объявлений.
+
+Прогоняет parse_car_text и каждую стратегию _try_*_parse по версионированному
+корпусу (примеры из test_parser.py / test_unstructured.py + синтетические
+варианты), считает перцентили задержек по стратегиям и полям, сообщения
+в секунду и аллокации. Результат печатается и, при --json, сохраняется
+в машиночитаемом виде для сравнения веток:
+
+    python bench_parser.py --json bench.json
+    python bench_parser.py --repeat 20 --synthetic 500 --json bench.json
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import parser as car_parser
+from brand_index import get_brand_index
+from line_classifier import _COMPILED_EXTRACTORS, classify_lines
+from regex_registry import disable_regex_stats, enable_regex_stats, regex_stats
+
+# Увеличивать при любом изменении BASE_MESSAGES или генератора вариантов
+CORPUS_VERSION = 1
+
+BASE_MESSAGES = [
+    """Доступен к покупке‼️
+🔹Geely Coolray
+    260T Battle
+🔹Год: 10/2020
+🔹Пробег: 35.000km
+✅ Родная краска
+✅ Максималка
+✅ Подогревы
+⚙️ДВС: 1.5Т 177 л.с.
+🔩Трансмиссия: DCT7
+🛞Привод: Передний
+💸Цена под ключ в РФ:
+    1.414.000 руб.""",
+    """VIP минивэн от VW👍👍
+‼️Доступен к покупке‼️
+🔹Volkswagen Viloran
+     Luxury Edition
+🔹Год: 10/2021
+🔹Пробег: 45.000km
+✅ Родная краска
+⚙️ДВС: 2.0 TSI 190 л.с.
+🔩Трансмиссия: DSG7
+🛞Привод: Передний
+💸Цена под ключ в РФ:
+     2.880.000 руб.""",
+    """Автомобиль в наличии ( в Пути )❗️
+👌Выкуплен нашей компанией и доступен к покупке!
+🚗MERCEDES BENZ C CLASS 2016
+⚙️ДВС: 1600сс бензин
+⚙️Трансмиссия: АВТОМАТ
+🛞Привод: Задний привод
+✅Оценка: 4 балла
+✅Пробег: 111.000км
+✅Комплектация: C180 Coupe Sports +
+💸Итоговая стоимость под ключ: 1.690.000₽""",
+    """‼️Доступен к покупке‼️
+🔹BYD 宋 Song Pro
+    110Km Flagship Pro
+🔹Год: 03/2022
+🔹Пробег: 3.000Km!!!
+✅ Родная краска
+✅ Максималка
+✅ Как новая
+✅ Автопилот
+✅Подогревы
+⚙️ДВС: 1.5 110 л.с.
+🔋Установка 197 л.с.
+🔩Трансмиссия:       Планетарка
+🛞Привод: Передний
+💸Цена под ключ в РФ:
+    1.736.000 руб.""",
+    """Марка: Volkswagen Touareg
+Модель: 2.0TSI R-Line (версия Ruiyi)
+Год выпуска: октябрь 2020
+Пробег: 65 000 км
+Двигатель: 2.0T, 245 л.с., полный привод (4WD)
+Дополнительно: отличное состояние, постоянный полный привод
+Цена FOB Хоргос: $28.500 долларов США""",
+    """Lynk&Co 09 MHEV 7 мест
+
+В НАЛИЧИИ в Москве новый автомобиль
+Стоимость 5.100.000 с коммерческим утильсбором
+
+Платформа SPA (на ней же VOLVO XC90)
+Двигатель VEA (VOLVO ENGINE ARCHITECTURE)
+Двигатель 2.0Т - 254 лс
+АКПП - 8ст автомат - AISIN
+Полный привод - Haldex
+Бак - 70 литров
+Средний расход по Москве 10,9 (проверено лично)
+7 мест
+МА - запуск двигателя с телефона
+Есть лимитер - до 180 км/ч
+Адаптивный круиз с удержанием в полосе - до 130 км/ч
+Адаптивный круиз - до 150 км/ч""",
+    """Бренд: Audi A8 (импорт)
+Модель: A8L 50 TFSI quattro Premium Edition
+Год выпуска: июнь 2022 года
+Пробег: 35,000 км
+Двигатель: 3.0T, 286 л.с., полный привод
+Дополнительно: отличное состояние, постоянный полный привод
+FOB Хоргос-цена: $52,300 долларов США""",
+    """Li 8 Pro
+2023/07
+Black/orange
+Без зарядной станции, можно докупить отдельно за 450$
+Машина в Хоргосе
+Пробег 22.000км
+Без окрасов
+Цена 💲 34.500""",
+    """Стоимость – 5 700 000 руб.
+(Коммерческий утиль)
+
+Новый авто
+2024 г.в.
+Максимальная комплектация, рестайлинг!
+555 лс
+Полный привод
+Параллельный гибрид (двигатель напрямую подключается к колесам через редуктор)
+6 мест
+Запас хода на чистом электричестве - 160км батарея 40 кВтч
+Пневмоподвеска""",
+    "Марка: Mercedes-Benz S-Class (импорт)\nМодель: S 450 L 4MATIC",
+    "Марка: BMW 4 Series\nМодель: 430i Gran Coupe M Sport Night Edition",
+    "Mercedes-Benz E-Class E 300 2.0T Avantgarde",
+    "BMW X5 xDrive30d M Sport",
+    "Toyota Camry 2.5L Prestige Safety",
+    "Lexus RX 350 AWD Luxury",
+    "Volvo XC90 T6 AWD Inscription",
+]
+
+# Заготовки для синтетических вариантов в формате эмодзи-списка
+_SYNTH_CARS = [
+    "Geely Monjaro 2.0T Flagship", "Haval Jolion 1.5T Premium", "Kia Sportage 2.0 MPI Luxe",
+    "Toyota Land Cruiser 300 GR Sport", "Chery Tiggo 8 Pro Max", "Tesla Model Y Long Range",
+    "Hyundai Santa Fe 2.5 Prestige", "Nissan X-Trail e-Power", "Audi Q7 55 TFSI", "Zeekr 001 YOU",
+]
+_SYNTH_DRIVES = ["Передний", "Задний", "Полный", "4WD", "AWD"]
+_SYNTH_GEARS = ["DCT7", "DSG7", "АКПП 8", "Вариатор", "Робот"]
+_SYNTH_CURRENCIES = ["руб.", "₽", "$", "USD", "€"]
+
+
+def _thousands(value: int, sep: str) -> str:
+    return f"{value:,}".replace(",", sep)
+
+
+def build_corpus(synthetic: int = 200, seed: int = CORPUS_VERSION) -> list[str]:
+    """Базовые примеры + детерминированные синтетические варианты."""
+    rng = random.Random(seed)
+    corpus = list(BASE_MESSAGES)
+    for _ in range(synthetic):
+        sep = rng.choice([".", " ", " ", ","])
+        lines = [
+            rng.choice(["‼️Доступен к покупке‼️", "В наличии", "🔥Свежее поступление"]),
+            f"🔹{rng.choice(_SYNTH_CARS)}",
+            f"🔹Год: {rng.randint(1, 12):02d}/{rng.randint(2015, 2025)}",
+            f"🔹Пробег: {_thousands(rng.randint(1, 200) * 1000, sep)}km",
+            f"⚙️ДВС: {rng.choice(['1.5T', '2.0T', '2.5', '3.0T'])} {rng.randint(110, 400)} л.с.",
+            f"🔩Трансмиссия: {rng.choice(_SYNTH_GEARS)}",
+            f"🛞Привод: {rng.choice(_SYNTH_DRIVES)}",
+            f"💸Цена под ключ в РФ: {_thousands(rng.randint(900, 9000) * 1000, sep)} {rng.choice(_SYNTH_CURRENCIES)}",
+        ]
+        rng.shuffle(lines[2:])
+        corpus.append("\n".join(lines))
+    return corpus
+
+
+def corpus_hash(corpus: list[str]) -> str:
+    digest = hashlib.sha256()
+    for text in corpus:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def percentiles(samples: list[float]) -> dict:
+    """Перцентили задержек в микросекундах."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_us": round(sum(ordered) / len(ordered) * 1e6, 2),
+        "p50_us": pick(0.50),
+        "p90_us": pick(0.90),
+        "p99_us": pick(0.99),
+        "max_us": round(ordered[-1] * 1e6, 2),
+    }
+
+
+def _time_calls(func, corpus, repeat):
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            for text in corpus:
+                start = time.perf_counter()
+                func(text)
+                samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _allocations(func, corpus) -> dict:
+    """Аллокации за один проход по корпусу (tracemalloc)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            for text in corpus:
+                func(text)
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    allocated = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    return {
+        "peak_bytes": peak,
+        "retained_bytes_per_msg": round(allocated / len(corpus), 1),
+        "retained_blocks_per_msg": round(blocks / len(corpus), 2),
+    }
+
+
+def _field_extractors(field):
+    extractors = [(regex, keywords) for _, f, regex, keywords in _COMPILED_EXTRACTORS if f == field]
+
+    def run(text):
+        for line in text.splitlines():
+            line = line.strip()
+            lower = line.lower()
+            for regex, keywords in extractors:
+                if any(k in lower for k in keywords):
+                    regex.search(line)
+    return run
+
+
+def collect_regex_stats(corpus) -> list[dict]:
+    """Отдельный проход parse_car_text со счётчиками паттернов (на замеры задержек не влияет)."""
+    enable_regex_stats()
+    try:
+        _time_calls(lambda t: car_parser.parse_car_text(t, return_failures=True), corpus, 1)
+        return regex_stats()
+    finally:
+        disable_regex_stats()
+
+
+def strategy_functions(index) -> dict:
+    """Замеряемые функции: полный parse_car_text и каждая стратегия по отдельности."""
+    return {
+        "parse_car_text": lambda t: car_parser.parse_car_text(t, return_failures=True, index=index),
+        "classify_lines": classify_lines,
+        "_try_structured_parse": lambda t: car_parser._try_structured_parse(t, index),
+        "_try_emoji_format_parse": lambda t: car_parser._try_emoji_format_parse(t, index),
+        "_try_lynk_format_parse": lambda t: car_parser._try_lynk_format_parse(t, index),
+        "_try_unstructured_specs_parse": lambda t: car_parser._try_unstructured_specs_parse(t, index),
+        "improved_brand_model_parse": lambda t: car_parser.improved_brand_model_parse(
+            t.splitlines()[0] if t.strip() else t, index),
+    }
+
+
+def run_benchmark(repeat: int = 5, synthetic: int = 200, with_regex_stats: bool = False) -> dict:
+    index = get_brand_index()  # словари грузятся до замеров
+    corpus = build_corpus(synthetic)
+
+    strategies = strategy_functions(index)
+    fields = sorted({field for _, field, _, _ in _COMPILED_EXTRACTORS})
+
+    report = {
+        "corpus": {
+            "version": CORPUS_VERSION,
+            "messages": len(corpus),
+            "synthetic": synthetic,
+            "sha256": corpus_hash(corpus),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "repeat": repeat,
+        "strategies": {},
+        "fields": {},
+    }
+
+    for name, func in strategies.items():
+        samples = _time_calls(func, corpus, repeat)
+        entry = percentiles(samples)
+        entry["msgs_per_sec"] = round(len(samples) / sum(samples), 1)
+        entry["allocations"] = _allocations(func, corpus)
+        report["strategies"][name] = entry
+
+    for field in fields:
+        report["fields"][field] = percentiles(_time_calls(_field_extractors(field), corpus, repeat))
+
+    if with_regex_stats:
+        report["regex"] = collect_regex_stats(corpus)
+
+    return report
+
+
+def print_report(report: dict):
+    corpus = report["corpus"]
+    print(f"Corpus v{corpus['version']} ({corpus['messages']} messages, sha256 {corpus['sha256']}), "
+          f"repeat={report['repeat']}")
+    print(f"\n{'strategy':32} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'msg/s':>10} {'B/msg':>9}")
+    for name, entry in report["strategies"].items():
+        print(f"{name:32} {entry['p50_us']:>9} {entry['p90_us']:>9} {entry['p99_us']:>9} "
+              f"{entry['msgs_per_sec']:>10} {entry['allocations']['retained_bytes_per_msg']:>9}")
+    print(f"\n{'field':32} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9}")
+    for name, entry in report["fields"].items():
+        print(f"{name:32} {entry['p50_us']:>9} {entry['p90_us']:>9} {entry['p99_us']:>9}")
+    if "regex" in report:
+        print(f"\n{'regex (top 15 by time)':32} {'tries':>9} {'hits':>9} {'total us':>10}")
+        for row in report["regex"][:15]:
+            print(f"{row['name']:32} {row['tries']:>9} {row['hits']:>9} {row['total_us']:>10}")
+        dead = [row["name"] for row in report["regex"] if row["tries"] and not row["hits"]]
+        if dead:
+            print(f"Never matched on this corpus: {', '.join(dead)}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Parser micro-benchmark")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="проходов по корпусу")
+    arg_parser.add_argument("--synthetic", type=int, default=200, help="синтетических сообщений в корпусе")
+    arg_parser.add_argument("--json", dest="json_path", help="куда сохранить отчёт в JSON")
+    arg_parser.add_argument("--regex-stats", action="store_true", help="счётчики попыток/совпадений паттернов")
+    args = arg_parser.parse_args(argv)
+
+    report = run_benchmark(repeat=args.repeat, synthetic=args.synthetic, with_regex_stats=args.regex_stats)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nJSON report saved to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
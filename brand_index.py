@@ -0,0 +1,370 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from brand_matcher import BrandMatcher
+from fuzzy_index import FuzzyResolver
+from model_patterns import ModelPatterns
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BRANDS_FILE = os.path.join(BASE_DIR, "brands.txt")
+MODELS_FILE = os.path.join(BASE_DIR, "models.txt")
+SNAPSHOT_FILE = os.path.join(BASE_DIR, "brand_index.pickle")
+
+# Увеличивать при несовместимых изменениях BrandIndex / BrandMatcher / ModelPatterns / FuzzyResolver
+SNAPSHOT_FORMAT = 4
+
+
+def load_brand_list(filepath=BRANDS_FILE) -> list[str]:
+    # Only return canonical brand names and synonyms, skip mapping lines
+    result = []
+    with open(filepath, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if '=' in line:
+                left, right = [x.strip() for x in line.split('=', 1)]
+                # Add both left (synonym) and right (canonical) for matching
+                result.append(left)
+                result.append(right)
+            else:
+                result.append(line)
+    return result
+
+
+def load_brand_map(filepath=BRANDS_FILE) -> dict:
+    """Returns a mapping from each synonym/variant to canonical brand (first occurrence wins)."""
+    brand_map = {}
+
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            # Format: synonym_or_variant = Canonical Brand Name
+            if '=' in line:
+                variant, canonical = [x.strip() for x in line.split('=', 1)]
+                variants = [variant, canonical]
+            else:
+                canonical = line
+                variants = [line]
+
+            # Map each variant (lowercase) to the canonical brand (proper case)
+            for variant in variants:
+                variant_lower = variant.lower()
+                if variant_lower not in brand_map:  # First occurrence wins
+                    brand_map[variant_lower] = canonical  # Store original case
+    except Exception as e:
+        print(f"Error loading brand map: {e}")
+
+    return brand_map
+
+
+def load_model_patterns(filepath=MODELS_FILE) -> dict:
+    """
+    Load model patterns from a configuration file.
+    Returns a dictionary mapping brands to their model patterns.
+
+    Format in the file:
+    brand:pattern_type:pattern_regex
+    """
+    model_patterns = defaultdict(dict)
+
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = line.split(":", 2)  # Split into at most 3 parts
+            if len(parts) < 2:
+                continue
+
+            brand = parts[0].lower()
+            pattern_type = parts[1]
+
+            # Handle the 'default' pattern type (a flag rather than a pattern)
+            if pattern_type == "default":
+                model_patterns[brand]["default"] = True
+                continue
+
+            # Get the pattern regex if provided
+            pattern = parts[2] if len(parts) > 2 else ""
+
+            # Initialize the pattern type if not already in the dict
+            if pattern_type not in model_patterns[brand]:
+                model_patterns[brand][pattern_type] = []
+
+            model_patterns[brand][pattern_type].append(pattern)
+    except Exception as e:
+        print(f"Error loading model patterns: {e}")
+
+    return model_patterns
+
+
+@dataclass(frozen=True)
+class BrandIndex:
+    """
+    Неизменяемый индекс брендов и моделей, собранный из brands.txt и models.txt.
+
+    brands        -- канонические названия брендов без повторов
+    variants      -- все варианты написания (синонимы и канонические) без повторов
+    brand_map     -- вариант в нижнем регистре -> канонический бренд
+    match_order   -- варианты, отсортированные от длинных к коротким
+    matcher       -- автомат для поиска вариантов в тексте (см. brand_matcher)
+    model_patterns -- бренд в нижнем регистре -> скомпилированные ModelPatterns
+    fuzzy         -- нечёткий поиск брендов и моделей для опечаток (см. fuzzy_index)
+    version       -- хэш содержимого словарей; меняется при любой правке файлов
+    """
+    brands: tuple[str, ...]
+    variants: tuple[str, ...]
+    brand_map: Mapping[str, str]
+    match_order: tuple[str, ...]
+    matcher: BrandMatcher
+    model_patterns: Mapping[str, ModelPatterns]
+    fuzzy: FuzzyResolver = None
+    version: str = ""
+
+    def canonical(self, brand: str) -> str:
+        """Каноническое имя бренда (как в brands.txt) или сам бренд, если он неизвестен."""
+        return self.brand_map.get(brand.lower(), brand)
+
+    def __reduce__(self):
+        # MappingProxyType не сериализуется pickle — сохраняем обычные словари
+        return _restore_brand_index, (self.brands, self.variants, dict(self.brand_map), self.match_order,
+                                      self.matcher, dict(self.model_patterns), self.fuzzy, self.version)
+
+
+def _restore_brand_index(brands, variants, brand_map, match_order, matcher, model_patterns, fuzzy,
+                         version) -> BrandIndex:
+    return BrandIndex(
+        brands=brands,
+        variants=variants,
+        brand_map=MappingProxyType(brand_map),
+        match_order=match_order,
+        matcher=matcher,
+        model_patterns=MappingProxyType(model_patterns),
+        fuzzy=fuzzy,
+        version=version,
+    )
+
+
+def dictionary_version(*paths) -> str:
+    """Короткий sha256 содержимого файлов словарей (отсутствующий файл считается пустым)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def build_brand_index(brands_path=BRANDS_FILE, models_path=MODELS_FILE) -> BrandIndex:
+    """Читает словари с диска и собирает BrandIndex."""
+    variants = tuple(dict.fromkeys(load_brand_list(brands_path)))
+    brand_map = load_brand_map(brands_path)
+    brands = tuple(dict.fromkeys(brand_map.values()))
+
+    # sorted() стабилен: при равной длине сохраняется порядок из brands.txt
+    match_order = tuple(sorted(variants, key=lambda x: -len(x)))
+
+    model_patterns = {
+        brand: ModelPatterns(patterns)
+        for brand, patterns in load_model_patterns(models_path).items()
+    }
+
+    return BrandIndex(
+        brands=brands,
+        variants=variants,
+        brand_map=MappingProxyType(brand_map),
+        match_order=match_order,
+        matcher=BrandMatcher(match_order, variants),
+        model_patterns=MappingProxyType(model_patterns),
+        fuzzy=FuzzyResolver(variants, brand_map, model_patterns),
+        version=dictionary_version(brands_path, models_path),
+    )
+
+
+def save_brand_index_snapshot(index: BrandIndex, path=SNAPSHOT_FILE):
+    """
+    Сохраняет собранный индекс в бинарный снимок рядом со словарями.
+    В снимке хранится версия (хэш содержимого исходных файлов), по которой
+    load_brand_index_snapshot решает, можно ли им пользоваться.
+    """
+    payload = {"format": SNAPSHOT_FORMAT, "version": index.version, "index": index}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_brand_index_snapshot(path=SNAPSHOT_FILE, version: str = None) -> BrandIndex | None:
+    """
+    Загружает индекс из снимка, если он есть и собран из текущих словарей.
+    version -- ожидаемая версия словарей (по умолчанию считается по BRANDS_FILE и MODELS_FILE).
+    Возвращает None, если снимка нет, он устарел или не читается.
+    """
+    if not os.path.exists(path):
+        return None
+    if version is None:
+        version = dictionary_version(BRANDS_FILE, MODELS_FILE)
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except Exception as e:
+        logging.warning(f"[BRAND INDEX] Snapshot {path} is unreadable, rebuilding from text files: {e}")
+        return None
+    if payload.get("format") != SNAPSHOT_FORMAT or payload.get("version") != version:
+        logging.info(f"[BRAND INDEX] Snapshot {path} is stale, rebuilding from text files")
+        return None
+    return payload["index"]
+
+
+def build_brand_index_snapshot(path=SNAPSHOT_FILE) -> BrandIndex:
+    """Шаг сборки: индекс из текстовых словарей -> снимок (см. Dockerfile)."""
+    index = build_brand_index(BRANDS_FILE, MODELS_FILE)
+    save_brand_index_snapshot(index, path)
+    return index
+
+
+_brand_index = None
+_index_lock = threading.Lock()
+_index_stamp = None
+_index_status = {"version": None, "generation": 0, "loaded_at": None, "build_seconds": None}
+_watcher = None
+_watcher_stop = threading.Event()
+
+
+def _sources_stamp() -> tuple:
+    """(mtime_ns, size) файлов словарей — дешёвая проверка перед хэшированием."""
+    stamp = []
+    for path in (BRANDS_FILE, MODELS_FILE):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def _install(index: BrandIndex, stamp: tuple, build_seconds: float):
+    global _brand_index, _index_stamp
+    # Подмена одной ссылкой: парсинг, уже получивший индекс, доработает на старой версии
+    _brand_index = index
+    _index_stamp = stamp
+    _index_status.update(
+        version=index.version,
+        generation=_index_status["generation"] + 1,
+        loaded_at=time.time(),
+        build_seconds=round(build_seconds, 4),
+    )
+
+
+def get_brand_index() -> BrandIndex:
+    """Общий индекс брендов: собирается при первом обращении и далее переиспользуется."""
+    index = _brand_index
+    if index is None:
+        with _index_lock:
+            if _brand_index is None:
+                stamp = _sources_stamp()
+                start = time.perf_counter()
+                # Холодный старт: снимок, если он соответствует словарям, иначе сборка из текста
+                index = load_brand_index_snapshot(SNAPSHOT_FILE) or build_brand_index(BRANDS_FILE, MODELS_FILE)
+                _install(index, stamp, time.perf_counter() - start)
+            index = _brand_index
+    return index
+
+
+def reload_brand_index(force: bool = False) -> bool:
+    """
+    Пересобирает индекс, если brands.txt или models.txt изменились
+    (сначала сверяются mtime и размер, затем хэш содержимого), и атомарно
+    подменяет общий. force=True — пересобрать без проверок.
+    Возвращает True, если подключена новая версия.
+    """
+    global _index_stamp
+    with _index_lock:
+        stamp = _sources_stamp()
+        current = _brand_index
+        if not force and current is not None:
+            if stamp == _index_stamp:
+                return False
+            if dictionary_version(BRANDS_FILE, MODELS_FILE) == current.version:
+                _index_stamp = stamp
+                return False
+
+        start = time.perf_counter()
+        try:
+            index = build_brand_index(BRANDS_FILE, MODELS_FILE)
+        except Exception as e:
+            logging.error(f"[BRAND INDEX] Reload failed, keeping version {_index_status['version']}: {e}")
+            return False
+        # Недописанный или пустой файл не должен оставить бота без словаря
+        if current is not None and not index.brands:
+            logging.warning("[BRAND INDEX] New dictionary has no brands, keeping the current one")
+            return False
+        _install(index, stamp, time.perf_counter() - start)
+
+    logging.info(f"[BRAND INDEX] Loaded version {index.version} "
+                 f"(generation {_index_status['generation']}, {_index_status['build_seconds']}s)")
+    return True
+
+
+def brand_index_status() -> dict:
+    """Версия (хэш словарей), номер поколения, время загрузки и длительность сборки текущего индекса."""
+    return dict(_index_status)
+
+
+def _watch(interval: float):
+    while not _watcher_stop.wait(interval):
+        try:
+            reload_brand_index()
+        except Exception as e:
+            logging.error(f"[BRAND INDEX] Watcher error: {e}")
+
+
+def start_brand_index_watcher(interval: float = 30.0) -> threading.Thread:
+    """Фоновый поток, раз в interval секунд проверяющий словари на изменения."""
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return _watcher
+    get_brand_index()
+    _watcher_stop.clear()
+    _watcher = threading.Thread(target=_watch, args=(interval,), name="brand-index-watcher", daemon=True)
+    _watcher.start()
+    return _watcher
+
+
+def stop_brand_index_watcher():
+    global _watcher
+    _watcher_stop.set()
+    if _watcher is not None:
+        _watcher.join()
+        _watcher = None
+
+
+if __name__ == "__main__":
+    # Через импорт модуля, чтобы классы в снимке ссылались на brand_index, а не на __main__
+    import brand_index
+
+    built = brand_index.build_brand_index_snapshot()
+    print(f"Brand index snapshot saved to {SNAPSHOT_FILE} (version {built.version}, "
+          f"{len(built.brands)} brands, {len(built.model_patterns)} model pattern sets)")
@@ -0,0 +1,120 @@
+from collections import deque
+
+
+class BrandMatcher:
+    """
+    Автомат Ахо-Корасик по всем вариантам написания брендов.
+
+    Варианты ранжируются в порядке match_order (длинные раньше коротких),
+    поэтому "лучший" бренд — найденный вариант с минимальным рангом. Это даёт
+    те же результаты, что и прежний перебор sorted(brand_list, key=-len),
+    но за один проход по тексту, независимо от размера словаря.
+    Поиск регистронезависимый: все методы сами приводят текст к нижнему регистру.
+    """
+
+    def __init__(self, match_order, variants=()):
+        self.variants = tuple(match_order)
+
+        # Узлы бора: переходы, суффиксная ссылка, лучший ранг в узле,
+        # ссылка на ближайший по суффиксам узел с рангом
+        self._goto = [{}]
+        self._fail = [0]
+        self._rank = [-1]
+        self._depth = [0]
+        self._out_link = [0]
+
+        self._first_word_longest = {}
+        for rank, variant in enumerate(self.variants):
+            key = variant.lower()
+            if not key:
+                continue
+            node = 0
+            for ch in key:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._rank.append(-1)
+                    self._depth.append(self._depth[node] + 1)
+                    self._out_link.append(0)
+                node = nxt
+            if self._rank[node] == -1:
+                self._rank[node] = rank
+            self._first_word_longest.setdefault(key.split()[0], variant)
+
+        # Первый по порядку brands.txt вариант для каждого первого слова
+        self._first_word_ordered = {}
+        for variant in variants:
+            parts = variant.lower().split()
+            if parts:
+                self._first_word_ordered.setdefault(parts[0], variant)
+
+        self._max_len = max(self._depth)
+        self._build_links()
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                self._fail[child] = fail if fail != child else 0
+                link = self._fail[child]
+                self._out_link[child] = link if self._rank[link] != -1 else self._out_link[link]
+
+    def match_prefix(self, text: str) -> str | None:
+        """Лучший вариант бренда, с которого начинается текст (аналог startswith)."""
+        best = -1
+        node = 0
+        for ch in text.lower():
+            node = self._goto[node].get(ch)
+            if node is None:
+                break
+            rank = self._rank[node]
+            if rank != -1 and (best == -1 or rank < best):
+                best = rank
+        return self.variants[best] if best != -1 else None
+
+    def find(self, text: str, max_start: int = None) -> tuple[str, int] | None:
+        """
+        Лучший вариант бренда, встречающийся в тексте (аналог `b in text`).
+        max_start ограничивает позицию начала вхождения.
+        Возвращает (вариант, позиция первого вхождения в text.lower()) или None.
+        """
+        text = text.lower()
+        goto, fail, ranks, depth, out_link = self._goto, self._fail, self._rank, self._depth, self._out_link
+        best = -1
+        best_start = -1
+        node = 0
+        for i, ch in enumerate(text):
+            # Дальше все вхождения начинаются правее max_start
+            if max_start is not None and i - self._max_len >= max_start:
+                break
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if ranks[node] != -1 else out_link[node]
+            while hit:
+                rank = ranks[hit]
+                start = i - depth[hit] + 1
+                if (max_start is None or start <= max_start) and (best == -1 or rank < best):
+                    best = rank
+                    best_start = start
+                hit = out_link[hit]
+        if best == -1:
+            return None
+        return self.variants[best], best_start
+
+    def match_first_word(self, word: str, longest_first: bool = True) -> str | None:
+        """
+        Вариант бренда, первое слово которого совпадает с word.
+        longest_first=True — как перебор по match_order, иначе — по порядку brands.txt.
+        """
+        table = self._first_word_longest if longest_first else self._first_word_ordered
+        return table.get(word.lower())
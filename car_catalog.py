@@ -0,0 +1,266 @@
+"""
+Локальный справочник марок и моделей (SQLite + FTS5).
+
+Заменяет запрос к API Ninjas там, где у парсера не хватило бренда или модели:
+lookup_car(description) отвечает тем же {"make", "model"}, но из локальной
+базы, за доли миллисекунды и без сети. Справочник включается переменной
+CAR_CATALOG_PATH (на fly.io — путь на volume: файл внутри образа не
+переживает редеплой). Базу собирают из CSV:
+
+    python car_catalog.py --db /data/car_catalog.sqlite3 import cars.csv [--replace]
+    python car_catalog.py --db /data/car_catalog.sqlite3 lookup "Камри 2.5 2019 года"
+
+CSV — с заголовком; нужны колонки make и model, необязательные — year
+или year_from / year_to. Лишние колонки игнорируются.
+"""
+import argparse
+import csv
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from brand_index import get_brand_index
+
+# Пустой путь — справочник выключен, работает только API
+CATALOG_FILE = os.getenv("CAR_CATALOG_PATH", "")
+
+_TOKEN_RE = re.compile(r"\w+")
+_YEAR_RE = re.compile(r"\b(19[5-9]\d|20\d{2})\b")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cars (
+    id INTEGER PRIMARY KEY,
+    make TEXT NOT NULL,
+    model TEXT NOT NULL,
+    year_from INTEGER,
+    year_to INTEGER,
+    UNIQUE (make, model, year_from, year_to)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS cars_fts USING fts5(
+    make, model, content='cars', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS cars_ai AFTER INSERT ON cars BEGIN
+    INSERT INTO cars_fts(rowid, make, model) VALUES (new.id, new.make, new.model);
+END;
+CREATE TRIGGER IF NOT EXISTS cars_ad AFTER DELETE ON cars BEGIN
+    INSERT INTO cars_fts(cars_fts, rowid, make, model) VALUES ('delete', old.id, old.make, old.model);
+END;
+"""
+
+# Сколько кандидатов FTS проверяется точным сравнением токенов
+_CANDIDATES = 200
+
+# Модель из одних коротких или числовых слов ("3", "X5", "Q7") совпадает с чем
+# угодно ("5 мест") — такая запись подходит, только если упомянута и марка
+_WEAK_MODEL_TOKEN_LEN = 3
+
+
+def _tokens(text: str) -> list[str]:
+    return [token.lower() for token in _TOKEN_RE.findall(text)]
+
+
+def _weak_model(model_tokens: list[str]) -> bool:
+    return all(len(token) < _WEAK_MODEL_TOKEN_LEN or token.isdigit() for token in model_tokens)
+
+
+def _contains_phrase(words: list[str], phrase: list[str]) -> bool:
+    size = len(phrase)
+    return any(words[i:i + size] == phrase for i in range(len(words) - size + 1))
+
+
+_aliases = (None, {})
+
+
+def _make_aliases(make: str) -> list[list[str]]:
+    """Слова синонимов марки из brands.txt ('мазда', '马自达', ...) — по текущему BrandIndex."""
+    global _aliases
+    index = get_brand_index()
+    cached_index, by_make = _aliases
+    if cached_index is not index:
+        by_make = {}
+        for variant, canonical in index.brand_map.items():
+            tokens = _tokens(variant)
+            if tokens:
+                by_make.setdefault(canonical.lower(), []).append(tokens)
+        _aliases = (index, by_make)
+    return by_make.get(make.lower(), [])
+
+
+def _int_or_none(value) -> int | None:
+    try:
+        return int(str(value).strip()) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+class CarCatalog:
+    """
+    Справочник марок/моделей в SQLite. Соединение одно на объект и
+    защищено блокировкой: запросы короткие, а парсер может вызываться
+    из разных потоков.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM cars").fetchone()[0]
+
+    def add(self, make: str, model: str, year_from: int = None, year_to: int = None) -> bool:
+        """Добавляет запись; дубликат (та же марка, модель и годы) пропускается."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO cars (make, model, year_from, year_to) VALUES (?, ?, ?, ?)",
+                (make.strip(), model.strip(), year_from, year_to),
+            )
+            return cursor.rowcount > 0
+
+    def import_csv(self, path: str, replace: bool = False) -> int:
+        """Загружает записи из CSV одной транзакцией; возвращает число добавленных строк."""
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            columns = {name.strip().lower(): name for name in reader.fieldnames or ()}
+            if "make" not in columns or "model" not in columns:
+                raise ValueError(f"{path}: CSV must have 'make' and 'model' columns")
+
+            def rows():
+                for row in reader:
+                    make = (row[columns["make"]] or "").strip()
+                    model = (row[columns["model"]] or "").strip()
+                    if not make or not model:
+                        continue
+                    year = _int_or_none(row.get(columns.get("year")))
+                    year_from = _int_or_none(row.get(columns.get("year_from"))) or year
+                    year_to = _int_or_none(row.get(columns.get("year_to"))) or year
+                    yield make, model, year_from, year_to
+
+            with self._lock, self._conn:
+                if replace:
+                    self._conn.execute("DELETE FROM cars")
+                before = self._conn.execute("SELECT count(*) FROM cars").fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO cars (make, model, year_from, year_to) VALUES (?, ?, ?, ?)",
+                    rows(),
+                )
+                added = self._conn.execute("SELECT count(*) FROM cars").fetchone()[0] - before
+                self._conn.execute("INSERT INTO cars_fts(cars_fts) VALUES ('optimize')")
+        return added
+
+    def lookup(self, description: str, year: int = None) -> dict | None:
+        """
+        {"make", "model"} для описания или None — как api_ninjas.get_car_info_from_ninjas.
+
+        Кандидаты отбираются по FTS-индексу (хотя бы одно слово описания
+        в модели), затем проверяются точно: все слова модели должны быть
+        в описании. Предпочтение — записи, чья марка (или её синоним из
+        brands.txt) тоже упомянута, затем более длинному названию модели,
+        затем подходящему году. Короткие и числовые модели ("5", "X5")
+        без упомянутой марки не подходят.
+        """
+        words = _tokens(description)
+        if not words:
+            return None
+        if year is None:
+            match = _YEAR_RE.search(description)
+            year = int(match.group(1)) if match else None
+
+        query = "model : (" + " OR ".join(f'"{word}"' for word in dict.fromkeys(words)) + ")"
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    "SELECT cars.make, cars.model, cars.year_from, cars.year_to FROM cars_fts "
+                    "JOIN cars ON cars.id = cars_fts.rowid WHERE cars_fts MATCH ? "
+                    "ORDER BY bm25(cars_fts) LIMIT ?",
+                    (query, _CANDIDATES),
+                ).fetchall()
+            except sqlite3.Error as e:
+                logging.warning(f"[CAR CATALOG] Lookup failed: {e}")
+                return None
+
+        present = set(words)
+        best, best_rank = None, None
+        for make, model, year_from, year_to in rows:
+            model_tokens = _tokens(model)
+            if not model_tokens or not present.issuperset(model_tokens):
+                continue
+            make_tokens = _tokens(make)
+            make_mentioned = present.issuperset(make_tokens) or any(
+                _contains_phrase(words, alias) for alias in _make_aliases(make))
+            if not make_mentioned and _weak_model(model_tokens):
+                continue
+            year_ok = year is None or (
+                (year_from is None or year_from <= year) and (year_to is None or year <= year_to)
+            )
+            rank = (make_mentioned, len(model_tokens), year_ok)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = {"make": make, "model": model}, rank
+        return best
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_car_catalog() -> CarCatalog | None:
+    """Общий справочник из CATALOG_FILE; None, если путь не задан или файла нет (тогда работает только API)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                if not CATALOG_FILE or not os.path.exists(CATALOG_FILE):
+                    return None
+                _catalog = CarCatalog(CATALOG_FILE)
+                logging.info(f"[CAR CATALOG] Loaded {len(_catalog)} entries from {CATALOG_FILE}")
+    return _catalog
+
+
+def set_car_catalog(catalog: CarCatalog | None):
+    """Подменяет общий справочник (None — сбросить и перечитать CATALOG_FILE при следующем запросе)."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
+
+
+def lookup_car(description: str, year: int = None) -> dict | None:
+    catalog = get_car_catalog()
+    if catalog is None:
+        return None
+    return catalog.lookup(description, year)
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Локальный справочник марок и моделей")
+    arg_parser.add_argument("--db", default=CATALOG_FILE or None, required=not CATALOG_FILE,
+                            help="файл базы SQLite (по умолчанию CAR_CATALOG_PATH)")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="загрузить записи из CSV")
+    import_cmd.add_argument("csv")
+    import_cmd.add_argument("--replace", action="store_true", help="удалить старые записи перед загрузкой")
+    lookup_cmd = commands.add_parser("lookup", help="найти марку и модель по описанию")
+    lookup_cmd.add_argument("description")
+    args = arg_parser.parse_args(argv)
+
+    catalog = CarCatalog(args.db)
+    try:
+        if args.command == "import":
+            added = catalog.import_csv(args.csv, replace=args.replace)
+            print(f"[CAR CATALOG] Imported {added} entries, total {len(catalog)}")
+        else:
+            print(catalog.lookup(args.description))
+    finally:
+        catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
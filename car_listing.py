@@ -0,0 +1,110 @@
+_UNSET = object()
+
+
+class CarListing:
+    """
+    Результат парсинга одного объявления.
+
+    Поля хранятся в __slots__, а не в словаре: в долгоживущем боте это меньше
+    объектов и памяти на сообщение. Для совместимости со старым кодом
+    поддерживается словарный доступ (result["price"] = ..., "year" in result,
+    result.get(...)); незаполненное поле ведёт себя как отсутствующий ключ.
+    """
+    __slots__ = ("brand", "model", "modification", "trim", "year", "mileage", "price", "currency",
+                 "engine", "drive_type", "transmission", "description", "car_type")
+
+    brand: str | None
+    model: str | None
+    modification: str
+    trim: str
+    year: int
+    mileage: int
+    price: int | str
+    currency: str
+    engine: str
+    drive_type: str
+    transmission: str
+    description: str
+    car_type: str
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, _UNSET)
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CarListing":
+        return cls(**data)
+
+    # --- словарный интерфейс ---
+
+    def __getitem__(self, key: str):
+        value = getattr(self, key, _UNSET) if key in self.__slots__ else _UNSET
+        if value is _UNSET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        if key not in self.__slots__:
+            raise KeyError(f"Unknown CarListing field: {key}")
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__ and getattr(self, key) is not _UNSET
+
+    def get(self, key: str, default=None):
+        if key not in self.__slots__:
+            return default
+        value = getattr(self, key)
+        return default if value is _UNSET else value
+
+    def __bool__(self):
+        return any(getattr(self, name) is not _UNSET for name in self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, CarListing):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __getstate__(self):
+        # Сентинел незаполненных полей не должен попадать в pickle/deepcopy
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f"CarListing({self.to_dict()!r})"
+
+    # --- сериализация ---
+
+    def to_dict(self) -> dict:
+        """Заполненные поля в виде словаря — как раньше возвращал парсер."""
+        result = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not _UNSET:
+                result[name] = value
+        return result
+
+    def diff(self, other: "CarListing") -> dict:
+        """
+        Поля, которые в other отличаются от self: {поле: новое значение}.
+        Поле, которого в other больше нет, приходит со значением None.
+        """
+        old, new = self.to_dict(), other.to_dict()
+        changes = {name: value for name, value in new.items() if old.get(name, _UNSET) != value}
+        changes.update((name, None) for name in old if name not in new)
+        return changes
+
+    def to_payload(self, **extra) -> dict:
+        """
+        Тело запроса для send_to_api: заполненные поля плюс служебные
+        (car_data, image_file_ids, image_urls, chat_id и т.п.) из extra.
+        """
+        payload = self.to_dict()
+        payload.update(extra)
+        return payload
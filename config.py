@@ -12,4 +12,52 @@ ALLOWED_USERS = [1873460275]  # список user_id
 
 ENDPOINT_URL = os.getenv("ENDPOINT_URL", "http://localhost:5000/api/import_car")
 API_TOKEN = os.getenv("API_TOKEN", "your-secret-token")
-API_TIMEOUT = int(os.getenv("API_TIMEOUT", 30))
\ No newline at end of file
+# Частичное обновление уже импортированного объявления при правке подписи
+UPDATE_ENDPOINT_URL = os.getenv("UPDATE_ENDPOINT_URL", ENDPOINT_URL.rsplit("/", 1)[0] + "/update_car")
+API_TIMEOUT = int(os.getenv("API_TIMEOUT", 30))
+
+# Кэш результатов парсинга повторных подписей (0 — выключен)
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", 1024))
+PARSE_CACHE_TTL = int(os.getenv("PARSE_CACHE_TTL", 3600))
+
+# Период проверки brands.txt / models.txt на изменения, секунды (0 — без горячей перезагрузки)
+BRAND_INDEX_RELOAD_INTERVAL = float(os.getenv("BRAND_INDEX_RELOAD_INTERVAL", 60))
+
+# Постоянный кэш ответов API Ninjas (пустой путь — выключен). Файл внутри образа не
+# переживает редеплой, поэтому на fly.io путь должен вести на volume ([mounts] в fly.toml)
+LOOKUP_CACHE_PATH = os.getenv("LOOKUP_CACHE_PATH", "")
+LOOKUP_CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL", 30 * 86400))
+LOOKUP_CACHE_NEGATIVE_TTL = int(os.getenv("LOOKUP_CACHE_NEGATIVE_TTL", 86400))
+
+# Где выполняется разбор подписей: "thread" или "process", размер пула и
+# сколько разборов одновременно отдаётся в пул (остальные ждут в очереди)
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "thread")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", 2))
+PARSE_MAX_IN_FLIGHT = int(os.getenv("PARSE_MAX_IN_FLIGHT", 4))
+
+# Ограничения разбора недоверенных подписей (см. parse_limits.ParseLimits)
+PARSE_MAX_CHARS = int(os.getenv("PARSE_MAX_CHARS", 4096))
+PARSE_MAX_LINES = int(os.getenv("PARSE_MAX_LINES", 200))
+PARSE_MAX_LINE_LENGTH = int(os.getenv("PARSE_MAX_LINE_LENGTH", 512))
+PARSE_TIME_BUDGET = float(os.getenv("PARSE_TIME_BUDGET", 0.5))
+
+# Сколько последних импортированных сообщений и как долго (секунды) помнить для правок
+MESSAGE_EDITS_SIZE = int(os.getenv("MESSAGE_EDITS_SIZE", 2000))
+MESSAGE_EDITS_TTL = int(os.getenv("MESSAGE_EDITS_TTL", 7 * 86400))
+
+# Альбом считается собранным, когда его части не приходят столько секунд;
+# дольше MEDIA_GROUP_MAX_WAIT от первой части не ждём
+MEDIA_GROUP_QUIET_INTERVAL = float(os.getenv("MEDIA_GROUP_QUIET_INTERVAL", 1.0))
+MEDIA_GROUP_MAX_WAIT = float(os.getenv("MEDIA_GROUP_MAX_WAIT", 10.0))
+
+# Сессии пользователей: сколько держать, сколько секунд без активности (0 — бессрочно),
+# сколько фото на объявление и как часто удалять истёкшие (0 — без фоновой очистки)
+SESSION_MAX_SIZE = int(os.getenv("SESSION_MAX_SIZE", 1000))
+SESSION_TTL = int(os.getenv("SESSION_TTL", 3600))
+SESSION_MAX_IMAGES = int(os.getenv("SESSION_MAX_IMAGES", 20))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", 60))
+
+# Постоянное хранение сессий и недособранных альбомов (пустой путь — только в памяти);
+# изменения пишутся пачкой раз в SESSION_DB_FLUSH_INTERVAL секунд. На fly.io путь должен вести на volume
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "")
+SESSION_DB_FLUSH_INTERVAL = float(os.getenv("SESSION_DB_FLUSH_INTERVAL", 1.0))
@@ -0,0 +1,147 @@
+"""
+Фаззинг парсера на худшее время.
+
+Генерирует враждебные подписи (длинные серии цифр и пробелов после "Цена"
+и "Пробег", денежные хвосты без валюты, незакрытые скобки, одну строку
+на весь лимит, сотни повторяющихся строк и т.п.), обрезает их ParseLimits
+и замеряет каждую стратегию. Любая стратегия дольше --budget-ms или
+ограниченный разбор дольше time_budget — нарушение, и скрипт завершается
+с кодом 1:
+
+    python fuzz_parser.py
+    python fuzz_parser.py --cases 500 --seed 7 --budget-ms 25 --json fuzz.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+
+import parser as car_parser
+from bench_parser import strategy_functions
+from brand_index import get_brand_index
+from parse_limits import ParseLimits
+
+_LABELS = ("Цена", "Цена:", "💸Цена под ключ:", "Стоимость -", "Пробег", "Пробег:", "🔹Пробег:",
+           "Двигатель:", "⚙️ДВС:", "Год:", "Марка:", "Итоговая")
+_FILLERS = ("1 ", "1.", "1,", " ", "1a", "1 a ", ". ,", "0", " 1", " 1", "$", "(", "(1")
+_TAILS = ("", "x", "ру", "руб", "км", "тыс", "л.с", "кВт", ")", "€")
+
+
+def _label_run(rng: random.Random, size: int) -> str:
+    label = rng.choice(_LABELS)
+    filler = rng.choice(_FILLERS)
+    return label + filler * max(1, (size - len(label)) // len(filler)) + rng.choice(_TAILS)
+
+
+def _repeated_lines(rng: random.Random, size: int) -> str:
+    line = _label_run(rng, rng.randint(8, 40))
+    return "\n".join([line] * max(1, size // (len(line) + 1)))
+
+
+def _parentheses(rng: random.Random, size: int) -> str:
+    unit = rng.choice(("(", "(a", "(a)", "((", "(1 "))
+    return "Toyota Camry " + unit * max(1, size // len(unit))
+
+
+def _single_word(rng: random.Random, size: int) -> str:
+    return rng.choice("xaб1-") * size
+
+
+def _mixed(rng: random.Random, size: int) -> str:
+    parts = []
+    while sum(map(len, parts)) < size:
+        parts.append(rng.choice((_label_run, _parentheses, _single_word))(rng, rng.randint(16, 256)))
+    return "\n".join(parts)
+
+
+GENERATORS = {
+    "label_run": _label_run,
+    "repeated_lines": _repeated_lines,
+    "parentheses": _parentheses,
+    "single_word": _single_word,
+    "mixed": _mixed,
+}
+
+
+def generate_cases(count: int, seed: int = 0, max_size: int = 8192) -> list[tuple[str, str]]:
+    """(генератор, текст); размеры — от сотен символов до вдвое больше лимита Telegram."""
+    rng = random.Random(seed)
+    names = sorted(GENERATORS)
+    cases = []
+    for i in range(count):
+        name = names[i % len(names)]
+        cases.append((name, GENERATORS[name](rng, rng.randint(256, max_size))))
+    return cases
+
+
+def run_fuzz(cases: int = 200, seed: int = 0, budget: float = 0.05, limits: ParseLimits = None) -> dict:
+    """
+    Замеряет стратегии на обрезанных враждебных входах.
+    budget -- секунд на одну стратегию; ограниченный разбор целиком
+    должен уложиться в limits.time_budget плюс budget на последнюю стратегию.
+    """
+    limits = limits or ParseLimits()
+    index = get_brand_index()
+    functions = {name: func for name, func in strategy_functions(index).items() if name != "parse_car_text"}
+    # Только локальная часть разбора: без запросов во внешние справочники
+    functions["bounded_parse"] = lambda t: car_parser._parse_car_text(t, index, None, limits)
+    budgets = {name: budget for name in functions}
+    budgets["bounded_parse"] = (limits.time_budget or 0) + budget if limits.time_budget is not None else None
+
+    worst = {name: 0.0 for name in functions}
+    violations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, (generator, raw) in enumerate(generate_cases(cases, seed)):
+            text = limits.clip(raw)
+            for name, func in functions.items():
+                start = time.perf_counter()
+                func(text)
+                elapsed = time.perf_counter() - start
+                worst[name] = max(worst[name], elapsed)
+                if budgets[name] is not None and elapsed > budgets[name]:
+                    violations.append({"case": i, "generator": generator, "function": name,
+                                       "ms": round(elapsed * 1e3, 2), "sample": text[:80]})
+
+    return {
+        "cases": cases,
+        "seed": seed,
+        "budget_ms": round(budget * 1e3, 2),
+        "limits": repr(limits),
+        "worst_ms": {name: round(value * 1e3, 2) for name, value in worst.items()},
+        "violations": violations,
+    }
+
+
+def print_report(report: dict):
+    print(f"Fuzzed {report['cases']} cases (seed {report['seed']}), budget {report['budget_ms']} ms")
+    print(report["limits"])
+    for name, ms in sorted(report["worst_ms"].items(), key=lambda item: -item[1]):
+        print(f"  {name:32} worst {ms:8.2f} ms")
+    for violation in report["violations"]:
+        print(f"[VIOLATION] {violation['function']} took {violation['ms']} ms "
+              f"on case {violation['case']} ({violation['generator']}): {violation['sample']!r}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Parser worst-case time fuzzer")
+    arg_parser.add_argument("--cases", type=int, default=200)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--budget-ms", type=float, default=50, help="бюджет одной стратегии, мс")
+    arg_parser.add_argument("--time-budget", type=float, default=0.5, help="дедлайн ограниченного разбора, с")
+    arg_parser.add_argument("--json", dest="json_path", help="куда сохранить отчёт в JSON")
+    args = arg_parser.parse_args(argv)
+
+    report = run_fuzz(cases=args.cases, seed=args.seed, budget=args.budget_ms / 1e3,
+                      limits=ParseLimits(time_budget=args.time_budget))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
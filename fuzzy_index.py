@@ -0,0 +1,192 @@
+import itertools
+import re
+
+# Транслитерация кириллицы: 'Хавал' -> 'haval', 'Мерседес' -> 'mersedes'
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+})
+_NON_KEY_RE = re.compile(r"[^a-z0-9]+")
+
+# Наибольшее расстояние, под которое строится индекс удалений
+MAX_DISTANCE = 2
+
+# Бренды ищутся без контекста, поэтому строже моделей: ключ не короче трёх букв
+# ('ли' — частица, а не Li Auto) и не больше одной правки на каждые ~7 букв
+# ('Start' не Smart, 'Series' не Seres, 'Mersedes' — Mercedes)
+BRAND_MIN_LENGTH = 3
+BRAND_MAX_ERROR_RATE = 0.15
+
+
+def fuzzy_key(text: str) -> str:
+    """Ключ для нечёткого сравнения: нижний регистр, латиница, только буквы и цифры."""
+    return _NON_KEY_RE.sub("", text.lower().translate(_TRANSLIT))
+
+
+def allowed_distance(key: str, max_error_rate: float = None) -> int:
+    """
+    Допустимое число правок зависит от длины: короткие ключи сравниваются только точно.
+    max_error_rate дополнительно ограничивает правки долей длины ключа.
+    """
+    if len(key) < 5 or key.isdigit():
+        return 0
+    limit = 1 if len(key) < 8 else MAX_DISTANCE
+    if max_error_rate is not None:
+        limit = min(limit, int(len(key) * max_error_rate))
+    return limit
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (перестановка соседних букв — одна правка).
+    Если оно больше limit, возвращает limit + 1, не досчитывая матрицу.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev_prev is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, prev_prev[j - 2] + 1)
+            cur[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        prev_prev, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+def _deletes(key: str, depth: int) -> set[str]:
+    """Все строки, получаемые из key удалением не более depth символов."""
+    result = {key}
+    frontier = {key}
+    for _ in range(depth):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        result |= frontier
+    return result
+
+
+class FuzzyDictionary:
+    """
+    Нечёткий словарь по схеме symmetric delete: для каждого ключа заранее
+    сохраняются его варианты с удалёнными символами, поэтому поиск — это
+    несколько десятков обращений к dict и проверка кандидатов точным
+    расстоянием, без перебора словаря.
+    min_length     -- более короткие ключи не ищутся вовсе (даже точно)
+    max_error_rate -- доля длины ключа, которую могут занимать правки (см. allowed_distance)
+    """
+
+    def __init__(self, entries, min_length: int = 1, max_error_rate: float = None):
+        self.min_length = min_length
+        self.max_error_rate = max_error_rate
+        self._values = {}
+        self._deletes = {}
+        self._max_length = 0
+        for text, value in entries:
+            key = fuzzy_key(text)
+            if not key or key in self._values:
+                continue
+            self._values[key] = value
+            self._max_length = max(self._max_length, len(key))
+            for variant in _deletes(key, MAX_DISTANCE):
+                self._deletes.setdefault(variant, []).append(key)
+
+    def __len__(self):
+        return len(self._values)
+
+    def lookup(self, text: str) -> tuple[str, int] | None:
+        """
+        Значение ближайшего ключа и расстояние до него или None.
+        Неоднозначный ответ (разные значения на одном расстоянии) тоже даёт None.
+        """
+        key = fuzzy_key(text)
+        if len(key) < max(self.min_length, 1):
+            return None
+        value = self._values.get(key)
+        if value is not None:
+            return value, 0
+        limit = allowed_distance(key, self.max_error_rate)
+        # Слишком длинный ключ ни с чем не совпадёт, а число его удалений растёт квадратично
+        if not limit or len(key) > self._max_length + limit:
+            return None
+
+        best_distance = limit + 1
+        best = set()
+        seen = set()
+        for variant in _deletes(key, limit):
+            for candidate in self._deletes.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(key, candidate, limit)
+                if distance < best_distance:
+                    best_distance = distance
+                    best = {self._values[candidate]}
+                elif distance == best_distance and distance <= limit:
+                    best.add(self._values[candidate])
+        if len(best) != 1:
+            return None
+        return best.pop(), best_distance
+
+
+class FuzzyResolver:
+    """
+    Нечёткое сопоставление брендов (по всем вариантам написания из brands.txt)
+    и моделей (по названиям из models.txt) для опечаток и кириллицы:
+    'Mersedes' -> Mercedes-Benz, 'Хавал' -> Haval, 'Lixiang' -> Li Auto.
+    """
+
+    def __init__(self, variants, brand_map, model_patterns):
+        self.brands = FuzzyDictionary(((v, brand_map.get(v.lower(), v)) for v in variants),
+                                      min_length=BRAND_MIN_LENGTH, max_error_rate=BRAND_MAX_ERROR_RATE)
+        self.models = {
+            brand: FuzzyDictionary((name, name) for name in patterns.model_names.values())
+            for brand, patterns in model_patterns.items()
+            if patterns.model_names
+        }
+
+    def resolve_brand(self, words: list[str]) -> tuple[str, int] | None:
+        """
+        Бренд в начале списка слов: (канонический бренд, число занятых слов) или None.
+        Пробуются одно слово и два слова вместе ('Lend Rover', 'Mersedes Benz');
+        слова — только из букв (и дефисов): 'max_us' или 'X5' брендом не станут.
+        """
+        words = list(itertools.takewhile(_is_word, words[:2]))
+        return _lookup_prefix(self.brands, words)
+
+    def resolve_model(self, brand: str, words: list[str]) -> tuple[str, int] | None:
+        """Известная модель бренда в начале списка слов: (название, число занятых слов) или None."""
+        models = self.models.get(brand.lower())
+        if not models:
+            return None
+        return _lookup_prefix(models, words)
+
+
+def _is_word(word: str) -> bool:
+    return word.replace("-", "").isalpha()
+
+
+def _lookup_prefix(dictionary: FuzzyDictionary, words: list[str]) -> tuple[str, int] | None:
+    """
+    Ближайшее совпадение для первого слова или первых двух слов вместе.
+    Выигрывает меньшее расстояние, при равенстве — более длинный вариант:
+    'Lixiang L9' -> одно слово (точно), 'Mersedes Benz' -> оба слова.
+    """
+    best = None
+    for size in (1, 2):
+        if len(words) < size:
+            break
+        found = dictionary.lookup("".join(words[:size]))
+        if found and (best is None or found[1] <= best[1]):
+            best = (found[0], found[1], size)
+    if best is None:
+        return None
+    return best[0], best[2]
@@ -0,0 +1,194 @@
+import re
+from time import perf_counter
+
+from number_lexer import NumberToken, tokenize
+from regex_registry import regex_stats_enabled, register
+
+# Экстракторы строк: (имя, поле, регулярное выражение, флаги, ключевые слова).
+# Регулярное выражение запускается только на строках, где в нижнем регистре
+# встречается хотя бы одно из ключевых слов, — без них оно совпасть не может.
+LINE_EXTRACTORS = [
+    # 💰 Цена
+    ("price_label_currency_i", "price",
+     r"(?:Цена|Стоимость|💸|[Ии]тогов)[^\d]*?([\d\s\.,]+)[^\d]*(руб|₽|\$|USD|EUR|€)", re.IGNORECASE,
+     ("руб", "₽", "$", "usd", "eur", "€")),
+    ("price_label_currency", "price",
+     r"(?:Цена|Стоимость|💸|[Ии]тогов)[^\d]*?([\d\s\.,]+)[^\d]*(руб|₽|\$|USD|EUR|€)", 0,
+     ("руб", "₽", "$", "usd", "eur", "€")),
+    ("price_currency_i", "price", r"([\d\s\.,]+)\s*(?:руб|₽|\$|USD|EUR|€)", re.IGNORECASE,
+     ("руб", "₽", "$", "usd", "eur", "€")),
+    ("price_currency", "price", r"([\d\s\.,]+)\s*(?:руб|₽|\$|USD|EUR|€)", 0,
+     ("руб", "₽", "$", "usd", "eur", "€")),
+    ("cost_dash", "price", r"[Сс]тоимость\s*[-–]\s*([\d\s\.,]+)", 0, ("стоимость",)),
+    ("cost_space", "price", r"[Сс]тоимость\s+([\d\s\.,]+)", 0, ("стоимость",)),
+    ("price_dash", "price", r"[Цц]ена\s*[-–]\s*([\d\s\.,]+)", 0, ("цена",)),
+    ("price_space", "price", r"[Цц]ена\s+([\d\s\.,]+)", 0, ("цена",)),
+    ("cost_dash_rub", "price", r"[Сс]тоимость\s*[-–]\s*([\d\s\.,]+)\s*(?:руб|₽)", 0, ("руб", "₽")),
+    ("cost_space_rub", "price", r"[Сс]тоимость\s+([\d\s\.,]+)\s*(?:руб|₽)", 0, ("руб", "₽")),
+    ("price_dash_rub", "price", r"[Цц]ена\s*[-–]\s*([\d\s\.,]+)\s*(?:руб|₽)", 0, ("руб", "₽")),
+    ("price_space_rub", "price", r"[Цц]ена\s+([\d\s\.,]+)\s*(?:руб|₽)", 0, ("руб", "₽")),
+    ("price_rub", "price", r"([\d\s\.,]+)\s*(?:руб|₽)", 0, ("руб", "₽")),
+
+    # 📅 Год
+    ("year_label", "year", r"[Гг]од:?\s*(?:\d+[\/\.])?(\d{4})", 0, ("год",)),
+    ("year_suffix", "year", r"(\b20\d{2}\b)\s*(?:г\.в\.|год|г\.|года)", 0, ("20",)),
+    ("year_word", "year", r"(\b20\d{2}\b)", 0, ("20",)),
+    ("year_digits", "year", r"20\d{2}", 0, ("20",)),
+
+    # 🛣️ Пробег
+    ("mileage_label_km", "mileage", r"[Пп]робег:?\s*([\d\s\.,]+)(?:km|км|тыс\.км|тыс|т\.км|Km)", 0, ("робег",)),
+    ("mileage_km", "mileage", r"(\d[\d\s\.,]*)\s*(?:Km|km|км)", 0, ("km", "км")),
+    ("mileage_any", "mileage", r"(?:пробег|км|kmh|километр|пробег):?\s*[^\d]*([\d\.,\s]+)", 0,
+     ("пробег", "км", "kmh", "километр")),
+    ("mileage_label", "mileage", r"[Пп]робег\s*[:]*\s*(\d[\d\s\.,]+)", 0, ("робег",)),
+    ("mileage_thousands", "mileage", r"(\d[\d\s\.,]+)\s*(?:км|тыс\.км|тыс\s*км)", 0, ("км",)),
+    ("ev_range", "mileage", r"[Зз]апас\s+хода\s+.*?(\d+)\s*км", 0, ("апас",)),
+
+    # ⚙️ Двигатель и мощность
+    ("engine_label", "engine", r"(?:ДВС|[Дд]вигатель):?\s*(.+)", 0, ("двс", "двигатель")),
+    ("engine_turbo_power", "engine", r"[Дд]вигатель.*?(\d+(?:[\.,]\d*)?\s*[ТТtT].*?(?:\d+\s*(?:л\.с\.|лс)))", 0,
+     ("двигатель",)),
+    ("engine_dash_power", "engine", r"[Дд]вигатель.*?(\d+(?:[\.,]\d*)?\s*-\s*\d+\s*(?:л\.с\.|лс))", 0, ("двигатель",)),
+    ("engine_power", "engine", r"[Дд]вигатель\s+(.*?\d+\s*(?:л\.с\.|лс))", 0, ("двигатель",)),
+    ("engine_paren", "engine", r"[Дд]вигатель\s+([^\n\r\(]+)(?:\(|$)", 0, ("двигатель",)),
+    ("engine_name", "engine", r"[Дд]вигатель\s+([^-\n\r\(]+)(?:-|$)", 0, ("двигатель",)),
+    ("engine_volume_power", "engine", r"[Дд]вигатель\s+(\d+[\.,]?\d*\s*[ТТtT])\s*-\s*(\d+)\s*(?:л\.с\.|лс)", 0,
+     ("двигатель",)),
+    ("engine_parallel_hybrid", "engine", r"[Пп]араллельный\s+гибрид", 0, ("араллельный",)),
+    ("engine_hybrid", "engine", r"[Гг]ибрид", 0, ("гибрид",)),
+    ("engine_petrol", "engine", r"[Бб]ензин", 0, ("бензин",)),
+    ("engine_diesel", "engine", r"[Дд]изель", 0, ("дизель",)),
+    ("engine_electric", "engine", r"[Ээ]лектро", 0, ("электро",)),
+    ("engine_turbo", "engine", r"[Тт]урбо", 0, ("турбо",)),
+    ("power", "power", r"(\d+)\s*(?:л\.с\.|лс|л/с|hp)", 0, ("л.с.", "лс", "л/с", "hp")),
+
+    # 🔩 Трансмиссия
+    ("transmission_label", "transmission", r"(?:АКПП|КПП|трансмиссия):?\s*[-:]\s*([^,\n\r]+)", 0,
+     ("кпп", "трансмиссия")),
+    ("transmission_word", "transmission", r"(?:АКПП|КПП|трансмиссия)\s+([^,\n\r]+)", 0, ("кпп", "трансмиссия")),
+
+    # 🛞 Привод
+    ("drive_label", "drive", r"[Пп]ривод:?\s*(.+)", 0, ("ривод",)),
+    ("drive_awd_colon", "drive", r"[Пп]олный\s+привод\s*[-:]\s*([^,\n\r]+)", 0, ("олный",)),
+    ("drive_awd_dash", "drive", r"[Пп]олный\s+привод\s*-\s*([^,\n\r]+)", 0, ("олный",)),
+    ("drive_awd", "drive", r"[Пп]олный\s+привод", 0, ("олный",)),
+    ("drive_fwd", "drive", r"[Пп]ередний\s+привод", 0, ("ередний",)),
+    ("drive_rwd", "drive", r"[Зз]адний\s+привод", 0, ("адний",)),
+    ("drive_4wd_code", "drive", r"4WD", 0, ("4wd",)),
+    ("drive_awd_code", "drive", r"AWD", 0, ("awd",)),
+    ("drive_fwd_code", "drive", r"FWD", 0, ("fwd",)),
+    ("drive_rwd_code", "drive", r"RWD", 0, ("rwd",)),
+]
+
+_COMPILED_EXTRACTORS = [
+    (name, field, register(f"line.{name}", pattern, flags), keywords)
+    for name, field, pattern, flags, keywords in LINE_EXTRACTORS
+]
+# Те же экстракторы с голыми re.Pattern — для горячего цикла без статистики
+_RAW_EXTRACTORS = [
+    (name, field, named.regex, keywords)
+    for name, field, named, keywords in _COMPILED_EXTRACTORS
+]
+
+
+class ClassifiedLine:
+    """
+    Строка сообщения с результатами классификации.
+    tags    -- поля, которые строка может дать (price, year, mileage, ...)
+    matches -- имя экстрактора -> re.Match
+    tokens  -- числа с единицами измерения (number_lexer.NumberToken); строка
+               лексируется при первом обращении и только один раз
+    """
+    __slots__ = ("text", "lower", "tags", "matches", "_tokens")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        self.tags = set()
+        self.matches = {}
+        self._tokens = None
+
+    @property
+    def tokens(self) -> list[NumberToken]:
+        if self._tokens is None:
+            self._tokens = tokenize(self.text)
+        return self._tokens
+
+
+class LineTable:
+    """
+    Таблица классифицированных строк сообщения.
+    Сообщение сканируется один раз; стратегии парсинга читают отсюда
+    готовые совпадения вместо повторного прогона регулярок по строкам.
+    С trace (parse_trace.ParseTrace) время экстракторов суммируется по полям.
+
+    previous -- таблица прежней версии того же сообщения (правка подписи):
+    строки, которые в ней уже есть, берутся оттуда без повторного прогона
+    экстракторов; reused / classified — сколько строк взято и сколько разобрано заново.
+    """
+
+    def __init__(self, text: str, trace=None, previous: "LineTable" = None):
+        self.lines = []
+        self._hits = {}
+        self._by_text = {}
+        self.reused = 0
+        self.classified = 0
+        known = previous._by_text if previous is not None else {}
+        extractors = _COMPILED_EXTRACTORS if regex_stats_enabled() else _RAW_EXTRACTORS
+        for raw in text.splitlines():
+            raw = raw.strip()
+            if not raw:
+                continue
+            line = known.get(raw)
+            if line is not None:
+                self.reused += 1
+            else:
+                line = ClassifiedLine(raw)
+                for name, field, regex, keywords in extractors:
+                    if trace is None:
+                        match = regex.search(raw) if any(k in line.lower for k in keywords) else None
+                    else:
+                        start = perf_counter()
+                        match = regex.search(raw) if any(k in line.lower for k in keywords) else None
+                        trace.add_field(field, perf_counter() - start)
+                    if match:
+                        line.matches[name] = match
+                        line.tags.add(field)
+                self.classified += 1
+            for name, match in line.matches.items():
+                self._hits.setdefault(name, []).append((raw, match))
+            self._by_text[raw] = line
+            self.lines.append(line)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    @property
+    def texts(self) -> list[str]:
+        return [line.text for line in self.lines]
+
+    def first(self, name: str) -> tuple[str, re.Match] | None:
+        """Первая строка, на которой сработал экстрактор: (строка, совпадение)."""
+        hits = self._hits.get(name)
+        return hits[0] if hits else None
+
+    def all(self, name: str) -> list[tuple[str, re.Match]]:
+        """Все строки, на которых сработал экстрактор, в порядке сообщения."""
+        return self._hits.get(name, [])
+
+    def tokens(self) -> list[tuple[str, NumberToken]]:
+        """Все числовые токены сообщения: (строка, токен), в порядке сообщения."""
+        return [(line.text, token) for line in self.lines for token in line.tokens]
+
+    def token(self, hit: tuple[str, re.Match], group: int = 1) -> NumberToken | None:
+        """Первый числовой токен, цифры которого попадают в группу совпадения экстрактора."""
+        line, match = hit
+        start, end = match.span(group)
+        for token in self._by_text[line].tokens:
+            if token.number_span[0] < end and token.number_span[1] > start:
+                return token
+        return None
+
+
+def classify_lines(text: str, trace=None, previous: LineTable = None) -> LineTable:
+    return LineTable(text, trace, previous)
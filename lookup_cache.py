@@ -0,0 +1,133 @@
+"""
+Постоянный кэш ответов внешнего справочника (API Ninjas) в SQLite.
+
+Ключ — нормализованный запрос (normalize_query). Найденные
+марка/модель живут долго (ttl), пустые ответы и "не найдено" (400/404) —
+недолго (negative_ttl), чтобы не спрашивать заведомо безнадёжные описания
+снова после каждого перезапуска. Ошибки сети, 401/403, 429 и 5xx не кэшируются.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+
+_SPACES_RE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    query TEXT PRIMARY KEY,
+    value TEXT,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+def normalize_query(description: str) -> str:
+    """Ключ запроса: регистр и пробелы не различаются."""
+    return _SPACES_RE.sub(" ", description).strip().casefold()
+
+
+class LookupCache:
+    """
+    ttl          -- время жизни положительного ответа, секунды
+    negative_ttl -- время жизни пустого ответа / 4xx, секунды
+    Счётчики попаданий — за время жизни процесса.
+    """
+
+    def __init__(self, path: str, ttl: float = 30 * 86400, negative_ttl: float = 86400, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM lookups").fetchone()[0]
+
+    def get(self, query: str) -> tuple[bool, dict | None]:
+        """(True, значение) при попадании — значение может быть None (закэшированный промах), иначе (False, None)."""
+        key = normalize_query(query)
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM lookups WHERE query = ?", (key,)).fetchone()
+            if row is not None and self._clock() >= row[1]:
+                with self._conn:
+                    self._conn.execute("DELETE FROM lookups WHERE query = ?", (key,))
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return False, None
+            value = json.loads(row[0]) if row[0] is not None else None
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, value
+
+    def put(self, query: str, value: dict | None):
+        """Сохраняет ответ: с ttl, если он непустой, иначе с negative_ttl."""
+        ttl = self.ttl if value else self.negative_ttl
+        stored = json.dumps(value, ensure_ascii=False) if value else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lookups (query, value, expires_at) VALUES (?, ?, ?)",
+                (normalize_query(query), stored, self._clock() + ttl),
+            )
+
+    def purge_expired(self) -> int:
+        """Удаляет истёкшие записи; возвращает их число."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM lookups WHERE expires_at <= ?", (self._clock(),))
+        return cursor.rowcount
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM lookups")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        hits = self.hits + self.negative_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "expirations": self.expirations,
+        }
+
+
+# Необязательный общий кэш (см. enable_lookup_cache)
+_lookup_cache = None
+
+
+def enable_lookup_cache(path: str, ttl: float = 30 * 86400, negative_ttl: float = 86400) -> LookupCache:
+    """Включает постоянный кэш перед запросами в API Ninjas (синхронными и асинхронными)."""
+    global _lookup_cache
+    _lookup_cache = LookupCache(path, ttl=ttl, negative_ttl=negative_ttl)
+    return _lookup_cache
+
+
+def disable_lookup_cache():
+    global _lookup_cache
+    if _lookup_cache is not None:
+        _lookup_cache.close()
+    _lookup_cache = None
+
+
+def get_lookup_cache() -> LookupCache | None:
+    return _lookup_cache
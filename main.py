@@ -1,14 +1,28 @@
 import asyncio
 import json
 import logging
-from collections import defaultdict
 
-from pyrogram import Client, filters
+from pyrogram import Client, filters, idle
+from pyrogram.handlers import EditedMessageHandler, MessageHandler
 from pyrogram.types import Message
 
-from config import ALLOWED_USERS, API_TOKEN, API_ID, API_HASH, BOT_TOKEN
-from parser import parse_car_text
-from utils import send_to_api
+from api_ninjas import close_ninjas_client
+from brand_index import start_brand_index_watcher
+from config import (ALLOWED_USERS, API_TOKEN, API_ID, API_HASH, BOT_TOKEN, PARSE_CACHE_SIZE, PARSE_CACHE_TTL,
+                    BRAND_INDEX_RELOAD_INTERVAL, LOOKUP_CACHE_PATH, LOOKUP_CACHE_TTL, LOOKUP_CACHE_NEGATIVE_TTL,
+                    PARSE_EXECUTOR, PARSE_WORKERS, PARSE_MAX_IN_FLIGHT, PARSE_MAX_CHARS, PARSE_MAX_LINES,
+                    PARSE_MAX_LINE_LENGTH, PARSE_TIME_BUDGET, MESSAGE_EDITS_SIZE, MESSAGE_EDITS_TTL,
+                    MEDIA_GROUP_QUIET_INTERVAL, MEDIA_GROUP_MAX_WAIT, SESSION_MAX_SIZE, SESSION_TTL,
+                    SESSION_MAX_IMAGES, SESSION_SWEEP_INTERVAL, SESSION_DB_PATH, SESSION_DB_FLUSH_INTERVAL)
+from lookup_cache import enable_lookup_cache
+from media_groups import MediaGroup, MediaGroupAggregator
+from message_edits import MessageEdits, listing_key
+from parse_executor import ParseExecutor
+from parse_limits import ParseLimits
+from parser import enable_parse_cache, parse_car_text_async
+from session_db import SessionDatabase
+from session_store import SessionStore
+from utils import send_to_api, send_update_to_api
 
 # Configure logging
 logging.basicConfig(
@@ -20,84 +34,103 @@ logging.basicConfig(
 pyrogram_logger = logging.getLogger("pyrogram")
 pyrogram_logger.setLevel(logging.WARNING)  # Set to WARNING to hide INFO messages
 
-user_sessions = defaultdict(dict)
+# Процессы пула разбора (forkserver/spawn) заново импортируют этот модуль как __mp_main__.
+# На уровне модуля — только объекты без соединений и потоков; базы SQLite, кэши и клиент
+# Telegram создаются в основном процессе, в блоке __main__ в конце файла
+ALLOWED_USERS_FILTER = filters.private & filters.user(ALLOWED_USERS)
 
-app = Client("car_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+# Разбор подписей — в пуле, чтобы event loop продолжал принимать апдейты. Пул создаётся при первом разборе
+parse_executor = ParseExecutor(kind=PARSE_EXECUTOR, workers=PARSE_WORKERS, max_in_flight=PARSE_MAX_IN_FLIGHT)
+parse_limits = ParseLimits(max_chars=PARSE_MAX_CHARS, max_lines=PARSE_MAX_LINES,
+                           max_line_length=PARSE_MAX_LINE_LENGTH, time_budget=PARSE_TIME_BUDGET or None)
+
+# Разобранные объявления — чтобы правка подписи уходила на сервер дельтой полей
+message_edits = MessageEdits(maxsize=MESSAGE_EDITS_SIZE, ttl=MESSAGE_EDITS_TTL)
 
 
-@app.on_message(filters.private & filters.user(ALLOWED_USERS))
 async def handle_message(client: Client, message: Message):
     user_id = message.from_user.id
     print(f"[LOG] Message from {user_id}: {message.text or 'photo'}")
 
-    session = user_sessions[user_id]
-    session.setdefault("images", [])
-
-    # --- Обработка альбома (media group)
+    # --- Обработка альбома (media group): части собирает media_groups, см. complete_media_group
     if message.media_group_id:
-        session.setdefault("group_id", message.media_group_id)
-
-        fid = message.photo.file_id
-        if fid not in session["images"]:
-            session["images"].append(fid)
-
-        if message.caption:
-            session["caption"] = message.caption
-            await asyncio.sleep(2)  # подождём, пока придут все фото
-
-            logging.info(f"[SESSION] Собрано {len(session['images'])} фото, caption получен. Отправка...")
-            await process_session(message, session)
+        fid = message.photo.file_id if message.photo else None
+        media_groups.add(message.media_group_id, user_id, fid, message.caption, message)
         return
 
     # --- Одиночное фото
     if message.photo:
         fid = message.photo.file_id
-        if fid not in session["images"]:
-            session["images"].append(fid)
+        if not user_sessions.add_image(user_id, fid) and user_sessions.images_full(user_id):
+            await message.reply(f"⚠️ Не больше {user_sessions.max_images} фото на объявление, это фото пропущено.")
+            return
         await message.reply("📷 Фото получено. Жду текстовое описание.")
         return
 
     # --- Только текст
     if message.text:
-        session["caption"] = message.text
+        session = user_sessions.set_caption(user_id, message.text)
         await process_session(message, session)
         return
 
 
+async def complete_media_group(group: MediaGroup):
+    """Альбом собран: фото переходят в сессию, с подписью — сразу в обработку."""
+    if group.message is None:
+        # Альбом восстановлен после перезапуска: сообщение, на которое отвечать, запрашиваем заново
+        group.message = await app.get_messages(group.chat_id, group.message_id)
+    for fid in group.images:
+        user_sessions.add_image(group.user_id, fid)
+    session = user_sessions.get(group.user_id)
+    if user_sessions.images_full(group.user_id):
+        logging.warning(f"[SESSION] Альбом {group.group_id}: сохранено не больше {user_sessions.max_images} фото")
+
+    latency = group.last_seen - group.first_seen
+    if group.caption is None:
+        logging.info(f"[SESSION] Альбом {group.group_id} без подписи: {len(group.images)} фото")
+        await group.message.reply("📷 Фото получено. Жду текстовое описание.")
+        return
+
+    user_sessions.set_caption(group.user_id, group.caption)
+    logging.info(f"[SESSION] Собрано {len(session['images'])} фото (части за {latency:.2f} с), "
+                 f"caption получен. Отправка...")
+    logging.debug(f"[ALBUM] {media_groups.stats()}")
+    await process_session(group.message, session)
+
+
+
 async def process_session(message: Message, session: dict):
     user_id = message.from_user.id
-    images = session.get("images", [])
-    caption = session.get("caption", "")
+    # Снимок: фото, пришедшие во время разбора, в это объявление не попадут и останутся в сессии
+    images = list(session.get("images", []))
+    session_caption = caption = session.get("caption", "")
 
     try:
         if not images:
             await message.reply("⚠️ Нет фотографий. Сначала пришлите фото, потом описание.")
             return
 
-        # Only use parse_car_text, which handles Ninja fallback internally
-        car_data, failed_keys = parse_car_text(caption, return_failures=True)
+        # Обрезанный текст — тот, что разбирается и запоминается для правок (clip идемпотентен)
+        caption = parse_limits.clip(caption)
+        # Ни разбор, ни запрос в API Ninjas (если понадобится) не блокируют event loop
+        listing, failed_keys, line_table = await parse_car_text_async(
+            caption, return_failures=True, as_listing=True, executor=parse_executor, limits=parse_limits,
+            return_table=True,
+        )
+        logging.debug(f"[PARSE EXECUTOR] {parse_executor.stats()}")
 
-        # Extract the brand, model, and modification from car_data
-        brand = car_data.get("brand", "")
-        model = car_data.get("model", "")
-        modification = car_data.get("modification", "")
+        # Extract the brand, model, and modification from the parsed listing
+        brand = listing.get("brand", "")
+        model = listing.get("model", "")
+        modification = listing.get("modification", "")
 
         # Construct car_data string in the required format
         car_data_str = f"{brand} {model} {modification}".strip()
-        car_data["car_data"] = car_data_str
 
         # Log the extracted car_data string
         print(f"[DEBUG] Extracted car_data string: {car_data_str}")
         print(f"[DEBUG] Actual fields: brand='{brand}', model='{model}', modification='{modification}'")
-        print(f"[DEBUG] Engine: '{car_data.get('engine', '')}'")
-
-        print("[REQUEST DATA]", json.dumps(car_data, ensure_ascii=False, indent=2))
-
-        # Add image file_ids to car_data
-        car_data["image_file_ids"] = images
-
-        # Add chat_id to payload for server-side async handling
-        car_data["chat_id"] = message.chat.id
+        print(f"[DEBUG] Engine: '{listing.get('engine', '')}'")
 
         # Create a list to store image URLs
         image_urls = []
@@ -118,15 +151,20 @@ async def process_session(message: Message, session: dict):
             except Exception as e:
                 print(f"[ERROR] Failed to process photo {idx}: {str(e)}")
 
-        # Add image URLs to car_data
-        # The API should handle downloading these from Telegram
-        car_data["image_urls"] = image_urls
+        # Build the API payload: parsed fields plus image file_ids/URLs and the listing key
+        # (chat_id, message_id) for server-side async handling and later edits.
+        # The API should handle downloading images from Telegram
+        car_data = listing.to_payload(
+            car_data=car_data_str,
+            image_file_ids=images,
+            image_urls=image_urls,
+            **listing_key(message.chat.id, message.id),
+        )
         print(f"[DEBUG] Added {len(image_urls)} image IDs to be processed by API")
 
-        # Log the final payload before sending to API
-        print("[FINAL PAYLOAD]", json.dumps({k: v for k, v in car_data.items()
-                                             if k not in ['image_file_ids', 'image_urls']},
-                                            ensure_ascii=False, indent=2))
+        # Log the final payload before sending to API (serialized only when debug logging is on)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("[FINAL PAYLOAD] " + json.dumps(listing.to_payload(car_data=car_data_str), ensure_ascii=False))
 
         logging.info(f"[DEBUG] Using API token: {API_TOKEN}")
 
@@ -139,26 +177,58 @@ async def process_session(message: Message, session: dict):
         )
 
         # Start async task to send data to API and handle response
-        asyncio.create_task(send_api_request_and_notify(message, car_data))
+        # Правки запоминаются только после того, как сервер принял импорт
+        asyncio.create_task(send_api_request_and_notify(message, car_data, (caption, listing, line_table)))
         
-        # Clear the images and caption from the session after processing
-        session["images"] = []
-        session.pop("caption", None)
-        session.pop("group_id", None)
+        # Remove the images and caption used by this listing from the session
+        user_sessions.consume(user_id, images, session_caption)
+        logging.debug(f"[SESSION] {user_sessions.stats()}")
 
     except Exception as e:
         print(f"[ERROR] Failed to process: {str(e)}")
         await message.reply(f"⚠️ Ошибка при обработке: {str(e)}")
 
 
-async def send_api_request_and_notify(message, car_data):
-    """Sends request to API and notifies user about result"""
+async def handle_edited_message(client: Client, message: Message):
+    """Правка подписи уже импортированного объявления: на сервер уходят только изменившиеся поля."""
+    text = message.caption or message.text
+    if not text:
+        return
+    try:
+        result = await message_edits.apply_edit(message.chat.id, message.id, text,
+                                                executor=parse_executor, limits=parse_limits)
+        if result is None:
+            logging.info(f"[EDIT] Message {message.id} was not imported, ignoring edit")
+            return
+        logging.info(f"[EDIT] Message {message.id}: {result}")
+        if not result.changes:
+            return
+
+        response = await send_update_to_api(result.update_payload(message.chat.id, message.id), API_TOKEN)
+        if 200 <= response.status_code < 300:
+            changed = "\n".join(f"• {field}: {value if value is not None else '—'}"
+                                 for field, value in result.changes.items())
+            await message.reply(f"✏️ Объявление обновлено:\n{changed}")
+        else:
+            await message.reply(f"❌ Не удалось обновить объявление: {response.status_code}")
+    except Exception as e:
+        print(f"[ERROR] Failed to process edit: {str(e)}")
+        await message.reply(f"⚠️ Ошибка при обработке правки: {str(e)}")
+
+
+async def send_api_request_and_notify(message, car_data, parsed=None):
+    """
+    Sends request to API and notifies user about result.
+    parsed -- (text, listing, line_table) of the caption; remembered for edits once the import is accepted
+    """
     try:
         # Send to API
         response = await send_to_api(car_data, API_TOKEN)
         
         # Process response - expected to be immediate acknowledgment first
         if response.status_code >= 200 and response.status_code < 300:
+            if parsed is not None:
+                message_edits.remember(message.chat.id, message.id, *parsed)
             try:
                 data = response.json()
                 
@@ -260,4 +330,49 @@ def format_car_data_for_human(car_data):
     return "\n".join(lines)
 
 
-app.run()
+async def main():
+    if SESSION_SWEEP_INTERVAL > 0:
+        user_sessions.start_sweeper(SESSION_SWEEP_INTERVAL)
+    # Словари брендов/моделей перечитываются в фоне при изменении файлов
+    if BRAND_INDEX_RELOAD_INTERVAL > 0:
+        start_brand_index_watcher(BRAND_INDEX_RELOAD_INTERVAL)
+    if session_db is not None:
+        # Сессии — до приёма апдейтов, альбомы — после: их таймеры сразу отвечают в чат
+        sessions = user_sessions.restore(session_db.load_sessions())
+        session_db.start_flusher()
+    await app.start()
+    if session_db is not None:
+        albums = media_groups.restore(session_db.load_media_groups())
+        logging.info(f"[SESSION DB] Restored {sessions} sessions and {albums} pending albums")
+    try:
+        await idle()
+    finally:
+        await app.stop()
+        await close_ninjas_client()
+        parse_executor.shutdown(wait=False)
+        if session_db is not None:
+            # Недособранные альбомы и сессии дописываются на диск и подхватятся после перезапуска
+            session_db.close()
+
+
+if __name__ == "__main__":
+    # Сессии и недособранные альбомы переживают редеплой (пустой путь — только в памяти)
+    session_db = SessionDatabase(SESSION_DB_PATH, flush_interval=SESSION_DB_FLUSH_INTERVAL) if SESSION_DB_PATH else None
+
+    # Фото без подписи ждут описания не дольше SESSION_TTL; число сессий и фото в них ограничено
+    user_sessions = SessionStore(maxsize=SESSION_MAX_SIZE, ttl=SESSION_TTL or None, max_images=SESSION_MAX_IMAGES,
+                                 backend=session_db)
+    media_groups = MediaGroupAggregator(complete_media_group, quiet_interval=MEDIA_GROUP_QUIET_INTERVAL,
+                                        max_wait=MEDIA_GROUP_MAX_WAIT, backend=session_db)
+
+    if PARSE_CACHE_SIZE > 0:
+        enable_parse_cache(maxsize=PARSE_CACHE_SIZE, ttl=PARSE_CACHE_TTL)
+
+    # Ответы API Ninjas переживают перезапуски и редеплой (если задан LOOKUP_CACHE_PATH)
+    if LOOKUP_CACHE_PATH:
+        enable_lookup_cache(LOOKUP_CACHE_PATH, ttl=LOOKUP_CACHE_TTL, negative_ttl=LOOKUP_CACHE_NEGATIVE_TTL)
+
+    app = Client("car_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+    app.add_handler(MessageHandler(handle_message, ALLOWED_USERS_FILTER))
+    app.add_handler(EditedMessageHandler(handle_edited_message, ALLOWED_USERS_FILTER))
+    app.run(main())
@@ -0,0 +1,219 @@
+"""
+Сборка альбомов (media group) Telegram.
+
+Фото альбома приходят отдельными сообщениями с общим media_group_id,
+подпись — обычно у одного из них. Вместо фиксированной паузы после подписи
+агрегатор перезапускает короткий таймер на каждую новую часть и отдаёт
+альбом один раз, когда части перестали приходить на quiet_interval секунд
+(но не позже max_wait от первой части). Части, опоздавшие к уже отданному
+альбому, отбрасываются с предупреждением в лог. Время сборки и самый длинный
+промежуток между частями копятся в гистограммах — по ним подбирается
+quiet_interval. С backend (session_db.SessionDatabase) недособранные
+альбомы переживают перезапуск: restore() снова запускает их таймеры.
+
+    aggregator = MediaGroupAggregator(on_complete, quiet_interval=1.0)
+    aggregator.add(message.media_group_id, user_id, file_id, message.caption, message)
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from parse_trace import LatencyHistogram
+
+# Корзины гистограмм сборки альбомов, в микросекундах: от 50 мс до 10 с
+GROUP_LATENCY_BOUNDS_US = (50_000, 100_000, 250_000, 500_000, 750_000, 1_000_000, 1_500_000,
+                           2_000_000, 3_000_000, 5_000_000, 10_000_000)
+
+# Сколько последних отданных альбомов помнить, чтобы узнавать опоздавшие части
+_RECENT_GROUPS = 256
+
+
+class MediaGroup:
+    """
+    Части одного альбома.
+    images     -- file_id фото в порядке прихода
+    caption    -- подпись (None, если альбом пришёл без неё)
+    message    -- сообщение с подписью, иначе первая часть: на него бот отвечает
+                  (None у восстановленного после перезапуска альбома — см. chat_id, message_id)
+    chat_id, message_id -- чат и номер этого сообщения
+    first_seen -- когда пришла первая часть (часы агрегатора)
+    last_seen  -- когда пришла последняя часть
+    max_gap    -- самый длинный промежуток между частями, секунды
+    """
+    __slots__ = ("group_id", "user_id", "images", "caption", "message", "chat_id", "message_id", "first_seen",
+                 "last_seen", "max_gap", "parts", "restored")
+
+    def __init__(self, group_id: str, user_id: int, first_seen: float):
+        self.group_id = group_id
+        self.user_id = user_id
+        self.images = []
+        self.caption = None
+        self.message = None
+        self.chat_id = None
+        self.message_id = None
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.max_gap = 0.0
+        self.parts = 0
+        self.restored = False
+
+    def set_message(self, message):
+        self.message = message
+        chat = getattr(message, "chat", None)
+        self.chat_id = getattr(chat, "id", None)
+        self.message_id = getattr(message, "id", None)
+
+    def __repr__(self):
+        return (f"MediaGroup({self.group_id!r}, user_id={self.user_id}, images={len(self.images)}, "
+                f"caption={self.caption is not None})")
+
+
+class MediaGroupAggregator:
+    """
+    on_complete    -- async-функция (MediaGroup), вызывается один раз на альбом
+    quiet_interval -- сколько секунд без новых частей считать альбом собранным
+    max_wait       -- сколько секунд от первой части ждать самое большее
+    backend        -- куда сохранять недособранные альбомы (session_db.SessionDatabase) или None
+    late_grace     -- сколько секунд после отдачи альбома отбрасывать его опоздавшие части
+    Работает внутри одного event loop; таймеры — loop.call_later, без задачи на каждую часть.
+    """
+
+    def __init__(self, on_complete, quiet_interval: float = 1.0, max_wait: float = 10.0, backend=None,
+                 late_grace: float = 60.0, clock=time.monotonic):
+        if quiet_interval <= 0:
+            raise ValueError("quiet_interval must be positive")
+        self.quiet_interval = quiet_interval
+        self.max_wait = max(max_wait, quiet_interval)
+        self._on_complete = on_complete
+        self.backend = backend
+        self.late_grace = late_grace
+        self._clock = clock
+        self._groups = {}
+        self._timers = {}
+        self._recent = OrderedDict()  # group_id -> когда альбом отдан
+        self._tasks = set()
+        self.parts = 0
+        self.completed = 0
+        self.late_parts = 0
+        self.restored = 0
+        self.completion_time = LatencyHistogram(GROUP_LATENCY_BOUNDS_US)
+        self.part_gap = LatencyHistogram(GROUP_LATENCY_BOUNDS_US)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def add(self, group_id: str, user_id: int, file_id: str = None, caption: str = None,
+            message=None) -> MediaGroup | None:
+        """
+        Добавляет часть альбома и перезапускает его таймер.
+        None — часть опоздала к уже отданному альбому и отброшена.
+        """
+        now = self._clock()
+        group = self._groups.get(group_id)
+        if group is None:
+            flushed_at = self._recent.get(group_id)
+            if flushed_at is not None and now - flushed_at < self.late_grace:
+                # Объявление по альбому уже отправлено: без подписи такая часть
+                # прицепилась бы к следующему объявлению пользователя
+                self.late_parts += 1
+                logging.warning(f"[ALBUM] Dropped late part of media group {group_id} (user {user_id}), "
+                                f"consider raising quiet_interval ({self.quiet_interval} s)")
+                return None
+            group = MediaGroup(group_id, user_id, now)
+            self._groups[group_id] = group
+        else:
+            group.max_gap = max(group.max_gap, now - group.last_seen)
+            group.last_seen = now
+        group.parts += 1
+        self.parts += 1
+
+        if file_id and file_id not in group.images:
+            group.images.append(file_id)
+        if caption:
+            group.caption = caption
+            group.set_message(message)
+        elif group.message is None:
+            group.set_message(message)
+
+        if self.backend is not None:
+            self.backend.save_media_group(group, 0.0, group.last_seen - group.first_seen)
+        self._schedule(group, now)
+        return group
+
+    def restore(self, records) -> int:
+        """
+        Восстанавливает альбомы после перезапуска (SessionDatabase.load_media_groups)
+        и запускает их таймеры с учётом времени простоя — обычно они срабатывают сразу.
+        Вызывается внутри event loop; сообщение у таких альбомов — None.
+        """
+        now = self._clock()
+        for record in records:
+            group = MediaGroup(record["group_id"], record["user_id"], now - record["age"] - record["span"])
+            group.last_seen = now - record["age"]
+            group.images = list(record["images"])
+            group.caption = record["caption"]
+            group.chat_id = record["chat_id"]
+            group.message_id = record["message_id"]
+            group.parts = max(len(group.images), 1)
+            group.restored = True
+            self._groups[group.group_id] = group
+            self._schedule(group, now)
+            self.restored += 1
+        return len(records)
+
+    def _schedule(self, group: MediaGroup, now: float):
+        timer = self._timers.pop(group.group_id, None)
+        if timer is not None:
+            timer.cancel()
+        delay = min(group.last_seen + self.quiet_interval, group.first_seen + self.max_wait) - now
+        loop = asyncio.get_running_loop()
+        self._timers[group.group_id] = loop.call_later(max(delay, 0.0), self._flush, group.group_id)
+
+    def _flush(self, group_id: str):
+        self._timers.pop(group_id, None)
+        group = self._groups.pop(group_id, None)
+        if group is None:
+            return
+        self.completed += 1
+        if self.backend is not None:
+            self.backend.delete_media_group(group_id)
+        if not group.restored:
+            # Время простоя при перезапуске в гистограммы не попадает
+            self.completion_time.observe(self._clock() - group.first_seen)
+            if group.parts > 1:
+                self.part_gap.observe(group.max_gap)
+        self._recent[group_id] = self._clock()
+        while len(self._recent) > _RECENT_GROUPS:
+            self._recent.popitem(last=False)
+
+        task = asyncio.ensure_future(self._on_complete(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"[ALBUM] on_complete failed: {task.exception()!r}")
+
+    async def flush_all(self):
+        """Отдаёт все незавершённые альбомы сразу и ждёт обработчиков (остановка бота, тесты)."""
+        for group_id in list(self._groups):
+            timer = self._timers.get(group_id)
+            if timer is not None:
+                timer.cancel()
+            self._flush(group_id)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._groups),
+            "parts": self.parts,
+            "completed": self.completed,
+            "late_parts": self.late_parts,
+            "restored": self.restored,
+            "quiet_interval": self.quiet_interval,
+            "completion": self.completion_time.snapshot(),
+            "max_part_gap": self.part_gap.snapshot(),
+        }
@@ -0,0 +1,158 @@
+"""
+Правки уже импортированных объявлений.
+
+Для каждого обработанного сообщения хранятся текст, таблица классифицированных
+строк (line_classifier.LineTable) и результат разбора. Когда дилер правит
+подпись, заново классифицируются только изменившиеся строки, а на сервер
+уходит не новый импорт со всеми фото, а дельта полей (CarListing.diff).
+Импорт и правка несут один и тот же ключ (listing_key): по нему сервер
+находит объявление, которое нужно обновить.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from brand_index import get_brand_index
+from car_listing import CarListing
+from line_classifier import LineTable
+from parse_limits import ParseLimits
+from parser import _lookup_remote_async, _parse_with_table
+
+
+def _lines(text: str) -> list[str]:
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def listing_key(chat_id: int, message_id: int) -> dict:
+    """Поля, по которым сервер связывает правку с импортированным объявлением (и в импорте, и в правке)."""
+    return {"chat_id": chat_id, "message_id": message_id}
+
+
+class MessageRecord:
+    """Последняя разобранная версия сообщения."""
+    __slots__ = ("text", "listing", "table", "expires_at")
+
+    def __init__(self, text: str, listing: CarListing, table: LineTable | None, expires_at: float | None):
+        self.text = text
+        self.listing = listing
+        self.table = table
+        self.expires_at = expires_at
+
+
+class EditResult:
+    """
+    listing       -- результат разбора новой версии
+    failed        -- поля, которые не удалось разобрать
+    changes       -- {поле: новое значение}, None — поле пропало
+    changed_lines -- сколько строк классифицировано заново
+    reused_lines  -- сколько строк взято из прежней версии
+    """
+    __slots__ = ("listing", "failed", "changes", "changed_lines", "reused_lines")
+
+    def __init__(self, listing: CarListing, failed: list[str], changes: dict, changed_lines: int, reused_lines: int):
+        self.listing = listing
+        self.failed = failed
+        self.changes = changes
+        self.changed_lines = changed_lines
+        self.reused_lines = reused_lines
+
+    def update_payload(self, chat_id: int, message_id: int) -> dict:
+        """Тело запроса для send_update_to_api: ключ объявления и изменившиеся поля."""
+        update = listing_key(chat_id, message_id)
+        update["changes"] = self.changes
+        if {"brand", "model", "modification"} & self.changes.keys():
+            listing = self.listing
+            update["car_data"] = f"{listing.get('brand', '')} {listing.get('model', '')} " \
+                                 f"{listing.get('modification', '')}".strip()
+        return update
+
+    def __repr__(self):
+        return (f"EditResult(changes={self.changes!r}, changed_lines={self.changed_lines}, "
+                f"reused_lines={self.reused_lines})")
+
+
+class MessageEdits:
+    """
+    Ограниченное хранилище сообщений по (chat_id, message_id) с LRU-вытеснением и TTL.
+    maxsize -- максимум сообщений
+    ttl     -- сколько секунд после последнего разбора правка ещё обрабатывается (None — без ограничения)
+    """
+
+    def __init__(self, maxsize: int = 2000, ttl: float | None = 7 * 86400, clock=time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self.edits = 0
+        self.unchanged = 0
+        self.unknown = 0
+        self.lines_reused = 0
+        self.lines_classified = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def remember(self, chat_id: int, message_id: int, text: str, listing: CarListing, table: LineTable = None):
+        """Запоминает разобранную версию сообщения (table может быть None — тогда первая правка разберёт всё)."""
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            key = (chat_id, message_id)
+            self._records[key] = MessageRecord(text, listing, table, expires_at)
+            self._records.move_to_end(key)
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def get(self, chat_id: int, message_id: int) -> MessageRecord | None:
+        with self._lock:
+            record = self._records.get((chat_id, message_id))
+            if record is not None and record.expires_at is not None and self._clock() >= record.expires_at:
+                del self._records[(chat_id, message_id)]
+                record = None
+            return record
+
+    async def apply_edit(self, chat_id: int, message_id: int, text: str, executor=None,
+                         limits: ParseLimits = None) -> EditResult | None:
+        """
+        Разбирает новую версию сообщения и возвращает дельту полей.
+        None — сообщение не импортировалось (или запись истекла): правку обрабатывать нечего.
+        executor -- parse_executor.ParseExecutor; без него разбор идёт в текущем потоке.
+        """
+        record = self.get(chat_id, message_id)
+        if record is None:
+            self.unknown += 1
+            return None
+        if limits is not None:
+            text = limits.clip(text)
+        if _lines(text) == _lines(record.text):
+            # Изменились только пробелы / пустые строки — разбирать нечего
+            self.unchanged += 1
+            return EditResult(record.listing, [], {}, 0, len(_lines(text)))
+
+        index = get_brand_index()
+        if executor is None:
+            (listing, failed, _), table = _parse_with_table(text, index, None, limits, record.table)
+        else:
+            (listing, failed, _), table = await executor.parse(text, index, None, limits, record.table)
+        await _lookup_remote_async(listing)
+
+        changes = record.listing.diff(listing)
+        changed = table.classified if table is not None else None
+        reused = table.reused if table is not None else 0
+        self.edits += 1
+        self.lines_reused += reused
+        self.lines_classified += changed or 0
+        self.remember(chat_id, message_id, text, listing, table)
+        return EditResult(listing, failed, changes, changed, reused)
+
+    def stats(self) -> dict:
+        return {
+            "messages": len(self._records),
+            "edits": self.edits,
+            "unchanged": self.unchanged,
+            "unknown": self.unknown,
+            "lines_reused": self.lines_reused,
+            "lines_classified": self.lines_classified,
+        }
@@ -0,0 +1,91 @@
+import re
+from bisect import bisect_right
+
+PATTERN_TYPES = ("model", "series_class", "alphanumeric", "prefix_number")
+
+
+def _combine(patterns) -> re.Pattern | None:
+    """Объединяет регулярные выражения одного типа в одну альтернацию."""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+
+class ModelPatterns:
+    """
+    Скомпилированные паттерны моделей одного бренда из models.txt.
+
+    Для каждого типа паттернов (model, series_class, alphanumeric, prefix_number)
+    строится одна альтернация, поэтому поиск модели — один проход regex
+    по словам после бренда, а не перебор строк файла.
+    """
+
+    def __init__(self, patterns: dict):
+        self.default = patterns.get("default") is True
+
+        # Точные названия моделей ищутся как подстроки без учёта регистра;
+        # при совпадении в одной позиции выигрывает более длинное название
+        self.model_names = {}
+        for name in patterns.get("model", ()):
+            self.model_names.setdefault(name.lower(), name)
+        names = sorted(self.model_names.values(), key=len, reverse=True)
+        self.model = _combine([re.escape(name) for name in names])
+
+        self.series_class = _combine(patterns.get("series_class", ()))
+        self.alphanumeric = _combine(patterns.get("alphanumeric", ()))
+        self.prefix_number = _combine(patterns.get("prefix_number", ()))
+
+    @staticmethod
+    def _word_span(words: list[str], match: re.Match) -> tuple[int, int]:
+        """Переводит позиции совпадения в ' '.join(words) в индексы слов [start, end)."""
+        starts = []
+        pos = 0
+        for word in words:
+            starts.append(pos)
+            pos += len(word) + 1
+        start_idx = bisect_right(starts, match.start()) - 1
+        end_idx = bisect_right(starts, max(match.end() - 1, match.start()))
+        return start_idx, end_idx
+
+    def find_model(self, words: list[str]) -> tuple[str, int] | None:
+        """
+        Ищет модель в словах после бренда.
+        Возвращает (модель, индекс слова после модели) или None.
+        """
+        if not words:
+            return None
+
+        # Бренды с флагом default: модель — первое слово
+        if self.default:
+            return words[0], 1
+
+        joined = None
+
+        # Точные названия моделей (могут занимать несколько слов: 'Land Cruiser')
+        if self.model:
+            joined = " ".join(words)
+            match = self.model.search(joined)
+            if match:
+                _, end_idx = self._word_span(words, match)
+                return self.model_names[match.group(0).lower()], end_idx
+
+        # Серии/классы: 'C Class', '4 Series'
+        if self.series_class:
+            joined = joined if joined is not None else " ".join(words)
+            match = self.series_class.search(joined)
+            if match:
+                start_idx, end_idx = self._word_span(words, match)
+                return " ".join(words[start_idx:end_idx]), end_idx
+
+        # Буквенно-цифровые модели проверяем только в первых двух словах
+        if self.alphanumeric:
+            for i, word in enumerate(words[:2]):
+                if self.alphanumeric.match(word):
+                    return word, i + 1
+
+        # Префикс + число ('RX 350'): моделью считаем первое слово
+        if self.prefix_number and len(words) >= 2:
+            if self.prefix_number.match(words[0]):
+                return words[0], 1
+
+        return None
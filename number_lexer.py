@@ -0,0 +1,166 @@
+"""
+Лексер чисел с единицами измерения.
+
+Строка объявления один раз превращается в типизированные токены:
+цена с валютой, пробег в км, мощность в л.с./кВт, ёмкость батареи в кВт·ч,
+год и месяц/год. Разделители разрядов — пробел, неразрывный (U+00A0) и узкий
+неразрывный (U+202F) пробелы, точка и запятая ("1.414.000 руб.", "5 700 000"),
+множители "тыс"/"млн" ("35 тыс. км"). Экстракторы парсера берут значения
+из токенов вместо того, чтобы каждый раз чистить цифры заново:
+
+    >>> [(t.kind, t.value, t.unit) for t in tokenize("Пробег: 35.000km, 10/2020")]
+    [('km', 35000, 'км'), ('month_year', 2020, None)]
+"""
+import re
+
+from regex_registry import register
+
+# Разделители разрядов: обычный, неразрывный, узкий неразрывный и тонкий пробелы, точка, запятая
+_GROUP_SEPARATORS = " \u00a0\u202f\u2009.,"
+
+# Даты — отдельная ветка без единиц. У чисел последняя закрытая группа совпадения
+# (match.lastgroup) — это и есть вид токена: единица, множитель или форма числа.
+# Опережающая проверка в начале отсекает позиции без цифры и валюты.
+_NUMBER_TOKEN_RE = register("lexer.number_token", r"""
+    (?=[$€¥₽\d])
+    (?:
+        (?<![\d.,])
+        (?:
+            (?P<month>0?[1-9]|1[0-2])[/.\-](?P<month_year>(?:19|20)\d{2})(?![\d.,]\d)
+          | (?P<year_month>(?:19|20)\d{2})[/\-](?P<year_month_month>0?[1-9]|1[0-2])(?!\d)
+        )
+      | (?:(?P<prefix>[$€¥₽])\s?)?
+        (?<![\d.,])
+        (?:
+            (?P<grouped>\d{1,3}(?P<sep>[\ \u00a0\u202f\u2009.,])\d{3}(?:(?P=sep)\d{3})*)(?![\d]|[.,]\d)
+          | (?P<plain>\d+(?:[.,]\d+)?)
+        )
+        (?:\s*(?P<multiplier>тыс\b\.?|млн\b\.?|т\.(?=\s*км)))?
+        (?:\s*(?:
+            (?P<kwh>кВт\s*[·⋅*]?\s*ч|kWh)
+          | (?P<kw>кВт|kW)(?![а-яa-z])
+          | (?P<hp>л\.\s?с\.?|лс|л/с|hp|ps)(?![а-яa-z])
+          | (?P<speed>км/ч|km/h|kmh)
+          | (?P<km>км|km)(?![а-яa-z])
+          | (?P<currency>руб(?:\.|лей|ля|ль)?|₽|\$|USD|EUR|€|евро|¥|JPY|CNY|юан[а-я]*|долл[а-я.]*)
+          | (?P<year_suffix>г\.\s?в\.|года?(?![а-я])|г\.)
+        ))?
+    )
+""", re.IGNORECASE | re.VERBOSE)
+
+_CURRENCY_CODES = (
+    ("руб", "RUB"), ("₽", "RUB"),
+    ("$", "USD"), ("usd", "USD"), ("долл", "USD"),
+    ("eur", "EUR"), ("€", "EUR"), ("евро", "EUR"),
+    ("¥", "JPY"), ("jpy", "JPY"),
+    ("cny", "CNY"), ("юан", "CNY"),
+)
+_UNIT_NAMES = {"km": "км", "hp": "л.с.", "kw": "кВт", "kwh": "кВт·ч", "speed": "км/ч"}
+_MULTIPLIERS = {"т": 1000, "тыс": 1000, "млн": 1_000_000}
+
+# Годы без единиц измерения: за пределами диапазона это просто число
+YEAR_RANGE = (1950, 2035)
+
+
+def currency_code(unit: str) -> str:
+    """'руб.' -> 'RUB', '$' -> 'USD', ...; неизвестная валюта — 'unknown'."""
+    unit = unit.lower()
+    for prefix, code in _CURRENCY_CODES:
+        if unit.startswith(prefix):
+            return code
+    return "unknown"
+
+
+class NumberToken:
+    """
+    kind        -- currency, km, hp, kw, kwh, speed, year, month_year или number
+    value       -- число с учётом разрядов и множителя (int; float только у дробей без множителя)
+    unit        -- код валюты (RUB, USD, ...), единица ('км', 'л.с.', ...) или None
+    month       -- месяц у month_year
+    span        -- (начало, конец) всего токена в строке, с валютой и единицей
+    number_span -- (начало, конец) цифр
+    """
+    __slots__ = ("kind", "value", "unit", "month", "span", "number_span")
+
+    def __init__(self, kind: str, value, unit: str | None, span: tuple[int, int], number_span: tuple[int, int],
+                 month: int | None = None):
+        self.kind = kind
+        self.value = value
+        self.unit = unit
+        self.month = month
+        self.span = span
+        self.number_span = number_span
+
+    def __eq__(self, other):
+        if not isinstance(other, NumberToken):
+            return NotImplemented
+        return (self.kind, self.value, self.unit, self.month, self.span) == \
+               (other.kind, other.value, other.unit, other.month, other.span)
+
+    def __repr__(self):
+        month = f", month={self.month}" if self.month is not None else ""
+        return f"NumberToken({self.kind!r}, {self.value!r}, unit={self.unit!r}{month}, span={self.span})"
+
+
+_UNIT_KINDS = frozenset(("kwh", "kw", "hp", "speed", "km"))
+
+
+def _make_token(match: re.Match) -> NumberToken:
+    last = match.lastgroup
+    span = match.span()
+    if last == "month_year":
+        return NumberToken("month_year", int(match.group("month_year")), None, span,
+                           (match.start("month"), match.end("month_year")), month=int(match.group("month")))
+    if last == "year_month_month":
+        return NumberToken("month_year", int(match.group("year_month")), None, span,
+                           (match.start("year_month"), match.end("year_month_month")),
+                           month=int(match.group("year_month_month")))
+
+    grouped = match.group("grouped")
+    if grouped is not None:
+        number_group = "grouped"
+        value = int("".join(ch for ch in grouped if ch not in _GROUP_SEPARATORS))
+    else:
+        number_group = "plain"
+        plain = match.group("plain")
+        value = float(plain.replace(",", ".")) if "." in plain or "," in plain else int(plain)
+    number_span = match.span(number_group)
+    multiplier = match.group("multiplier")
+    if multiplier:
+        value = round(value * _MULTIPLIERS[multiplier.rstrip(".").lower()])
+
+    prefix = match.group("prefix")
+    if last == "currency":
+        return NumberToken("currency", value, currency_code(match.group("currency")), span, number_span)
+    if last in _UNIT_KINDS:
+        if prefix:
+            # "$ 100 км" — валюта относится не к этому числу
+            span = (number_span[0], span[1])
+        return NumberToken(last, value, _UNIT_NAMES[last], span, number_span)
+    if prefix:
+        return NumberToken("currency", value, currency_code(prefix), span, number_span)
+    if number_group == "plain" and not multiplier and type(value) is int and len(plain) == 4 \
+            and YEAR_RANGE[0] <= value <= YEAR_RANGE[1]:
+        return NumberToken("year", value, match.group("year_suffix"), span, number_span)
+    if last == "year_suffix":
+        # "5 г." — не год: суффикс к токену не относится
+        span = (span[0], match.end("multiplier") if multiplier else number_span[1])
+    return NumberToken("number", value, None, span, number_span)
+
+
+def tokenize(text: str) -> list[NumberToken]:
+    """Все числовые токены строки в порядке появления."""
+    return [_make_token(match) for match in _NUMBER_TOKEN_RE.finditer(text)]
+
+
+def tokens_in(tokens: list[NumberToken], start: int, end: int) -> list[NumberToken]:
+    """Токены, цифры которых начинаются внутри [start, end) — например, в группе совпадения экстрактора."""
+    return [token for token in tokens if start <= token.number_span[0] < end]
+
+
+def read_number(text: str, kinds: tuple[str, ...] = None) -> int | float | None:
+    """Значение первого токена (нужного вида) в тексте или None."""
+    for token in tokenize(text):
+        if kinds is None or token.kind in kinds:
+            return token.value
+    return None
@@ -0,0 +1,89 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def caption_key(text: str, version: str = "") -> str:
+    """
+    Ключ кэша: хэш подписи и версии словарей. Подпись берётся как есть:
+    пробелы и эмодзи попадают в поля результата (например, description),
+    поэтому перепост с другими пробелами разбирается заново.
+    """
+    digest = hashlib.sha256(version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Ограниченный LRU-кэш результатов парсинга с TTL.
+
+    Хранит и отдаёт глубокие копии значений, поэтому вызывающий код
+    (например, process_session, дописывающий поля в car_data) не может
+    испортить закэшированную запись.
+    maxsize -- максимум записей; при переполнении вытесняется самая старая по обращению
+    ttl     -- время жизни записи в секундах (None — без ограничения)
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, clock=time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        """Копия значения по ключу или None при промахе / истёкшей записи."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is not None and self._clock() >= expires_at:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value):
+        """Сохраняет копию значения."""
+        value = copy.deepcopy(value)
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
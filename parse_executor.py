@@ -0,0 +1,136 @@
+"""
+Парсинг вне event loop.
+
+parse_car_text — синхронный и тяжёлый по регуляркам, поэтому бот отдаёт
+его в пул потоков или процессов через ParseExecutor, а сам продолжает
+принимать апдейты. Семафор ограничивает число одновременных разборов,
+остальные ждут в очереди; глубина очереди и время ожидания видны в stats().
+
+    executor = ParseExecutor(kind="process", workers=2, max_in_flight=4)
+    data, failed = await parse_car_text_async(caption, return_failures=True, executor=executor)
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+
+from brand_index import BrandIndex, get_brand_index, reload_brand_index
+from parse_limits import ParseLimits
+from parse_trace import LatencyHistogram, ParseTrace
+from line_classifier import LineTable
+from parser import _init_parse_worker, _parse_car_text, _parse_with_table
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+def _process_context():
+    # Не fork: в боте к этому моменту работают потоки (наблюдатель словарей, чистка
+    # сессий, запись SQLite), и дочерний процесс унаследовал бы их захваченные блокировки
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _parse_in_process(text: str, version: str, limits: ParseLimits = None):
+    """Разбор в дочернем процессе; словари догоняют версию родителя, если она сменилась."""
+    index = get_brand_index()
+    if index.version != version:
+        reload_brand_index()
+        index = get_brand_index()
+    return _parse_car_text(text, index, None, limits)
+
+
+class ParseExecutor:
+    """
+    kind          -- "thread" или "process"
+    workers       -- размер пула (None — по умолчанию concurrent.futures)
+    max_in_flight -- сколько разборов одновременно отдано в пул (по умолчанию workers или 4)
+
+    Пул создаётся при первом разборе. В режиме "process" ParseTrace не
+    заполняется: разбор идёт в другом процессе.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = None, max_in_flight: int = None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind: {kind!r}, expected one of {EXECUTOR_KINDS}")
+        self.kind = kind
+        self.workers = workers
+        self.max_in_flight = max_in_flight or workers or 4
+        self._pool = None
+        self._semaphore = None
+        self._loop = None
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = LatencyHistogram()
+        self.run_time = LatencyHistogram()
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_process_context(),
+                                                 initializer=_init_parse_worker)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parse")
+        return self._pool
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+        return self._semaphore
+
+    async def parse(self, text: str, index: BrandIndex, trace: ParseTrace = None, limits: ParseLimits = None,
+                    previous: LineTable = None):
+        """
+        ((CarListing, failed, route), LineTable) — как parser._parse_with_table, но в пуле.
+        Из процесса таблица строк не возвращается (в ней re.Match): вместо неё None,
+        и previous тоже не передаётся.
+        """
+        semaphore = self._get_semaphore()
+        queued = perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started = perf_counter()
+        self.wait_time.observe(started - queued)
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            if self.kind == "process":
+                result = await loop.run_in_executor(pool, _parse_in_process, text, index.version, limits), None
+            else:
+                result = await loop.run_in_executor(pool, _parse_with_table, text, index, trace, limits, previous)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.run_time.observe(perf_counter() - started)
+            semaphore.release()
+        self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "in_flight": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait": self.wait_time.snapshot(),
+            "run": self.run_time.snapshot(),
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
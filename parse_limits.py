@@ -0,0 +1,57 @@
+"""
+Ограничения для разбора недоверенного текста.
+
+Подпись Telegram — до 4096 символов, и в ней может оказаться что угодно:
+тысячи цифр и пробелов, строки без переводов, незакрытые скобки. Регулярки
+стратегий не прерываются, поэтому время разбора ограничивается в два шага:
+вход обрезается (символы, строки, длина строки), а между стратегиями
+проверяется дедлайн — по его истечении возвращается то, что успели разобрать,
+с "deadline" в списке неудавшихся полей.
+"""
+from time import perf_counter
+
+DEADLINE_FAILURE = "deadline"
+
+
+class ParseLimits:
+    """
+    max_chars       -- максимум символов всего сообщения
+    max_lines       -- максимум непустых строк
+    max_line_length -- максимум символов в строке (хвост отбрасывается)
+    time_budget     -- секунд на разбор одного сообщения (None — без дедлайна)
+    """
+    __slots__ = ("max_chars", "max_lines", "max_line_length", "time_budget")
+
+    def __init__(self, max_chars: int = 4096, max_lines: int = 200, max_line_length: int = 512,
+                 time_budget: float | None = 0.5):
+        self.max_chars = max_chars
+        self.max_lines = max_lines
+        self.max_line_length = max_line_length
+        self.time_budget = time_budget
+
+    def clip(self, text: str) -> str:
+        """Текст в пределах ограничений; короткие сообщения возвращаются как есть."""
+        if len(text) > self.max_chars:
+            text = text[:self.max_chars]
+        lines = text.splitlines()
+        if len(lines) <= self.max_lines and all(len(line) <= self.max_line_length for line in lines):
+            return text
+        kept = []
+        non_empty = 0
+        for line in lines:
+            if line.strip():
+                if non_empty >= self.max_lines:
+                    break
+                non_empty += 1
+            kept.append(line[:self.max_line_length])
+        return "\n".join(kept)
+
+    def deadline(self) -> float | None:
+        """Момент perf_counter(), после которого разбор прекращается."""
+        if self.time_budget is None:
+            return None
+        return perf_counter() + self.time_budget
+
+    def __repr__(self):
+        return (f"ParseLimits(max_chars={self.max_chars}, max_lines={self.max_lines}, "
+                f"max_line_length={self.max_line_length}, time_budget={self.time_budget})")
@@ -0,0 +1,155 @@
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from time import perf_counter
+
+# Границы корзин гистограммы, в микросекундах (последняя корзина — всё, что больше)
+HISTOGRAM_BOUNDS_US = (10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000,
+                       25_000, 50_000, 100_000, 250_000, 1_000_000)
+
+_NULL_STAGE = nullcontext()
+
+
+class ParseTrace:
+    """
+    Трассировка одного вызова parse_car_text.
+    stages    -- этап -> суммарное время в секундах (classify_lines, strategy:emoji, api_ninjas, ...)
+    fields    -- поле -> время экстракторов этого поля при классификации строк
+    predicted -- стратегия, выбранная detect_format
+    route     -- стратегия, давшая итоговый результат (None, если ни одна)
+    cache_hit -- результат взят из кэша parse_car_text
+    total     -- полное время вызова
+    """
+    __slots__ = ("stages", "fields", "predicted", "route", "cache_hit", "total")
+
+    def __init__(self):
+        self.stages = {}
+        self.fields = {}
+        self.predicted = None
+        self.route = None
+        self.cache_hit = False
+        self.total = 0.0
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_field(self, field: str, seconds: float):
+        self.fields[field] = self.fields.get(field, 0.0) + seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "predicted": self.predicted,
+            "route": self.route,
+            "cache_hit": self.cache_hit,
+            "total_us": round(self.total * 1e6, 1),
+            "stages_us": {name: round(s * 1e6, 1) for name, s in self.stages.items()},
+            "fields_us": {name: round(s * 1e6, 1) for name, s in self.fields.items()},
+        }
+
+
+class _StageTimer:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: ParseTrace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add_stage(self.name, perf_counter() - self.start)
+        return False
+
+
+def timed(trace: ParseTrace | None, name: str):
+    """Контекст замера этапа; без трассировки — общий пустой контекст."""
+    if trace is None:
+        return _NULL_STAGE
+    return _StageTimer(trace, name)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами (по умолчанию HISTOGRAM_BOUNDS_US, в мкс)."""
+
+    def __init__(self, bounds: tuple[int, ...] = HISTOGRAM_BOUNDS_US):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds * 1e6)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, q: float) -> float | None:
+        """Верхняя граница корзины, в которую попадает перцентиль q (в мкс)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": round(self.sum / self.count * 1e6, 1) if self.count else None,
+            "p50_us": self.percentile(0.5),
+            "p99_us": self.percentile(0.99),
+            "buckets_us": dict(zip([*map(str, self.bounds), "inf"], self.counts)),
+        }
+
+
+class TimingHistograms:
+    """Агрегированные по всем вызовам гистограммы этапов и полей и счётчики стратегий."""
+
+    def __init__(self):
+        self.total = LatencyHistogram()
+        self.stages = {}
+        self.fields = {}
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace: ParseTrace):
+        with self._lock:
+            self.total.observe(trace.total)
+            for name, seconds in trace.stages.items():
+                self.stages.setdefault(name, LatencyHistogram()).observe(seconds)
+            for name, seconds in trace.fields.items():
+                self.fields.setdefault(name, LatencyHistogram()).observe(seconds)
+            route = "cache" if trace.cache_hit else str(trace.route)
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total.snapshot(),
+                "stages": {name: h.snapshot() for name, h in self.stages.items()},
+                "fields": {name: h.snapshot() for name, h in self.fields.items()},
+                "routes": dict(self.routes),
+            }
+
+
+_histograms = None
+
+
+def enable_timing_histograms() -> TimingHistograms:
+    """Включает трассировку каждого вызова parse_car_text с накоплением гистограмм."""
+    global _histograms
+    _histograms = TimingHistograms()
+    return _histograms
+
+
+def disable_timing_histograms():
+    global _histograms
+    _histograms = None
+
+
+def get_timing_histograms() -> TimingHistograms | None:
+    return _histograms
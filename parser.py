@@ -1,65 +1,462 @@
+import logging
+import os
 import re
-from collections import defaultdict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from time import perf_counter
+
+# load_* остаются доступны из parser для обратной совместимости
+from brand_index import (
+    BrandIndex,
+    get_brand_index,
+    load_brand_list,
+    load_brand_map,
+    load_model_patterns,
+)
+from car_catalog import lookup_car
+from car_listing import CarListing
+from line_classifier import LineTable, classify_lines
+from number_lexer import NumberToken, read_number, tokenize
+from parse_cache import ParseCache, caption_key
+from parse_limits import DEADLINE_FAILURE, ParseLimits
+from parse_trace import ParseTrace, get_timing_histograms, timed
+from regex_registry import register
+
+
+# Регулярные выражения парсера: именованные, компилируются один раз (см. regex_registry)
+_STRUCTURED_KEY_RE = register("route.structured_key", r"(?:Бренд|Марка):", re.IGNORECASE)
+# Заголовок Lynk&Co — только в начале строки (допускаются пробелы и эмодзи перед ним)
+_LYNK_HEADER_RE = register("route.lynk_header", r"[\W_]*Lynk\s*&?\s*Co", re.IGNORECASE)
+
+_SPACES_RE = register("common.spaces", r"\s+")
+_NON_WORD_RE = register("common.non_word", r"[^\w\s]")
+_CYRILLIC_RE = register("common.cyrillic", r"[А-Яа-яЁё]+")
+
+_LABEL_COLON_RE = register("brand_model.label_colon", r"[:：]")
+_OPEN_PAREN_RE = register("brand_model.open_paren", r"\(")
+
+_STRUCTURED_BRAND_MODEL_RE = register("structured.brand_model", r"(?:Бренд|Марка):\s*(.+)", re.IGNORECASE)
+_STRUCTURED_MODEL_LINE_RE = register("structured.model_line", r"(?:Модель):\s*(.+)", re.IGNORECASE)
+_STRUCTURED_ENGINE_RE = register("structured.engine", r"Двигатель:\s*(.+)", re.IGNORECASE)
+_STRUCTURED_FIELDS = (
+    ("price", register("structured.price", r"Цена.*?:\s*([\d\s.,$]+)", re.IGNORECASE)),
+    ("mileage", register("structured.mileage", r"Пробег:\s*([\d\s.,]+)", re.IGNORECASE)),
+    ("car_type", register("structured.car_type", r"Тип:\s*(.+)", re.IGNORECASE)),
+    ("description", register("structured.description", r"(?:Описание|Дополнительно|Прочее):\s*(.+)", re.IGNORECASE)),
+)
+
+_NON_ASCII_RE = register("emoji.non_ascii", r"[^\x00-\x7F]+")
+
+_LYNK_MODEL_RE = register("lynk.model", r"Lynk\s*&?\s*Co\s+(\d+)", re.IGNORECASE)
+_LYNK_HEADER_MODEL_PREFIX_RE = register("lynk.header_model_prefix", r"Lynk\s*&?\s*Co\s+\d+\s*", re.IGNORECASE)
+_LYNK_HEADER_PREFIX_RE = register("lynk.header_prefix", r"Lynk\s*&?\s*Co\s*", re.IGNORECASE)
+
+# Строки с этими паттернами уже разобраны в поля и не идут в описание
+_UNSTRUCTURED_PROCESSED = tuple(
+    register(f"unstructured.processed_{i}", pattern, re.IGNORECASE)
+    for i, pattern in enumerate([
+        r"[Сс]тоимость", r"[Цц]ена", r"\d{4}\s*г\.в\.",
+        r"\d+\s*(?:л\.с\.|лс)", r"привод"
+    ])
+)
+
+_PARENTHESES_RE = register("brand_model.parentheses", r'\([^)]+\)')
+_BRAND_MODEL_NOISE_RE = register("brand_model.noise", r'[^\w\s\-\.]')
+_ASCII_ALNUM_RE = register("brand_model.ascii_alnum", r'[a-zA-Z0-9]')
+# Что не должно попадать в модификацию после модели
+_MODIFICATION_EXCLUDE = (
+    register("modification.seats", r'(?:\d+)?\s*(?:места|мест|seat(?:er|s)?)', re.IGNORECASE),  # "7 мест", "7 seater"
+    register("modification.power_hp_ru", r'\d+\s*л\.?с\.?', re.IGNORECASE),  # "220 л.с." или "220 лс"
+    register("modification.power_hp", r'\d+\s*hp', re.IGNORECASE),
+    register("modification.power_kw", r'\d+\s*kw', re.IGNORECASE),
+)
+
+# Названия комплектаций (обычно отдельное название пакета)
+_TRIM_PATTERNS = (
+    register("trim.package", r'(flagship|premium|luxury|sport|s-?line|m-?sport|avantgarde|amg|f-?sport|lounge|style|exclusive)'),
+    register("trim.edition", r'(edition|line|package|collection|limited)'),
+    register("trim.level", r'(comfort|elegance|ambition|active|scout|rs|gt|fr)'),
+)
+_TRIM_EXCLUDE = (
+    register("trim.exclude_seats", r'(?:\d+)?\s*(?:места|мест|seat(?:er|s)?)', re.IGNORECASE),  # Места
+    register("trim.exclude_power", r'\d+\s*(?:л\.?с\.?|hp|kw|ps)', re.IGNORECASE),  # Мощность
+    register("trim.exclude_cyrillic", r'[а-яА-Я]+', re.IGNORECASE),  # Русский текст (кроме комплектаций)
+)
+
+# Суффикс версии у модели-цифры: "Li 8 Pro" — модель "8 Pro", а не "8" с модификацией "Pro"
+_NUMERIC_MODEL_SUFFIX_RE = register("model.numeric_suffix", r'(?:pro|max|ultra|plus|air)$', re.IGNORECASE)
+
+_ENGINE_SPLIT_RE = register("engine.split_description", r"(.*?(?:л\.с\.|kWh))\s*[,;:\-–]?\s*(.*)", re.IGNORECASE)
 
 
 def clean_number(val):
-    cleaned = re.sub(r"[^\d]", "", val)
-    if not cleaned:
+    """Число из фрагмента строки ("1.414.000 ", "35 тыс.") — первый токен number_lexer."""
+    value = read_number(val)
+    if value is None:
         print(f"[WARN] clean_number: пустое значение после очистки: {val}")
         return 0
-    return int(cleaned)
+    return int(value)
+
+
+def _hit_number(table: LineTable, hit: tuple, group: int = 1):
+    """Число из группы совпадения экстрактора — из токенов строки, без повторной очистки цифр."""
+    token = table.token(hit, group)
+    if token is None:
+        return clean_number(hit[1].group(group))
+    return int(token.value)
+
+
+def _price_currency(token: NumberToken | None, line: str, default=None) -> str:
+    """Валюта цены: единица самого числа ("1 414 000 руб."), иначе по всей строке."""
+    if token is not None and token.kind == "currency":
+        return token.unit
+    return default(line) if default is not None else detect_currency(line)
+
+
+# Заглушка бренда/модели у неструктурированных сообщений без бренда
+UNKNOWN_BRAND = "Неизвестно"
+
+# Стратегии парсинга в порядке прежнего каскада
+FORMAT_ROUTES = ("structured", "emoji", "lynk", "unstructured")
+
+
+def detect_format(text: str, table: LineTable = None, index: BrandIndex = None) -> str:
+    """
+    Быстро определяет наиболее вероятный формат сообщения по внешним признакам:
+    - "structured"   -- есть ключи 'Марка:' / 'Бренд:'
+    - "lynk"         -- первая строка начинается с заголовка Lynk&Co
+    - "unstructured" -- сообщение начинается с цены, а бренда в начале нет
+    - "emoji"        -- всё остальное (🔹-списки и 'бренд модель' в первой строке)
+    """
+    if _STRUCTURED_KEY_RE.search(text):
+        return "structured"
+    if table is None:
+        table = classify_lines(text)
+    if not table:
+        return "emoji"
+    first_line = table.lines[0]
+    if _LYNK_HEADER_RE.match(first_line.text):
+        return "lynk"
+    if "price" in first_line.tags:
+        index = index or get_brand_index()
+        # Заголовок эмодзи-формата — первые строки сообщения
+        if not index.matcher.find(" ".join(table.texts[:5])):
+            return "unstructured"
+    return "emoji"
+
+
+def _run_format_parser(route: str, text: str, index: BrandIndex, table: LineTable) -> tuple[CarListing, list[str]]:
+    if route == "structured":
+        return _try_structured_parse(text, index)
+    if route == "emoji":
+        return _try_emoji_format_parse(text, index, table)
+    if route == "lynk":
+        return _try_lynk_format_parse(text, index, table)
+    return _try_unstructured_specs_parse(text, index, table)
+
+
+# Необязательный кэш результатов parse_car_text (см. enable_parse_cache)
+_parse_cache = None
+# Таблицу строк не возвращать (return_table=False)
+_NO_TABLE = object()
 
 
-def parse_car_text(text: str, return_failures=False):
+def enable_parse_cache(maxsize: int = 1024, ttl: float = 3600) -> ParseCache:
+    """
+    Включает LRU-кэш перед parse_car_text. Повторные перепосты одного объявления
+    (с точностью до пробелов и эмодзи-модификаторов) не проходят каскад
+    и локальный справочник заново. Ключ учитывает версию словарей.
+    """
+    global _parse_cache
+    _parse_cache = ParseCache(maxsize=maxsize, ttl=ttl)
+    return _parse_cache
+
+
+def disable_parse_cache():
+    global _parse_cache
+    _parse_cache = None
+
+
+def get_parse_cache() -> ParseCache | None:
+    return _parse_cache
+
+
+def parse_car_text(text: str, return_failures=False, index: BrandIndex = None, return_route=False,
+                   trace: ParseTrace = None, as_listing=False, limits: ParseLimits = None):
     """
     Парсинг текста с описанием автомобиля.
+    Словари брендов и моделей берутся из общего индекса (см. brand_index.get_brand_index).
+
+    Сначала запускается стратегия, выбранная detect_format, остальные — только
+    как запасные, в порядке FORMAT_ROUTES. С return_route=True возвращает
+    (data, failed, route), где route — стратегия, давшая результат.
+    data — словарь полей, с as_listing=True — CarListing.
+    Если включён кэш (enable_parse_cache), результат берётся из него.
+
+    trace -- необязательный ParseTrace: заполняется временем этапов и полей
+    и итоговой стратегией. При включённых гистограммах
+    (parse_trace.enable_timing_histograms) трассируется каждый вызов.
+
+    limits -- необязательный ParseLimits для недоверенного входа: текст
+    обрезается до лимитов, а по истечении time_budget каскад стратегий
+    останавливается и возвращается частичный результат с "deadline" в failed.
+
+    Если бренда или модели нет и в локальном справочнике тоже, выполняется
+    блокирующий запрос в API Ninjas. Из event loop вызывайте parse_car_text_async.
     """
-    brand_list = load_brand_list()
-    data, failed = _try_structured_parse(text, brand_list)
-    if not data or data.get("brand") is None or not data.get("model"):
-        data, failed = _try_emoji_format_parse(text, brand_list)
-        if not data or data.get("brand") is None or not data.get("model"):
-            data, failed = _try_lynk_format_parse(text, brand_list)
-            if not data or data.get("brand") is None or not data.get("model"):
-                # Попробуем парсить без структуры
-                data, failed = _try_unstructured_specs_parse(text, brand_list)
-                if not data or data.get("brand") is None or not data.get("model"):
-                    # Используем улучшенный парсер бренда/модели
-                    first_line = text.splitlines()[0] if text.splitlines() else text
-                    brand, model, modifications = improved_brand_model_parse(first_line, brand_list)
-                    if brand and model:
-                        if not data:
-                            data = {}
-                        data["brand"] = brand
-                        data["model"] = model
-                        
-                        # Process modifications to separate trim and other modifications
-                        if modifications:
-                            trim_and_mods = separate_trim_from_modifications(modifications)
-                            if trim_and_mods.get("trim"):
-                                data["trim"] = trim_and_mods["trim"]
-                            if trim_and_mods.get("modification"):
-                                data["modification"] = trim_and_mods["modification"]
-                            
-                        failed = []  # мы не валим на ошибке в этом режиме
-    # --- API Ninjas fallback ---
-    if (not data.get("brand") or not data.get("model")) and data.get("description"):
+    trace, start = _start_trace(trace)
+    index = index or get_brand_index()
+    if limits is not None:
+        text = limits.clip(text)
+    data, failed, route = _parse_cached(text, index, trace, limits)
+
+    if _needs_car_lookup(data):
         try:
             from api_ninjas import get_car_info_from_ninjas
-            ninjas_info = get_car_info_from_ninjas(data["description"])
-            if ninjas_info:
-                if ninjas_info.get("make"):
-                    data["brand"] = ninjas_info["make"]
-                if ninjas_info.get("model"):
-                    data["model"] = ninjas_info["model"]
+            with timed(trace, "api_ninjas"):
+                _apply_car_info(data, get_car_info_from_ninjas(data["description"]))
         except Exception as e:
             print(f"[API NINJAS FALLBACK ERROR] {e}")
-    if return_failures:
-        return data, failed
-    return data
+
+    return _finish_parse(data, failed, route, trace, start, return_failures, return_route, as_listing)
 
 
-def detect_brand_and_model(raw_string: str, brand_list: list[str]) -> tuple[str, str]:
+async def parse_car_text_async(text: str, return_failures=False, index: BrandIndex = None, return_route=False,
+                               trace: ParseTrace = None, as_listing=False, executor=None,
+                               limits: ParseLimits = None, return_table=False):
+    """
+    То же, что parse_car_text, но запрос в API Ninjas идёт через асинхронный
+    клиент (api_ninjas.get_ninjas_client) и не блокирует event loop.
+
+    executor -- необязательный parse_executor.ParseExecutor: сам разбор
+    выполняется в его пуле, а кэш проверяется и пополняется здесь.
+    return_table -- последним элементом вернуть LineTable сообщения для
+    последующих правок (None, если результат взят из кэша или разобран
+    в другом процессе).
+    """
+    trace, start = _start_trace(trace)
+    index = index or get_brand_index()
+    if limits is not None:
+        text = limits.clip(text)
+    (data, failed, route), table = await _parse_cached_async(text, index, trace, executor, limits)
+    await _lookup_remote_async(data, trace)
+    return _finish_parse(data, failed, route, trace, start, return_failures, return_route, as_listing,
+                         table if return_table else _NO_TABLE)
+
+
+def _start_trace(trace: ParseTrace | None) -> tuple[ParseTrace | None, float]:
+    if trace is None and get_timing_histograms() is not None:
+        trace = ParseTrace()
+    return trace, perf_counter() if trace is not None else 0.0
+
+
+def _parse_cached(text: str, index: BrandIndex, trace: ParseTrace | None,
+                  limits: ParseLimits = None) -> tuple[CarListing, list[str], str | None]:
+    cache = _parse_cache
+    if cache is None:
+        return _parse_car_text(text, index, trace, limits)
+    key = caption_key(text, index.version)
+    cached = cache.get(key)
+    if cached is None:
+        cached = _parse_car_text(text, index, trace, limits)
+        # Результат, прерванный дедлайном, зависит от нагрузки — не кэшируем
+        if DEADLINE_FAILURE not in cached[1]:
+            cache.put(key, cached)
+    elif trace is not None:
+        trace.cache_hit = True
+    return cached
+
+
+async def _parse_cached_async(text: str, index: BrandIndex, trace: ParseTrace | None, executor,
+                              limits: ParseLimits = None) -> tuple[tuple[CarListing, list[str], str | None],
+                                                                   LineTable | None]:
+    """(результат, LineTable или None); без executor разбор идёт прямо здесь."""
+    cache = _parse_cache
+    if cache is not None:
+        key = caption_key(text, index.version)
+        cached = cache.get(key)
+        if cached is not None:
+            if trace is not None:
+                trace.cache_hit = True
+            return cached, None
+    if executor is None:
+        result, table = _parse_with_table(text, index, trace, limits)
+    else:
+        result, table = await executor.parse(text, index, trace, limits)
+    if cache is not None and DEADLINE_FAILURE not in result[1]:
+        cache.put(key, result)
+    return result, table
+
+
+async def _lookup_remote_async(data: CarListing, trace: ParseTrace = None):
+    """Если бренда или модели нет, спрашивает API Ninjas через асинхронный клиент."""
+    if not _needs_car_lookup(data):
+        return
+    try:
+        from api_ninjas import get_ninjas_client
+        with timed(trace, "api_ninjas"):
+            _apply_car_info(data, await get_ninjas_client().get_car_info(data["description"]))
+    except Exception as e:
+        print(f"[API NINJAS FALLBACK ERROR] {e}")
+
+
+def _finish_parse(data: CarListing, failed: list[str], route: str | None, trace: ParseTrace | None, start: float,
+                  return_failures: bool, return_route: bool, as_listing: bool, table=_NO_TABLE):
+    if trace is not None:
+        trace.route = route
+        trace.total = perf_counter() - start
+        histograms = get_timing_histograms()
+        if histograms is not None:
+            histograms.record(trace)
+    if not as_listing:
+        data = data.to_dict()
+
+    if return_route:
+        result = (data, failed, route)
+    elif return_failures:
+        result = (data, failed)
+    elif table is _NO_TABLE:
+        return data
+    else:
+        result = (data,)
+    return result if table is _NO_TABLE else result + (table,)
+
+
+def _needs_car_lookup(data: CarListing) -> bool:
+    """Нужен ли внешний справочник: нет бренда или модели, но есть описание."""
+    return (not data.get("brand") or not data.get("model")) and bool(data.get("description"))
+
+
+def _apply_car_info(data: CarListing, car_info: dict | None):
+    """Переносит {"make", "model"} из справочника или API Ninjas в результат."""
+    if not car_info:
+        return
+    if car_info.get("make"):
+        data["brand"] = car_info["make"]
+    if car_info.get("model"):
+        data["model"] = car_info["model"]
+
+
+def _parse_car_text(text: str, index: BrandIndex, trace: ParseTrace = None, limits: ParseLimits = None,
+                    table: LineTable = None) -> tuple[CarListing, list[str], str | None]:
+    deadline = limits.deadline() if limits is not None else None
+    # Строки классифицируются один раз и переиспользуются всеми стратегиями
+    if table is None:
+        with timed(trace, "classify_lines"):
+            table = classify_lines(text, trace)
+    with timed(trace, "detect_format"):
+        predicted = detect_format(text, table, index)
+    if trace is not None:
+        trace.predicted = predicted
+
+    data, failed = CarListing(), []
+    route = None
+    # Результат с заглушкой вместо бренда: годится, только если никто не найдёт настоящий
+    placeholder = None
+    for candidate in (predicted,) + tuple(r for r in FORMAT_ROUTES if r != predicted):
+        with timed(trace, f"strategy:{candidate}"):
+            data, failed = _run_format_parser(candidate, text, index, table)
+        if data and data.get("brand") is not None and data.get("model"):
+            if data.get("brand") != UNKNOWN_BRAND:
+                route = candidate
+                break
+            if placeholder is None:
+                placeholder = (data, failed, candidate)
+        if deadline is not None and perf_counter() >= deadline:
+            # Частичный результат последней стратегии, остальные этапы пропускаем
+            logging.warning(f"[PARSE DEADLINE] Stopped after strategy {candidate!r}")
+            return data, failed + [DEADLINE_FAILURE], None
+
+    if route is None and placeholder is not None:
+        data, failed, route = placeholder
+
+    if route is None or data.get("brand") == UNKNOWN_BRAND:
+        # Используем улучшенный парсер бренда/модели
+        first_line = text.splitlines()[0] if text.splitlines() else text
+        with timed(trace, "improved_brand_model_parse"):
+            brand, model, modifications = improved_brand_model_parse(first_line, index)
+        if brand and model:
+            route = "first_line"
+            if not data:
+                data = CarListing()
+            data["brand"] = brand
+            data["model"] = model
+            
+            # Process modifications to separate trim and other modifications
+            if modifications:
+                with timed(trace, "separate_trim_from_modifications"):
+                    trim_and_mods = separate_trim_from_modifications(modifications)
+                if trim_and_mods.get("trim"):
+                    data["trim"] = trim_and_mods["trim"]
+                if trim_and_mods.get("modification"):
+                    data["modification"] = trim_and_mods["modification"]
+                
+            failed = []  # мы не валим на ошибке в этом режиме
+
+    logging.debug(f"[ROUTE] predicted={predicted} used={route}")
+
+    # --- Локальный справочник (API Ninjas — уже после кэша, см. parse_car_text) ---
+    if _needs_car_lookup(data):
+        with timed(trace, "car_catalog"):
+            _apply_car_info(data, lookup_car(data["description"], data.get("year")))
+    return data, failed, route
+
+
+def _parse_with_table(text: str, index: BrandIndex, trace: ParseTrace = None, limits: ParseLimits = None,
+                      previous: LineTable = None) -> tuple[tuple[CarListing, list[str], str | None], LineTable]:
+    """
+    _parse_car_text плюс таблица строк — для правок сообщений (см. message_edits).
+    previous -- таблица прежней версии текста: заново классифицируются только новые строки.
+    """
+    with timed(trace, "classify_lines"):
+        table = classify_lines(text, trace, previous)
+    return _parse_car_text(text, index, trace, limits, table), table
+
+
+def _init_parse_worker():
+    # Каждый процесс загружает словари брендов и моделей один раз
+    get_brand_index()
+
+
+def _parse_chunk(texts: list[str]) -> list[tuple[dict, list[str]]]:
+    index = get_brand_index()
+    return [parse_car_text(text, return_failures=True, index=index) for text in texts]
+
+
+def parse_many(texts, workers: int = None, chunksize: int = 64):
+    """
+    Пакетный парсинг: генератор пар (data, failed), как parse_car_text(..., return_failures=True).
+    Порядок результатов совпадает с порядком входных текстов.
+
+    Тексты раздаются пачками по chunksize в пул из workers процессов
+    (по умолчанию — по числу ядер). Вперёд отправляется не больше 2 * workers
+    пачек, так что входной итератор читается по мере выдачи результатов.
+    workers=1 — парсинг в текущем процессе, без пула.
+    """
+    workers = workers or os.cpu_count() or 1
+    texts = iter(texts)
+
+    if workers <= 1:
+        index = get_brand_index()
+        for text in texts:
+            yield parse_car_text(text, return_failures=True, index=index)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker) as executor:
+        pending = deque()
+        while True:
+            chunk = list(islice(texts, chunksize))
+            if not chunk:
+                break
+            pending.append(executor.submit(_parse_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def detect_brand_and_model(raw_string: str, index: BrandIndex = None) -> tuple[str, str]:
     """
     Ищет бренд в начале строки и делит её на brand и model.
     Возвращает бренд с оригинальным регистром (как в brands.txt), модель — первую часть после бренда (до пробела или скобки/скобок).
@@ -67,6 +464,8 @@ def detect_brand_and_model(raw_string: str, brand_list: list[str]) -> tuple[str,
     Для строк типа 'Марка: BRAND MODEL (extra)' модель = MODEL (до скобки).
     Для 'Модель:' строк модель = полная строка.
     """
+    index = index or get_brand_index()
+
     # Default return values
     brand = ""
     model = ""
@@ -74,24 +473,24 @@ def detect_brand_and_model(raw_string: str, brand_list: list[str]) -> tuple[str,
     # Handling "Марка:" format
     if "Марка:" in raw_string or "Бренд:" in raw_string:
         # Split by colon
-        parts = re.split(r'[:：]', raw_string, 1)
+        parts = _LABEL_COLON_RE.split(raw_string, 1)
         if len(parts) > 1:
             brand_model = parts[1].strip()
-            return detect_brand_and_model(brand_model, brand_list)
+            return detect_brand_and_model(brand_model, index)
     
     # Handle "Модель:" format differently
     if raw_string.strip().startswith("Модель:"):
         # For "Модель:" lines, consider everything after the colon as the model
-        parts = re.split(r'[:：]', raw_string, 1)
+        parts = _LABEL_COLON_RE.split(raw_string, 1)
         if len(parts) > 1:
             model = parts[1].strip()
             # Try to find a brand within the model
-            for b in sorted(brand_list, key=len, reverse=True):
-                if b.lower() in model.lower():
-                    brand = b
-                    # Remove brand from model
-                    model = re.sub(r'(?i)\b' + re.escape(b) + r'\b', '', model).strip()
-                    break
+            found = index.matcher.find(model)
+            if found:
+                b = found[0]
+                brand = index.canonical(b)
+                # Remove brand from model
+                model = re.sub(r'(?i)\b' + re.escape(b) + r'\b', '', model).strip()
             return brand, model
     
     # Normal processing for other formats
@@ -99,139 +498,70 @@ def detect_brand_and_model(raw_string: str, brand_list: list[str]) -> tuple[str,
     if not words:
         return "", ""
     
-    brand_map = load_brand_map()
     raw = raw_string.strip()
-    raw_lower = raw.lower()
     first_word = raw.split()[0].lower() if raw.split() else ""
-    # Try short form mapping FIRST using brand_map
-    if first_word in brand_map:
-        canonical_brand = brand_map[first_word]
-        model_part = raw[len(first_word):].strip()
-        model_core = re.split(r'\(', model_part)[0].strip() if model_part else ""
-        model_core = re.sub(r'[А-Яа-яЁё]+', '', model_core).strip()
+    # Try exact match (longest variant first, so 'li xiang' wins over 'li').
+    # Short forms and synonyms are mapped to the canonical brand via brand_map.
+    brand = index.matcher.match_prefix(raw)
+    if brand:
+        model_part = raw[len(brand):].strip()
+        model_core = _OPEN_PAREN_RE.split(model_part)[0].strip() if model_part else ""
+        model_core = _CYRILLIC_RE.sub('', model_core).strip()
         model = model_core
         if not model and model_part:
-            model = re.sub(r'[А-Яа-яЁё]+', '', model_part).strip()
+            model = _CYRILLIC_RE.sub('', model_part).strip()
+        canonical_brand = index.canonical(brand)
         return canonical_brand, model
-    # Try exact match
-    for brand in sorted(brand_list, key=lambda x: -len(x)):
-        brand_lower = brand.lower()
-        if raw_lower.startswith(brand_lower):
-            # Ensure we match only the brand, not a mapping line (e.g. 'li = Li Auto')
-            if '=' in brand:
-                continue
-            model_part = raw[len(brand):].strip()
-            model_core = re.split(r'\(', model_part)[0].strip() if model_part else ""
-            model_core = re.sub(r'[А-Яа-яЁё]+', '', model_core).strip()
-            model = model_core
-            if not model and model_part:
-                model = re.sub(r'[А-Яа-яЁё]+', '', model_part).strip()
-            canonical_brand = brand_map.get(brand_lower, brand)
-            return canonical_brand, model
     # Try partial match: first word of input matches first word of a brand
-    for brand in sorted(brand_list, key=lambda x: -len(x)):
-        brand_first_word = brand.split()[0].lower()
-        if first_word and first_word == brand_first_word:
-            model_part = raw[len(first_word):].strip()
-            model_core = re.split(r'\(', model_part)[0].strip() if model_part else ""
-            model_core = re.sub(r'[А-Яа-яЁё]+', '', model_core).strip()
-            model = model_core
-            if not model and model_part:
-                model = re.sub(r'[А-Яа-яЁё]+', '', model_part).strip()
-            canonical_brand = brand_map.get(brand_lower, brand)
-            return canonical_brand, model
+    brand = index.matcher.match_first_word(first_word) if first_word else None
+    if brand:
+        model_part = raw[len(first_word):].strip()
+        model_core = _OPEN_PAREN_RE.split(model_part)[0].strip() if model_part else ""
+        model_core = _CYRILLIC_RE.sub('', model_core).strip()
+        model = model_core
+        if not model and model_part:
+            model = _CYRILLIC_RE.sub('', model_part).strip()
+        canonical_brand = index.canonical(brand)
+        return canonical_brand, model
     return None, None  # fallback, not raw_string
 
 
-def load_brand_list(filepath="brands.txt") -> list[str]:
-    # Only return canonical brand names and synonyms, skip mapping lines
-    result = []
-    with open(filepath, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            if '=' in line:
-                left, right = [x.strip() for x in line.split('=', 1)]
-                # Add both left (synonym) and right (canonical) for matching
-                result.append(left)
-                result.append(right)
-            else:
-                result.append(line)
-    return result
-
-
-def load_brand_map(filepath="brands.txt") -> dict:
-    """Returns a mapping from each synonym/variant to canonical brand (first occurrence wins)."""
-    brand_map = {}
-    brand_list = load_brand_list(filepath)
-    
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-                
-            # Split by commas, and clean each part
-            parts = [p.strip() for p in line.split(",")]  # Keep original case for the canonical brand
-            if not parts:
-                continue
-                
-            canonical = parts[0]  # First part is the canonical brand (proper case)
-            
-            # Map each variant (lowercase) to the canonical brand (proper case)
-            for variant in parts:
-                variant_lower = variant.lower()
-                if variant_lower not in brand_map:  # First occurrence wins
-                    brand_map[variant_lower] = canonical  # Store original case
-    except Exception as e:
-        print(f"Error loading brand map: {e}")
-        # Return a mapping from each brand to itself if file can't be loaded
-        brand_map = {b.lower(): b for b in brand_list}  # Preserve original case
-        
-    return brand_map
-
-
-def parse_car_text_freeform(text: str, brand_list: list[str]) -> dict:
+def parse_car_text_freeform(text: str, index: BrandIndex = None) -> dict:
     lines = text.splitlines()
     result = {}
 
     # 🧠 1-я строка — бренд + модель
     if lines:
-        brand, model = detect_brand_and_model(lines[0], brand_list)
+        brand, model = detect_brand_and_model(lines[0], index)
         result["brand"] = brand
         result["model"] = model
 
+    tokens = [tokenize(line) for line in lines]
+
     # 📅 Поиск года
-    for line in lines:
-        match = re.search(r"\b(20\d{2})(?:[\/\-\.](0?[1-9]|1[0-2]))?\b", line)
-        if match:
-            year_str = match.group(1)  # Берём только год
-            result["year"] = int(year_str)
+    for line_tokens in tokens:
+        year = next((t.value for t in line_tokens if t.kind in ("year", "month_year") and t.value >= 2000), None)
+        if year:
+            result["year"] = year
             break
 
     # 🛣️ Пробег
-    for line in lines:
+    for line, line_tokens in zip(lines, tokens):
         if "пробег" in line.lower():
-            km = re.search(r"([\d\s.,]+)\s*км", line.lower())
+            km = next((t for t in line_tokens if t.kind == "km"), None)
             if km:
-                result["mileage"] = clean_number(km.group(1))
+                result["mileage"] = km.value
             break
 
     # 💰 Цена
     for line in lines:
         # Look for price indicators including 💲, $ or word 'цена'
         if ("цена" in line.lower() or "$" in line or "₽" in line or "¥" in line or "💲" in line or "💵" in line):
-            # Remove all non-digit/currency/space/emoji chars except separators
-            cleaned_line = line.replace('\xa0', ' ').replace('\u202f', ' ')
-            # Try to match price after any currency indicator or at end
-            price_match = re.search(r"([\d][\d\s.,]*)", cleaned_line)
-            if price_match:
-                result["price"] = clean_number(price_match.group(1))
-                result["currency"] = detect_currency(line)
+            # Первое число строки; разделители разрядов (в т.ч. неразрывные пробелы) разбирает лексер
+            price = next((t for t in tokenize(line) if t.kind in ("currency", "number")), None)
+            if price:
+                result["price"] = price.value
+                result["currency"] = _price_currency(price, line)
             break
 
     # 📜 Описание — всё остальное
@@ -246,30 +576,20 @@ def parse_car_text_freeform(text: str, brand_list: list[str]) -> dict:
     return result
 
 
-def _try_structured_parse(text: str, brand_list: list[str]) -> tuple[dict, list[str]]:
-    brand_model_pattern = r"(?:Бренд|Марка):\s*(.+)"
-    model_line_pattern = r"(?:Модель):\s*(.+)"  # Added pattern for "Модель:" line
-    engine_pattern = r"Двигатель:\s*(.+)"
-    patterns = {
-        "price": r"Цена.*?:\s*([\d\s.,$]+)",
-        "mileage": r"Пробег:\s*([\d\s.,]+)",
-        "car_type": r"Тип:\s*(.+)",
-        "description": r"(?:Описание|Дополнительно|Прочее):\s*(.+)"
-    }
-
-    result = {}
+def _try_structured_parse(text: str, index: BrandIndex = None) -> tuple[CarListing, list[str]]:
+    result = CarListing()
     failed = []
 
     # 🧠 Brand + Model
-    match = re.search(brand_model_pattern, text, re.IGNORECASE)
+    match = _STRUCTURED_BRAND_MODEL_RE.search(text)
     if match:
         full = match.group(1).strip()
-        brand, model = detect_brand_and_model(full, brand_list)
+        brand, model = detect_brand_and_model(full, index)
         result["brand"] = brand
         result["model"] = model
         
         # Special handling for "Бренд:" + "Модель:" format where Model line contains modifications
-        model_match = re.search(model_line_pattern, text, re.IGNORECASE)
+        model_match = _STRUCTURED_MODEL_LINE_RE.search(text)
         if model_match:
             # If we have a "Модель:" line, use its content as modification
             modification = model_match.group(1).strip()
@@ -279,7 +599,7 @@ def _try_structured_parse(text: str, brand_list: list[str]) -> tuple[dict, list[
         failed.append("brand/model")
 
     # ⚙️ Двигатель
-    match = re.search(engine_pattern, text, re.IGNORECASE)
+    match = _STRUCTURED_ENGINE_RE.search(text)
     if match:
         raw_engine = match.group(1).strip()
         val, extra = split_engine_and_description(raw_engine)
@@ -295,15 +615,12 @@ def _try_structured_parse(text: str, brand_list: list[str]) -> tuple[dict, list[
         failed.append("engine")
 
     # 📦 Остальные поля
-    for key, pattern in patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
+    for key, pattern in _STRUCTURED_FIELDS:
+        match = pattern.search(text)
         if match:
             val = match.group(1).strip()
             if key in ["price", "mileage"]:
-                try:
-                    val = clean_number(val)
-                except:
-                    pass
+                val = clean_number(val)
             result[key] = val
             # --- Add currency detection for price field ---
             if key == "price":
@@ -314,15 +631,15 @@ def _try_structured_parse(text: str, brand_list: list[str]) -> tuple[dict, list[
                         price_line = line
                         break
                 if price_line:
-                    result["currency"] = detect_currency(price_line)
+                    price = next((t for t in tokenize(price_line) if t.value == val), None)
+                    result["currency"] = _price_currency(price, price_line)
         else:
             failed.append(key)
 
     return result, failed
 
 
-
-def _try_emoji_format_parse(text: str, brand_list: list[str]) -> tuple[dict, list[str]]:
+def _try_emoji_format_parse(text: str, index: BrandIndex = None, table: LineTable = None) -> tuple[CarListing, list[str]]:
     """
     Парсер для сообщений с эмодзи и символами формата:
     🔹Geely Coolray 260T Battle
@@ -333,14 +650,17 @@ def _try_emoji_format_parse(text: str, brand_list: list[str]) -> tuple[dict, lis
     🛞Привод: Передний
     💸Цена под ключ в РФ: 1.414.000 руб.
     """
-    result = {}
+    result = CarListing()
     failed = []
     
     # Разделяем на строки и убираем пустые
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if table is None:
+        table = classify_lines(text)
+    lines = table.texts
     
     # Gather car-related information from first few lines
     car_info_lines = []
+    native_info_lines = []  # строки, потерявшие кириллицу при очистке, в исходном виде
     found_specific_section = False
     
     # Check first few lines for car information
@@ -355,19 +675,32 @@ def _try_emoji_format_parse(text: str, brand_list: list[str]) -> tuple[dict, lis
             break
             
         # Clean line from emojis and other symbols
-        clean_line = re.sub(r'[^\w\s]', ' ', line)
-        clean_line = re.sub(r'[^\x00-\x7F]+', ' ', clean_line)  # Remove non-ASCII
-        clean_line = re.sub(r'\s+', ' ', clean_line).strip()
+        clean_line = _NON_WORD_RE.sub(' ', line)
+        native_line = _SPACES_RE.sub(' ', clean_line).strip()
+        clean_line = _NON_ASCII_RE.sub(' ', clean_line)  # Remove non-ASCII
+        clean_line = _SPACES_RE.sub(' ', clean_line).strip()
         
         if clean_line:
             car_info_lines.append(clean_line)
+        if native_line != clean_line:
+            native_info_lines.append(native_line)
     
     # Combine all car info lines
-    if car_info_lines:
-        combined_car_info = " ".join(car_info_lines)
-        
-        # Now use improved_brand_model_parse to extract brand, model, and modifications
-        brand, model, modification = improved_brand_model_parse(combined_car_info, brand_list)
+    if car_info_lines or native_info_lines:
+        brand = model = modification = None
+        if car_info_lines:
+            combined_car_info = " ".join(car_info_lines)
+
+            # Now use improved_brand_model_parse to extract brand, model, and modifications
+            brand, model, modification = improved_brand_model_parse(combined_car_info, index)
+
+        # Бренд, написанный кириллицей ('Хавал F7', 'Хавал Джолион'), теряется при очистке
+        # не-ASCII символов: пробуем строки заголовка как есть, по одной
+        if not brand:
+            for native_line in native_info_lines:
+                brand, model, modification = improved_brand_model_parse(native_line, index)
+                if brand:
+                    break
         
         if brand:
             result["brand"] = brand
@@ -385,99 +718,69 @@ def _try_emoji_format_parse(text: str, brand_list: list[str]) -> tuple[dict, lis
         failed.append("brand/model")
     
     # Continue with the rest of the parsing for other fields (year, mileage, engine, etc.)
+    # Все совпадения уже посчитаны классификатором строк (см. line_classifier)
     # Год выпуска (Год: XX/XXXX или просто XXXX)
     if "year" not in result:  # Проверяем, не был ли год найден ранее
-        year_pattern = r"[Гг]од:?\s*(?:\d+[\/\.])?(\d{4})"
-        for line in lines:
-            match = re.search(year_pattern, line)
-            if match:
-                year_str = match.group(1)
-                result["year"] = int(year_str)
-                break
+        hit = table.first("year_label")
+        if hit:
+            result["year"] = _hit_number(table, hit)
     
     # Пробег (Пробег: XX.XXXkm или просто цифры + km/км)
-    mileage_pattern = r"[Пп]робег:?\s*([\d\s\.,]+)(?:km|км|тыс\.км|тыс|т\.км|Km)"
-    for line in lines:
-        match = re.search(mileage_pattern, line)
-        if match:
-            mileage_str = match.group(1)
-            result["mileage"] = clean_number(mileage_str)
-            break
+    hit = table.first("mileage_label_km")
+    if hit:
+        result["mileage"] = _hit_number(table, hit)
     
     # Если пробег не найден, ищем дополнительно в тексте
     if "mileage" not in result:
         # Ищем формат "X.XXXKm!!!" или подобные
-        extra_mileage_pattern = r"(\d[\d\s\.,]*)\s*(?:Km|km|км)"
-        for line in lines:
-            match = re.search(extra_mileage_pattern, line)
-            if match:
-                mileage_str = match.group(1)
-                result["mileage"] = clean_number(mileage_str)
-                break
+        hit = table.first("mileage_km")
+        if hit:
+            result["mileage"] = _hit_number(table, hit)
     
     # Двигатель: ДВС/Двигатель: X.XТ XXX л.с.
-    engine_pattern = r"(?:ДВС|[Дд]вигатель):?\s*(.+)"
-    for line in lines:
-        match = re.search(engine_pattern, line)
-        if match:
-            raw_engine = match.group(1).strip()
-            val, extra = split_engine_and_description(raw_engine)
-            result["engine"] = val
-            # Добавляем остаток в description
-            if extra and "description" not in result:
-                result["description"] = extra
-            break
+    hit = table.first("engine_label")
+    if hit:
+        raw_engine = hit[1].group(1).strip()
+        val, extra = split_engine_and_description(raw_engine)
+        result["engine"] = val
+        # Добавляем остаток в description
+        if extra and "description" not in result:
+            result["description"] = extra
     
     # Трансмиссия: АКПП/МКПП/DSG/CVT/DCT и т.д.
-    transmission_pattern = r"(?:АКПП|КПП|трансмиссия):?\s*[-:]\s*([^,\n\r]+)"
-    for line in lines:
-        match = re.search(transmission_pattern, line)
-        if match:
-            result["transmission"] = match.group(1).strip()
-            break
+    hit = table.first("transmission_label")
+    if hit:
+        result["transmission"] = hit[1].group(1).strip()
     
     # Привод: Полный/Передний/Задний/4WD/AWD и т.д.
-    drive_pattern = r"[Пп]ривод:?\s*(.+)"
-    for line in lines:
-        match = re.search(drive_pattern, line)
-        if match:
-            result["drive_type"] = match.group(1).strip()
-            break
+    hit = table.first("drive_label")
+    if hit:
+        result["drive_type"] = hit[1].group(1).strip()
     
     # Цена: различные форматы с валютой
-    price_patterns = [
-        r"(?:Цена|Стоимость|💸|[Ии]тогов)[^\d]*?([\d\s\.,]+)[^\d]*(руб|₽|\$|USD|EUR|€)",
-        r"([\d\s\.,]+)(?:\s*)(?:руб|₽|\$|USD|EUR|€)",
-    ]
-    
-    for pattern in price_patterns:
-        for line in lines:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                price_str = match.group(1)
-                try:
-                    result["price"] = clean_number(price_str)
-                    result["currency"] = detect_currency(line)
-                except:
-                    # Защита от ошибок при парсинге цены
-                    pass
-                break
-        if "price" in result:
+    for name in ("price_label_currency_i", "price_currency_i"):
+        hit = table.first(name)
+        if hit:
+            token = table.token(hit)
+            result["price"] = _hit_number(table, hit)
+            result["currency"] = _price_currency(token, hit[0])
             break
     
     # Все неопознанные строки объединяем в описание
     if "description" not in result:
         # Фильтруем строки, которые уже были обработаны
         desc_lines = []
-        for line in lines[1:]:
+        for classified in table.lines[1:]:
+            line = classified.text
+            matches = classified.matches
             # Пропускаем строки, содержащие уже обработанные паттерны
             if (
-                ("year" in result and re.search(r"20\d{2}", line)) 
-                or ("mileage" in result and re.search(mileage_pattern, line))
-                or ("engine" in result and re.search(engine_pattern, line))
-                or ("transmission" in result and re.search(transmission_pattern, line))
-                or ("drive_type" in result and re.search(drive_pattern, line))
-                or ("price" in result and any(re.search(p, line) for p in price_patterns))
+                ("year" in result and "year_digits" in matches)
+                or ("mileage" in result and "mileage_label_km" in matches)
+                or ("engine" in result and "engine_label" in matches)
+                or ("transmission" in result and "transmission_label" in matches)
+                or ("drive_type" in result and "drive_label" in matches)
+                or ("price" in result and ("price_label_currency" in matches or "price_currency" in matches))
             ):
                 continue
                 
@@ -485,8 +788,8 @@ def _try_emoji_format_parse(text: str, brand_list: list[str]) -> tuple[dict, lis
             if car_info_lines and line == car_info_lines[0]:
                 continue
                 
-            cleaned_line = re.sub(r'[^\w\s]', ' ', line)  # Убираем эмодзи и символы
-            cleaned_line = re.sub(r'\s+', ' ', cleaned_line).strip()  # Нормализуем пробелы
+            cleaned_line = _NON_WORD_RE.sub(' ', line)  # Убираем эмодзи и символы
+            cleaned_line = _SPACES_RE.sub(' ', cleaned_line).strip()  # Нормализуем пробелы
             
             if cleaned_line:
                 desc_lines.append(cleaned_line)
@@ -513,7 +816,7 @@ def _try_emoji_format_parse(text: str, brand_list: list[str]) -> tuple[dict, lis
     return result, failed
 
 
-def _try_lynk_format_parse(text: str, brand_list: list[str]) -> tuple[dict, list[str]]:
+def _try_lynk_format_parse(text: str, index: BrandIndex = None, table: LineTable = None) -> tuple[CarListing, list[str]]:
     """
     Парсер для сообщений в формате Lynk & Co:
     Lynk&Co 09 MHEV 7 мест 
@@ -528,183 +831,98 @@ def _try_lynk_format_parse(text: str, brand_list: list[str]) -> tuple[dict, list
     Полный привод - Haldex 
     ...
     """
-    result = {}
+    result = CarListing()
     failed = []
     
     # Разделяем на строки и убираем пустые
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if table is None:
+        table = classify_lines(text)
+    lines = table.texts
     if not lines:
-        return {}, ["empty_text"]
+        return CarListing(), ["empty_text"]
     
     # Проверка на первую строку с Lynk&Co
     first_line = lines[0]
     
     # Более строгий поиск с явным указанием Lynk&Co
-    lynk_match = re.search(r'Lynk\s*&?\s*Co', first_line, re.IGNORECASE)
+    lynk_match = _LYNK_HEADER_RE.match(first_line)
     if lynk_match:
         # Выделяем бренд и модель
         result["brand"] = "Lynk & Co"
         
         # Ищем модель (обычно число после Lynk&Co)
-        model_match = re.search(r'Lynk\s*&?\s*Co\s+(\d+)', first_line, re.IGNORECASE)
+        model_match = _LYNK_MODEL_RE.search(first_line)
         if model_match:
             result["model"] = model_match.group(1)
             
             # Extract modifications (everything after the model number)
-            model_info = re.sub(r'Lynk\s*&?\s*Co\s+\d+\s*', '', first_line, flags=re.IGNORECASE).strip()
+            model_info = _LYNK_HEADER_MODEL_PREFIX_RE.sub('', first_line).strip()
             if model_info:
                 # Store the modification information separately
                 result["modification"] = model_info
         else:
-            result["model"] = re.sub(r'Lynk\s*&?\s*Co\s*', '', first_line, flags=re.IGNORECASE).strip()
+            result["model"] = _LYNK_HEADER_PREFIX_RE.sub('', first_line).strip()
     else:
         # Если это не формат Lynk&Co, возвращаем пустой результат
-        return {}, ["not_lynk_format"]
+        return CarListing(), ["not_lynk_format"]
     
     # Поиск цены
-    price_patterns = [
-        r"[Сс]тоимость\s*[-–]\s*([\d\s\.,]+)",
-        r"[Сс]тоимость\s+([\d\s\.,]+)",
-        r"[Цц]ена\s*[-–]\s*([\d\s\.,]+)",
-        r"[Цц]ена\s+([\d\s\.,]+)",
-        r"([\d\s\.,]+)\s*(?:руб|₽|\$|USD|EUR|€)"
-    ]
-    
-    for pattern in price_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                price_str = match.group(1)
-                try:
-                    # Очищаем строку цены от всего кроме цифр
-                    result["price"] = clean_number(price_str)
-                    # Определяем валюту
-                    if "$" in line or "USD" in line or "долларов" in line:
-                        result["currency"] = "USD"
-                    elif "€" in line or "EUR" in line or "евро" in line:
-                        result["currency"] = "EUR"
-                    else:
-                        result["currency"] = "RUB"  # По умолчанию рубли
-                except:
-                    pass
-                break
-        if "price" in result:
+    for name in ("cost_dash", "cost_space", "price_dash", "price_space", "price_currency"):
+        hit = table.first(name)
+        if hit:
+            result["price"] = _hit_number(table, hit)
+            result["currency"] = _price_currency(table.token(hit), hit[0], _currency_or_rub)
             break
     
     # Поиск года выпуска
-    year_patterns = [
-        r'(\b20\d{2}\b)\s*(?:г\.в\.|год|г\.|года)',  # 4-значный год начиная с 20 с указанием что это год
-        r'(\b20\d{2}\b)',  # просто 4-значный год
-    ]
-    
-    for pattern in year_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                try:
-                    year = int(match.group(1))
-                    if 2000 <= year <= 2030:  # Разумный диапазон лет
-                        result["year"] = year
-                        break
-                except:
-                    pass
-        if "year" in result:
-            break
+    year = _find_year(table)
+    if year:
+        result["year"] = year
     
     # Поиск двигателя
-    engine_patterns = [
-        r"[Дд]вигатель.*?(\d+[\.,]?\d*\s*[ТТtT].*?(?:\d+\s*(?:л\.с\.|лс)))",
-        r"[Дд]вигатель.*?(\d+[\.,]?\d*\s*-\s*\d+\s*(?:л\.с\.|лс))",
-        r"[Дд]вигатель\s+(.*?\d+\s*(?:л\.с\.|лс))",
-        r"[Дд]вигатель\s+([^\n\r\(]+)(?:\(|$)",
-        r"[Дд]вигатель\s+([^-\n\r\(]+)(?:-|$)"  # Для строк типа "Двигатель VEA"
-    ]
-    
-    for pattern in engine_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                engine_info = match.group(1).strip()
-                result["engine"] = engine_info
-                break
-        if "engine" in result:
+    for name in ("engine_turbo_power", "engine_dash_power", "engine_power", "engine_paren", "engine_name"):
+        hit = table.first(name)
+        if hit:
+            result["engine"] = hit[1].group(1).strip()
             break
     
     # Если двигатель не найден, ищем по другим паттернам
     if "engine" not in result:
-        for line in lines:
-            # Ищем строку вида "Двигатель 2.0Т - 254 лс"
-            match = re.search(r'[Дд]вигатель\s+(\d+[\.,]?\d*\s*[ТТtT])\s*-\s*(\d+)\s*(?:л\.с\.|лс)', line)
-            if match:
-                engine_type = match.group(1).strip()
-                power = match.group(2).strip()
-                result["engine"] = f"{engine_type} {power} л.с."
-                break
+        # Ищем строку вида "Двигатель 2.0Т - 254 лс"
+        hit = table.first("engine_volume_power")
+        if hit:
+            engine_type = hit[1].group(1).strip()
+            power = _hit_number(table, hit, 2)
+            result["engine"] = f"{engine_type} {power} л.с."
             
     # Поиск трансмиссии
-    transmission_patterns = [
-        r"(?:АКПП|КПП|трансмиссия):?\s*[-:]\s*([^,\n\r]+)",
-        r"(?:АКПП|КПП|трансмиссия)\s+([^,\n\r]+)"
-    ]
-    
-    for pattern in transmission_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                result["transmission"] = match.group(1).strip()
-                break
-        if "transmission" in result:
+    for name in ("transmission_label", "transmission_word"):
+        hit = table.first(name)
+        if hit:
+            result["transmission"] = hit[1].group(1).strip()
             break
     
     # Поиск привода
-    drive_patterns = [
-        r"[Пп]олный\s+привод\s*[-:]\s*([^,\n\r]+)",
-        r"[Пп]олный\s+привод\s*-\s*([^,\n\r]+)",
-        r"[Пп]олный\s+привод",
-        r"[Пп]ередний\s+привод",
-        r"[Зз]адний\s+привод"
-    ]
-    
-    for pattern in drive_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match and len(match.groups()) > 0:
-                drive_info = match.group(1).strip()
-                if drive_info:
-                    result["drive_type"] = "Полный привод - " + drive_info
-                else:
-                    result["drive_type"] = "Полный привод"
-                break
-            elif match:
-                # Паттерн без групп - определяем тип привода из паттерна
-                if "полный" in pattern.lower():
-                    result["drive_type"] = "Полный привод"
-                elif "передний" in pattern.lower():
-                    result["drive_type"] = "Передний привод"
-                elif "задний" in pattern.lower():
-                    result["drive_type"] = "Задний привод"
-                break
-        if "drive_type" in result:
+    for name in ("drive_awd_colon", "drive_awd_dash"):
+        hit = table.first(name)
+        if hit:
+            drive_info = hit[1].group(1).strip()
+            if drive_info:
+                result["drive_type"] = "Полный привод - " + drive_info
+            else:
+                result["drive_type"] = "Полный привод"
             break
+    if "drive_type" not in result:
+        # Паттерны без групп - тип привода определяется самим паттерном
+        for name, drive_type in DRIVE_PHRASES:
+            if table.first(name):
+                result["drive_type"] = drive_type
+                break
     
     # Поиск пробега или максимальной скорости (часто указывается как лимитер)
-    mileage_patterns = [
-        r"(?:пробег|км|kmh|километр|пробег):?\s*[^\d]*([\d\.,\s]+)",
-        r"(?:\d+[\.,]?\d*)\s*(?:km|км)"
-    ]
-    
-    for pattern in mileage_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                try:
-                    mileage_str = match.group(1)
-                    result["mileage"] = clean_number(mileage_str)
-                    break
-                except:
-                    pass
-        if "mileage" in result:
-            break
+    hit = table.first("mileage_any")
+    if hit:
+        result["mileage"] = _hit_number(table, hit)
     
     # Составляем описание из всех строк, которые не были обработаны
     desc_lines = []
@@ -733,7 +951,7 @@ def _try_lynk_format_parse(text: str, brand_list: list[str]) -> tuple[dict, list
     return result, failed
 
 
-def _try_unstructured_specs_parse(text: str, brand_list: list[str]) -> tuple[dict, list[str]]:
+def _try_unstructured_specs_parse(text: str, index: BrandIndex = None, table: LineTable = None) -> tuple[CarListing, list[str]]:
     """
     Парсер для сообщений со спецификациями без явного указания бренда и модели:
     
@@ -750,180 +968,83 @@ def _try_unstructured_specs_parse(text: str, brand_list: list[str]) -> tuple[dic
     Запас хода на чистом электричестве - 160км батарея 40 кВтч
     Пневмоподвеска
     """
-    result = {}
+    result = CarListing()
     failed = []
     
     # Разделяем на строки и убираем пустые
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if table is None:
+        table = classify_lines(text)
+    lines = table.texts
     if not lines:
-        return {}, ["empty_text"]
+        return CarListing(), ["empty_text"]
     
     # Поиск цены
-    price_patterns = [
-        r"[Сс]тоимость\s*[-–]\s*([\d\s\.,]+)\s*(?:руб|₽)",
-        r"[Сс]тоимость\s+([\d\s\.,]+)\s*(?:руб|₽)",
-        r"[Цц]ена\s*[-–]\s*([\d\s\.,]+)\s*(?:руб|₽)",
-        r"[Цц]ена\s+([\d\s\.,]+)\s*(?:руб|₽)",
-        r"([\d\s\.,]+)\s*(?:руб|₽)"
-    ]
-    
-    for pattern in price_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                price_str = match.group(1)
-                try:
-                    result["price"] = clean_number(price_str)
-                    # Определяем валюту исходя из текста
-                    if "$" in line or "USD" in line or "долларов" in line:
-                        result["currency"] = "USD"
-                    elif "€" in line or "EUR" in line or "евро" in line:
-                        result["currency"] = "EUR"
-                    else:
-                        result["currency"] = "RUB"  # По умолчанию рубли
-                except:
-                    pass
-                break
-        if "price" in result:
+    for name in ("cost_dash_rub", "cost_space_rub", "price_dash_rub", "price_space_rub", "price_rub"):
+        hit = table.first(name)
+        if hit:
+            result["price"] = _hit_number(table, hit)
+            # Определяем валюту: по самому числу, иначе исходя из текста
+            result["currency"] = _price_currency(table.token(hit), hit[0], _currency_or_rub)
             break
     
     # Поиск года выпуска
-    year_patterns = [
-        r'(\b20\d{2}\b)\s*(?:г\.в\.|год|г\.|года)',  # 4-значный год начиная с 20 с указанием что это год
-        r'(\b20\d{2}\b)',  # просто 4-значный год
-    ]
-    
-    for pattern in year_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                try:
-                    year = int(match.group(1))
-                    if 2000 <= year <= 2030:  # Разумный диапазон лет
-                        result["year"] = year
-                        break
-                except:
-                    pass
-        if "year" in result:
-            break
+    year = _find_year(table)
+    if year:
+        result["year"] = year
     
     # Поиск мощности двигателя и создание структуры engine
-    power_patterns = [
-        r'(\d+)\s*(?:л\.с\.|лс|л/с|hp)', # число + л.с./лс/hp
-    ]
-    
-    for pattern in power_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                try:
-                    power = match.group(1).strip()
-                    # Проверяем, была ли найдена информация о двигателе
-                    if "engine" in result:
-                        # Дополняем информацию о мощности
-                        result["engine"] += f", {power} л.с."
-                    else:
-                        # Создаем новую запись
-                        result["engine"] = f"{power} л.с."
-                    break
-                except:
-                    pass
-        if "engine" in result:
-            break
+    hit = table.first("power")
+    if hit:
+        power = _hit_number(table, hit)
+        result["engine"] = f"{power} л.с."
     
     # Поиск типа двигателя
-    engine_type_patterns = [
-        r'[Пп]араллельный\s+гибрид',
-        r'[Гг]ибрид',
-        r'[Бб]ензин',
-        r'[Дд]изель',
-        r'[Ээ]лектро',
-        r'[Тт]урбо'
-    ]
-    
-    for pattern in engine_type_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                engine_type = match.group(0).strip()
-                if "engine" in result:
-                    # Если уже есть информация о мощности, добавляем тип двигателя
-                    result["engine"] = f"{engine_type}, " + result["engine"]
-                else:
-                    # Иначе просто записываем тип двигателя
-                    result["engine"] = engine_type
-                break
+    for name in ("engine_parallel_hybrid", "engine_hybrid", "engine_petrol",
+                 "engine_diesel", "engine_electric", "engine_turbo"):
+        hit = table.first(name)
+        if hit:
+            engine_type = hit[1].group(0).strip()
+            if "engine" in result:
+                # Если уже есть информация о мощности, добавляем тип двигателя
+                result["engine"] = f"{engine_type}, " + result["engine"]
+            else:
+                # Иначе просто записываем тип двигателя
+                result["engine"] = engine_type
         if "engine" in result and "гибрид" in result["engine"].lower():
             break
     
     # Поиск привода
-    drive_patterns = [
-        r'[Пп]олный\s+привод',
-        r'[Пп]ередний\s+привод',
-        r'[Зз]адний\s+привод',
-        r'4WD',
-        r'AWD',
-        r'FWD',
-        r'RWD'
-    ]
-    
-    for pattern in drive_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                drive_type = match.group(0).strip()
-                if drive_type.upper() == "4WD" or drive_type.upper() == "AWD":
-                    result["drive_type"] = "Полный привод"
-                elif drive_type.upper() == "FWD":
-                    result["drive_type"] = "Передний привод"
-                elif drive_type.upper() == "RWD":
-                    result["drive_type"] = "Задний привод"
-                else:
-                    result["drive_type"] = drive_type
-                break
-        if "drive_type" in result:
+    for name in [name for name, _ in DRIVE_PHRASES] + list(DRIVE_CODES):
+        hit = table.first(name)
+        if hit:
+            result["drive_type"] = DRIVE_CODES.get(name) or hit[1].group(0).strip()
             break
     
     # Поиск информации о пробеге или электрическом запасе хода
     ev_range = None
-    mileage_patterns = [
-        r'[Зз]апас\s+хода\s+.*?(\d+)\s*км',  # Запас хода ... XXX км
-        r'[Пп]робег\s*[:]*\s*(\d[\d\s\.,]+)',  # Пробег: XXX
-        r'(\d+[\d\s\.,]+)\s*(?:км|тыс\.км|тыс\s*км)'  # XXX км / тыс.км
-    ]
-    
-    for pattern in mileage_patterns:
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                try:
-                    mileage_str = match.group(1).strip()
-                    parsed_mileage = clean_number(mileage_str)
-                    
-                    # Если это запас хода электромобиля, добавляем в описание
-                    if "запас хода" in line.lower() and not ev_range:
-                        ev_range = f"Запас хода: {parsed_mileage} км"
-                    # Иначе это пробег автомобиля
-                    elif "пробег" in line.lower() or not "запас" in line.lower():
-                        result["mileage"] = parsed_mileage
-                    break
-                except:
-                    pass
+    for name in ("ev_range", "mileage_label", "mileage_thousands"):
+        hit = table.first(name)
+        if hit:
+            line = hit[0]
+            parsed_mileage = _hit_number(table, hit)
+            
+            # Если это запас хода электромобиля, добавляем в описание
+            if "запас хода" in line.lower() and not ev_range:
+                ev_range = f"Запас хода: {parsed_mileage} км"
+            # Иначе это пробег автомобиля
+            elif "пробег" in line.lower() or not "запас" in line.lower():
+                result["mileage"] = parsed_mileage
         if "mileage" in result:
             break
     
     # Составляем описание из всех строк, которые могут содержать важную информацию
     desc_lines = []
-    processed_patterns = [
-        r"[Сс]тоимость", r"[Цц]ена", r"\d{4}\s*г\.в\.", 
-        r"\d+\s*(?:л\.с\.|лс)", r"привод"
-    ]
     
     # Добавляем строки, которые не попали в основные поля
     for line in lines:
         should_add = True
-        for pattern in processed_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
+        for pattern in _UNSTRUCTURED_PROCESSED:
+            if pattern.search(line):
                 should_add = False
                 break
                 
@@ -949,59 +1070,14 @@ def _try_unstructured_specs_parse(text: str, brand_list: list[str]) -> tuple[dic
     
     # Если брэнд и модель отсутствуют, используем заглушку
     if "brand" not in result:
-        result["brand"] = "Неизвестно"
+        result["brand"] = UNKNOWN_BRAND
     if "model" not in result:
-        result["model"] = "Неизвестно"
+        result["model"] = UNKNOWN_BRAND
     
     return result, failed
 
 
-def load_model_patterns(filepath="models.txt") -> dict:
-    """
-    Load model patterns from a configuration file.
-    Returns a dictionary mapping brands to their model patterns.
-    
-    Format in the file:
-    brand:pattern_type:pattern_regex
-    """
-    model_patterns = defaultdict(dict)
-    
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-                
-            parts = line.split(":", 2)  # Split into at most 3 parts
-            if len(parts) < 2:
-                continue
-                
-            brand = parts[0].lower()
-            pattern_type = parts[1]
-            
-            # Handle the 'default' pattern type (a flag rather than a pattern)
-            if pattern_type == "default":
-                model_patterns[brand]["default"] = True
-                continue
-                
-            # Get the pattern regex if provided
-            pattern = parts[2] if len(parts) > 2 else ""
-            
-            # Initialize the pattern type if not already in the dict
-            if pattern_type not in model_patterns[brand]:
-                model_patterns[brand][pattern_type] = []
-                    
-            model_patterns[brand][pattern_type].append(pattern)
-    except Exception as e:
-        print(f"Error loading model patterns: {e}")
-    
-    return model_patterns
-
-
-def improved_brand_model_parse(text: str, brand_list: list[str]) -> tuple[str, str, str]:
+def improved_brand_model_parse(text: str, index: BrandIndex = None) -> tuple[str, str, str]:
     """
     Enhanced parser that separates brand, model, and modifications.
     Returns a tuple of (brand, model, modifications)
@@ -1011,9 +1087,9 @@ def improved_brand_model_parse(text: str, brand_list: list[str]) -> tuple[str, s
     - Model is the core model name that follows the brand
     - Modifications are additional descriptors, variants, trim levels, etc.
     """
-    import re
-    brand_map = load_brand_map()
-    model_patterns = load_model_patterns()
+    index = index or get_brand_index()
+    brand_map = index.brand_map
+    model_patterns = index.model_patterns
     
     raw = text.strip()
     raw_lower = raw.lower()
@@ -1023,15 +1099,14 @@ def improved_brand_model_parse(text: str, brand_list: list[str]) -> tuple[str, s
     clean_raw = raw
     
     # Extract all content in parentheses and save for later
-    parentheses_pattern = r'\([^)]+\)'
-    for match in re.finditer(parentheses_pattern, raw):
+    for match in _PARENTHESES_RE.finditer(raw):
         parentheses_content.append(match.group(0))
         clean_raw = clean_raw.replace(match.group(0), ' ')
     
     # Remove emoji and special characters for cleaner parsing
-    clean_text = re.sub(r'[^\w\s\-\.]', ' ', clean_raw).strip()
+    clean_text = _BRAND_MODEL_NOISE_RE.sub(' ', clean_raw).strip()
     # Remove extra spaces
-    clean_text = re.sub(r'\s+', ' ', clean_text)
+    clean_text = _SPACES_RE.sub(' ', clean_text)
     
     words = clean_text.split()
     if not words:
@@ -1041,19 +1116,18 @@ def improved_brand_model_parse(text: str, brand_list: list[str]) -> tuple[str, s
     brand = None
     model_start_idx = 0
     
-    # Try to match full brand names first (longer matches first)
-    for b in sorted(brand_list, key=lambda x: -len(x)):
-        b_lower = b.lower()
-        if b_lower in raw_lower:
-            # Check if it's at the beginning or preceded only by noise
-            b_pos = raw_lower.find(b_lower)
-            prefix = raw_lower[:b_pos].strip()
-            if b_pos == 0 or not re.search(r'[a-zA-Z0-9]', prefix):
-                # Use the proper case from brand_map here
-                brand = b  # Use the original case from brand_list
-                # Find where the model should start in the words list
-                model_start_idx = len(prefix.split()) + len(b.split())
-                break
+    # Try to match full brand names first (longer matches first).
+    # The brand must be at the beginning or preceded only by noise,
+    # i.e. start no later than the first latin letter/digit.
+    noise_match = _ASCII_ALNUM_RE.search(raw_lower)
+    found = index.matcher.find(raw, noise_match.start() if noise_match else None)
+    if found:
+        b, b_pos = found
+        prefix = raw_lower[:b_pos].strip()
+        # Use the proper case from brand_map here
+        brand = index.canonical(b)
+        # Find where the model should start in the words list
+        model_start_idx = len(prefix.split()) + len(b.split())
     # If no brand found, try matching just the first word against brand names
     if not brand and words:
         first_word = words[0].lower()
@@ -1063,13 +1137,16 @@ def improved_brand_model_parse(text: str, brand_list: list[str]) -> tuple[str, s
     
     # If still no brand, try partial matching with first words
     if not brand and words:
-        first_word = words[0].lower()
-        for b in brand_list:
-            b_parts = b.lower().split()
-            if b_parts and first_word == b_parts[0]:
-                brand = b  # Use original case from brand_list
-                model_start_idx = 1
-                break
+        b = index.matcher.match_first_word(words[0], longest_first=False)
+        if b:
+            brand = index.canonical(b)
+            model_start_idx = 1
+
+    # Last resort before giving up: typos and Cyrillic spelling ('Mersedes', 'Хавал')
+    if not brand and words and index.fuzzy:
+        found = index.fuzzy.resolve_brand(words)
+        if found:
+            brand, model_start_idx = found
     
     if not brand:
         return None, None, None
@@ -1077,117 +1154,55 @@ def improved_brand_model_parse(text: str, brand_list: list[str]) -> tuple[str, s
     # Step 2: Extract model and modifications
     # Get remaining text after brand
     remaining_words = words[model_start_idx:]
+    # Слова, которые сами называют бренд ('Mersedez = Mercedes-Benz'), моделью не считаются
+    while remaining_words:
+        if len(remaining_words) > 1 and index.canonical(" ".join(remaining_words[:2])) == brand:
+            remaining_words = remaining_words[2:]
+        elif index.canonical(remaining_words[0]) == brand:
+            remaining_words = remaining_words[1:]
+        else:
+            break
     if not remaining_words:
         return brand, "", ""
     
-    # Normalize the brand name for pattern matching
-    brand_lower = brand.lower()
-    
-    # Try to find model using patterns from the configuration file
+    # Try to find model using the compiled patterns from models.txt
     model = None
     model_end_idx = 0
-    brand_lower = ""  # Initialize brand_lower with a default value
-    
-    # If brand has patterns defined and we have a valid brand
-    if brand and brand.lower() in model_patterns:
-        brand_lower = brand.lower()
-        patterns = model_patterns[brand_lower]
-        
-        # Check if the brand uses default pattern
-        if 'default' in patterns:
-            # For default pattern, just take the first word as model
-            model = remaining_words[0]
-            model_end_idx = 1
-        else:
-            # Check for exact model names first
-            if 'model' in patterns:
-                for model_name in patterns['model']:
-                    model_name_lower = model_name.lower()
-                    if model_name_lower in ' '.join(remaining_words).lower():
-                        # Find where in the words this model appears
-                        for i, word in enumerate(remaining_words):
-                            if model_name_lower in word.lower():
-                                model = model_name
-                                model_end_idx = i + 1  # Include this word
-                                break
-                        if model:
-                            break
-            
-            # If no model found yet, try series/class patterns
-            if not model and 'series_class' in patterns:
-                for pattern in patterns['series_class']:
-                    series_match = re.search(pattern, ' '.join(remaining_words), re.IGNORECASE)
-                    if series_match:
-                        # Find which words contain this match
-                        match_position = series_match.start()
-                        match_end_position = series_match.end()
-                        
-                        # Count characters to find the words that contain the match
-                        start_idx = None
-                        end_idx = None
-                        char_count = 0
-                        
-                        for i, word in enumerate(remaining_words):
-                            next_char_count = char_count + len(word) + 1  # +1 for space
-                            if char_count <= match_position < next_char_count and start_idx is None:
-                                start_idx = i
-                            if char_count <= match_end_position < next_char_count:
-                                end_idx = i + 1  # +1 to include this word
-                                break
-                            char_count = next_char_count
-                        
-                        if start_idx is not None and end_idx is not None:
-                            model = ' '.join(remaining_words[start_idx:end_idx])
-                            model_end_idx = end_idx
-                            break
-            
-            # Try alphanumeric patterns
-            if not model and 'alphanumeric' in patterns:
-                for pattern in patterns['alphanumeric']:
-                    for i, word in enumerate(remaining_words[:2]):  # Only check first 2 words
-                        if re.match(pattern, word, re.IGNORECASE):
-                            model = word
-                            model_end_idx = i + 1  # Include this word
-                            break
-                    if model:
-                        break
-            
-            # Try prefix-number patterns (e.g., "RX 350")
-            if not model and 'prefix_number' in patterns and len(remaining_words) >= 2:
-                for pattern in patterns['prefix_number']:
-                    if re.match(pattern, remaining_words[0], re.IGNORECASE):
-                        model = remaining_words[0]
-                        model_end_idx = 1  # Just take the first word as model
-                        break
-    
+    brand_patterns = model_patterns.get(brand.lower())
+    if brand_patterns:
+        found = brand_patterns.find_model(remaining_words)
+        if found:
+            model, model_end_idx = found
+    
+    # Known model names with a typo ('Camri' -> 'Camry')
+    if not model and brand_patterns and not brand_patterns.default and index.fuzzy:
+        found = index.fuzzy.resolve_model(brand, remaining_words)
+        if found:
+            model, model_end_idx = found
+
     # If no model found using patterns, use default approach
     if not model:
         # Default: first word is model
         model = remaining_words[0]
         model_end_idx = 1
+        if model.isdigit() and len(remaining_words) > 1 and _NUMERIC_MODEL_SUFFIX_RE.match(remaining_words[1]):
+            model = f"{model} {remaining_words[1]}"
+            model_end_idx = 2
     
     # Extract modifications, but exclude certain patterns
     if len(remaining_words) > model_end_idx:
-        # These are patterns that should NOT be included in the modification
-        exclude_patterns = [
-            r'(?:\d+)?\s*(?:места|мест|seat(?:er|s)?)',  # Seating info like "7 мест" or "7 seater"
-            r'\d+\s*л\.?с\.?',  # Engine power like "220 л.с." or "220 лс"
-            r'\d+\s*hp',  # Engine power in hp
-            r'\d+\s*kw',  # Engine power in kW
-        ]
-        
         mod_candidates = remaining_words[model_end_idx:]
         filtered_mods = []
         
         # Join the remaining words for easier pattern matching
         mod_text = ' '.join(mod_candidates)
         
-        # Remove excluded patterns
-        for pattern in exclude_patterns:
-            mod_text = re.sub(pattern, '', mod_text, flags=re.IGNORECASE)
+        # Remove patterns that should NOT be included in the modification
+        for pattern in _MODIFICATION_EXCLUDE:
+            mod_text = pattern.sub('', mod_text)
         
         # Clean up resulting string
-        mod_text = re.sub(r'\s+', ' ', mod_text).strip()
+        mod_text = _SPACES_RE.sub(' ', mod_text).strip()
         
         return brand, model, mod_text
     
@@ -1205,17 +1220,10 @@ def separate_trim_from_modifications(text: str) -> dict:
     if not text:
         return result
     
-    # Trim words (usually appear as a distinct package name)
-    trim_patterns = [
-        r'(flagship|premium|luxury|sport|s-?line|m-?sport|avantgarde|amg|f-?sport|lounge|style|exclusive)',
-        r'(edition|line|package|collection|limited)',
-        r'(comfort|elegance|ambition|active|scout|rs|gt|fr)'
-    ]
-    
     # Find trim in the text
     trim = ""
-    for pattern in trim_patterns:
-        matches = re.finditer(pattern, text.lower())
+    for pattern in _TRIM_PATTERNS:
+        matches = pattern.finditer(text.lower())
         for match in matches:
             trim_match = match.group(0)
             if trim_match:
@@ -1227,21 +1235,14 @@ def separate_trim_from_modifications(text: str) -> dict:
             break
     
     # Clean up remaining modifications
-    modifications = re.sub(r'\s+', ' ', text).strip()
-    
-    # Exclude specific patterns from modifications
-    exclude_patterns = [
-        r'(?:\d+)?\s*(?:места|мест|seat(?:er|s)?)',  # Seating info
-        r'\d+\s*(?:л\.?с\.?|hp|kw|ps)',              # Engine power
-        r'[а-яА-Я]+',                                # Russian text (except for trim terms)
-    ]
+    modifications = _SPACES_RE.sub(' ', text).strip()
     
     # Remove excluded patterns from modifications
-    for pattern in exclude_patterns:
-        modifications = re.sub(pattern, '', modifications, flags=re.IGNORECASE)
+    for pattern in _TRIM_EXCLUDE:
+        modifications = pattern.sub('', modifications)
     
     # Clean up again
-    modifications = re.sub(r'\s+', ' ', modifications).strip()
+    modifications = _SPACES_RE.sub(' ', modifications).strip()
     
     # Store results
     if trim:
@@ -1253,6 +1254,15 @@ def separate_trim_from_modifications(text: str) -> dict:
     return result
 
 
+def _currency_or_rub(line: str) -> str:
+    """Валюта по тексту строки; без явных признаков — рубли."""
+    if "$" in line or "USD" in line or "долларов" in line:
+        return "USD"
+    elif "€" in line or "EUR" in line or "евро" in line:
+        return "EUR"
+    return "RUB"  # По умолчанию рубли
+
+
 def detect_currency(line: str) -> str:
     line = line.lower()
     if "$" in line or "usd" in line:
@@ -1267,10 +1277,44 @@ def split_engine_and_description(engine_str: str) -> tuple[str, str]:
     """
     Делит строку двигателя на основную часть и хвост после "л.с." или "kWh"
     """
-    pattern = r"(.*?(?:л\.с\.|kWh))\s*[,;:\-–]?\s*(.*)"
-    match = re.match(pattern, engine_str, re.IGNORECASE)
+    match = _ENGINE_SPLIT_RE.match(engine_str)
     if match:
         main = match.group(1).strip()
         extra = match.group(2).strip()
         return main, extra
-    return engine_str.strip(), ""
\ No newline at end of file
+    return engine_str.strip(), ""
+
+
+# Фразы привода без групп: тип определяется самим паттерном
+DRIVE_PHRASES = [
+    ("drive_awd", "Полный привод"),
+    ("drive_fwd", "Передний привод"),
+    ("drive_rwd", "Задний привод"),
+]
+
+# Латинские обозначения привода
+DRIVE_CODES = {
+    "drive_4wd_code": "Полный привод",
+    "drive_awd_code": "Полный привод",
+    "drive_fwd_code": "Передний привод",
+    "drive_rwd_code": "Задний привод",
+}
+
+
+def _find_year(table: LineTable) -> int | None:
+    """Год выпуска: сначала с пометкой 'г.в.'/'год', потом любой 20XX в разумном диапазоне."""
+    years = [token for _, token in table.tokens() if token.kind in ("year", "month_year")
+             and 2000 <= token.value <= 2030]  # Разумный диапазон лет
+    for token in years:
+        if token.unit is not None:
+            return token.value
+    return years[0].value if years else None
+
+
+if __name__ == "__main__":
+    # python -m parser: потоковый разбор архивов (см. parser_cli)
+    import sys
+
+    from parser_cli import main
+
+    sys.exit(main())
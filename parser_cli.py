@@ -0,0 +1,251 @@
+"""
+Пакетный разбор архивов объявлений вне бота.
+
+    python -m parser messages.jsonl -o parsed.jsonl --workers 4
+    python -m parser result.json -o parsed.jsonl --resume
+    cat messages.jsonl | python -m parser > parsed.jsonl
+
+Вход — JSONL (объект с полем text/caption на строку или просто JSON-строка)
+или экспорт Telegram Desktop (result.json), файлом или через stdin.
+Оба формата читаются потоково: память не зависит от размера архива.
+На выходе — JSONL: {"offset", "id", "date", "data", "failed"} на каждое
+сообщение с текстом. offset — номер входной записи, по нему --resume
+продолжает прерванный прогон.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections import deque
+from itertools import chain
+
+from parser import parse_many
+
+_READ_CHUNK = 1 << 16
+_MESSAGES_KEY_RE = re.compile(r'"messages"\s*:\s*\[')
+
+
+def _message_text(value) -> str:
+    """Текст сообщения Telegram: строка или список строк и сущностей {"type", "text"}."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in value)
+    return ""
+
+
+def iter_jsonl(stream):
+    """(id, date, text) для каждой строки JSONL; пустые и битые строки дают текст ''."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"[WARN] Skipping invalid JSONL line: {e}", file=sys.stderr)
+            yield None, None, ""
+            continue
+        if isinstance(record, str):
+            yield None, None, record
+        elif isinstance(record, dict):
+            text = record.get("text") or record.get("caption") or ""
+            yield record.get("id", record.get("message_id")), record.get("date"), _message_text(text)
+        else:
+            yield None, None, ""
+
+
+def iter_telegram_export(stream):
+    """
+    (id, date, text) для каждого элемента массива "messages" экспорта Telegram Desktop.
+    Объекты разбираются по одному через raw_decode из скользящего буфера.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        chunk = stream.read(_READ_CHUNK)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+    # Ищем начало массива сообщений
+    while True:
+        match = _MESSAGES_KEY_RE.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            return
+        # Хвост оставляем: ключ может оказаться на границе чанков
+        buffer = buffer[-32:]
+        fill()
+
+    pos = 0
+    while True:
+        # Пропускаем пробелы и запятые между элементами
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = "", 0
+            fill()
+        if pos >= len(buffer) or buffer[pos] == "]":
+            return
+        try:
+            message, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer, pos = buffer[pos:], 0
+            fill()
+            continue
+        buffer, pos = buffer[end:], 0
+        if message.get("type", "message") != "message":
+            yield message.get("id"), message.get("date"), ""
+            continue
+        yield message.get("id"), message.get("date"), _message_text(message.get("text"))
+
+
+def iter_records(stream, fmt: str = "auto"):
+    """Выбирает формат входа: telegram, если первая непустая строка не является целым JSON."""
+    if fmt == "auto":
+        head = []
+        fmt = "jsonl"
+        for line in stream:
+            head.append(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                fmt = "telegram"
+            else:
+                # Экспорт, сохранённый одной строкой
+                if isinstance(record, dict) and "messages" in record:
+                    fmt = "telegram"
+            break
+        if fmt == "telegram":
+            return iter_telegram_export(_Prepend("".join(head), stream))
+        return iter_jsonl(chain(head, stream))
+    if fmt == "telegram":
+        return iter_telegram_export(stream)
+    return iter_jsonl(stream)
+
+
+class _Prepend:
+    """Поток с уже прочитанным началом — для повторного чтения после определения формата."""
+
+    def __init__(self, head: str, stream):
+        self._head = head
+        self._stream = stream
+
+    def read(self, size: int = -1) -> str:
+        if self._head:
+            head, self._head = self._head, ""
+            return head
+        return self._stream.read(size)
+
+
+def last_offset(path: str) -> int | None:
+    """
+    offset последней полностью записанной строки результата (файл читается с конца).
+    Недописанный хвост прерванного прогона обрезается, чтобы дописывать с чистой строки.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        pos, tail = size, b""
+        found = None
+        while found is None:
+            lines = tail.split(b"\n")
+            # Первый элемент может быть обрезан границей блока, последний — недописан
+            for line in reversed(lines[1:-1] if pos > 0 else lines[:-1]):
+                try:
+                    found = json.loads(line)["offset"]
+                    break
+                except (ValueError, KeyError, TypeError):
+                    continue
+            if found is not None or pos == 0:
+                break
+            step = min(_READ_CHUNK, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+        f.truncate(size - len(lines[-1]))
+    return found
+
+
+def run(stream, out, fmt="auto", workers=1, chunksize=64, start=0, limit=None) -> int:
+    """Разбирает записи из stream, начиная с offset start; возвращает число записанных строк."""
+    pending = deque()
+
+    def texts():
+        for offset, (record_id, date, text) in enumerate(iter_records(stream, fmt)):
+            if limit is not None and offset >= start + limit:
+                break
+            if offset < start or not text.strip():
+                continue
+            pending.append((offset, record_id, date))
+            yield text
+
+    written = 0
+    for data, failed in parse_many(texts(), workers=workers, chunksize=chunksize):
+        offset, record_id, date = pending.popleft()
+        record = {"offset": offset, "id": record_id, "date": date, "data": data, "failed": failed}
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        written += 1
+        if written % chunksize == 0:
+            out.flush()
+    out.flush()
+    return written
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m parser", description=__doc__.split("\n\n")[0].strip())
+    arg_parser.add_argument("input", nargs="?", default="-", help="JSONL или result.json ('-' — stdin)")
+    arg_parser.add_argument("-o", "--output", default="-", help="JSONL с результатами ('-' — stdout)")
+    arg_parser.add_argument("--format", choices=("auto", "jsonl", "telegram"), default="auto")
+    arg_parser.add_argument("--workers", type=int, default=1, help="процессов для разбора (0 — по числу ядер)")
+    arg_parser.add_argument("--chunksize", type=int, default=64)
+    arg_parser.add_argument("--offset", type=int, default=0, help="пропустить первые N входных записей")
+    arg_parser.add_argument("--limit", type=int, help="разобрать не больше N входных записей")
+    arg_parser.add_argument("--resume", action="store_true",
+                            help="продолжить с записи после последнего offset в --output")
+    args = arg_parser.parse_args(argv)
+
+    start = args.offset
+    mode = "w"
+    if args.resume:
+        if args.output == "-":
+            arg_parser.error("--resume requires --output")
+        done = last_offset(args.output)
+        if done is not None:
+            start = max(start, done + 1)
+        mode = "a"
+
+    if args.output == "-":
+        # Результаты идут в исходный stdout, а отладочный вывод парсера
+        # (в том числе из дочерних процессов) перенаправляется в stderr
+        sys.stdout.flush()
+        out = open(os.dup(1), "w", encoding="utf-8")
+        os.dup2(2, 1)
+    else:
+        out = open(args.output, mode, encoding="utf-8")
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        written = run(stream, out, fmt=args.format, workers=args.workers or None,
+                      chunksize=args.chunksize, start=start, limit=args.limit)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        out.close()
+    print(f"[DONE] Parsed {written} messages starting at offset {start}", file=sys.stderr)
+    return 0
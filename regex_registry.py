@@ -0,0 +1,146 @@
+"""
+Реестр именованных предкомпилированных регулярных выражений.
+
+Паттерны объявляются один раз на уровне модуля через register() и дальше
+используются как обычные re.Pattern (search/match/sub/split/finditer).
+Со включённой статистикой (enable_regex_stats) для каждого паттерна
+считается, сколько раз его пробовали, сколько раз он совпал и сколько
+времени это заняло, — по этим данным убираются мёртвые паттерны
+и переупорядочиваются горячие. Выключенная статистика стоит одну проверку флага.
+"""
+import re
+import threading
+from time import perf_counter
+
+_patterns = {}
+_lock = threading.Lock()
+_stats_enabled = False
+
+
+class NamedPattern:
+    """Скомпилированный паттерн с именем и счётчиками (tries, hits, seconds)."""
+    __slots__ = ("name", "regex", "tries", "hits", "seconds")
+
+    def __init__(self, name: str, regex: re.Pattern):
+        self.name = name
+        self.regex = regex
+        self.tries = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    @property
+    def pattern(self) -> str:
+        return self.regex.pattern
+
+    def _count(self, start: float, hit: bool):
+        self.seconds += perf_counter() - start
+        self.tries += 1
+        if hit:
+            self.hits += 1
+
+    def search(self, string: str, *args):
+        if not _stats_enabled:
+            return self.regex.search(string, *args)
+        start = perf_counter()
+        match = self.regex.search(string, *args)
+        self._count(start, match is not None)
+        return match
+
+    def match(self, string: str, *args):
+        if not _stats_enabled:
+            return self.regex.match(string, *args)
+        start = perf_counter()
+        match = self.regex.match(string, *args)
+        self._count(start, match is not None)
+        return match
+
+    def sub(self, repl, string: str, count: int = 0) -> str:
+        if not _stats_enabled:
+            return self.regex.sub(repl, string, count)
+        start = perf_counter()
+        result, replaced = self.regex.subn(repl, string, count)
+        self._count(start, replaced > 0)
+        return result
+
+    def split(self, string: str, maxsplit: int = 0) -> list[str]:
+        if not _stats_enabled:
+            return self.regex.split(string, maxsplit)
+        start = perf_counter()
+        parts = self.regex.split(string, maxsplit)
+        self._count(start, len(parts) > 1)
+        return parts
+
+    def finditer(self, string: str, *args):
+        if not _stats_enabled:
+            return self.regex.finditer(string, *args)
+        start = perf_counter()
+        matches = list(self.regex.finditer(string, *args))
+        self._count(start, bool(matches))
+        return iter(matches)
+
+    def __repr__(self):
+        return f"NamedPattern({self.name!r}, {self.regex.pattern!r})"
+
+
+def register(name: str, pattern: str, flags: int = 0) -> NamedPattern:
+    """
+    Компилирует и регистрирует паттерн под именем.
+    Повторная регистрация того же паттерна возвращает существующий объект,
+    другого паттерна под тем же именем — ошибка.
+    """
+    with _lock:
+        existing = _patterns.get(name)
+        if existing is not None:
+            if existing.regex.pattern != pattern or existing.regex.flags != re.compile(pattern, flags).flags:
+                raise ValueError(f"Regex name {name!r} is already registered with a different pattern")
+            return existing
+        named = NamedPattern(name, re.compile(pattern, flags))
+        _patterns[name] = named
+        return named
+
+
+def get_pattern(name: str) -> NamedPattern:
+    return _patterns[name]
+
+
+def registered_patterns() -> dict[str, NamedPattern]:
+    return dict(_patterns)
+
+
+def regex_stats_enabled() -> bool:
+    return _stats_enabled
+
+
+def enable_regex_stats(reset: bool = True):
+    global _stats_enabled
+    if reset:
+        reset_regex_stats()
+    _stats_enabled = True
+
+
+def disable_regex_stats():
+    global _stats_enabled
+    _stats_enabled = False
+
+
+def reset_regex_stats():
+    for named in _patterns.values():
+        named.tries = 0
+        named.hits = 0
+        named.seconds = 0.0
+
+
+def regex_stats() -> list[dict]:
+    """Счётчики всех паттернов, самые дорогие по суммарному времени — первыми."""
+    rows = [
+        {
+            "name": named.name,
+            "tries": named.tries,
+            "hits": named.hits,
+            "hit_rate": round(named.hits / named.tries, 4) if named.tries else None,
+            "total_us": round(named.seconds * 1e6, 1),
+        }
+        for named in _patterns.values()
+    ]
+    rows.sort(key=lambda row: row["total_us"], reverse=True)
+    return rows
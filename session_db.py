@@ -0,0 +1,189 @@
+"""
+Постоянное хранение сессий и недособранных альбомов в SQLite.
+
+Деплой на fly.io (strategy = 'rolling') перезапускает процесс, и всё, что
+жило в памяти, — фото без подписи в SessionStore и альбомы в
+MediaGroupAggregator — терялось. SessionDatabase — необязательный бэкенд
+для обоих: изменения копятся в памяти и раз в flush_interval одной
+транзакцией пишутся фоновым потоком в SQLite в режиме WAL, так что event
+loop не платит за fsync на каждое фото. При старте load_sessions() и
+load_media_groups() возвращают то, что не успели обработать.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    touched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS media_groups (
+    group_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER,
+    message_id INTEGER,
+    images TEXT NOT NULL,
+    caption TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+# Значение в очереди записи: строка для INSERT OR REPLACE или _DELETE
+_DELETE = None
+
+
+class SessionDatabase:
+    """
+    path           -- файл SQLite (на fly.io — на volume)
+    flush_interval -- раз во сколько секунд фоновый поток сбрасывает изменения
+    Время в базе — настенные часы (time.time): монотонные не переживают перезапуск.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, clock=time.time):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._sessions = {}  # user_id -> (data, touched_at) | _DELETE
+        self._groups = {}  # group_id -> row | _DELETE
+        self._flusher = None
+        self._flusher_stop = threading.Event()
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_seconds = 0.0
+
+    # --- очередь записи (вызывается из event loop, без обращения к диску) ---
+
+    def save_session(self, user_id: int, session: dict, age: float = 0.0):
+        """age — сколько секунд назад сессия была активна."""
+        data = json.dumps(session, ensure_ascii=False)
+        with self._lock:
+            self._sessions[user_id] = (data, self._clock() - age)
+
+    def delete_session(self, user_id: int):
+        with self._lock:
+            self._sessions[user_id] = _DELETE
+
+    def save_media_group(self, group, age: float = 0.0, span: float = 0.0):
+        """
+        group -- media_groups.MediaGroup; age — сколько секунд назад пришла
+        последняя часть, span — сколько прошло от первой части до последней.
+        """
+        last_seen = self._clock() - age
+        row = (group.group_id, group.user_id, group.chat_id, group.message_id,
+               json.dumps(group.images), group.caption, last_seen - span, last_seen)
+        with self._lock:
+            self._groups[group.group_id] = row
+
+    def delete_media_group(self, group_id: str):
+        with self._lock:
+            self._groups[group_id] = _DELETE
+
+    @property
+    def pending(self) -> int:
+        return len(self._sessions) + len(self._groups)
+
+    # --- запись на диск ---
+
+    def flush(self) -> int:
+        """Пишет накопленные изменения одной транзакцией; возвращает число строк."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+            groups, self._groups = self._groups, {}
+        if not sessions and not groups:
+            return 0
+        start = time.perf_counter()
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions (user_id, data, touched_at) VALUES (?, ?, ?)",
+                [(user_id, *value) for user_id, value in sessions.items() if value is not _DELETE],
+            )
+            self._conn.executemany(
+                "DELETE FROM sessions WHERE user_id = ?",
+                [(user_id,) for user_id, value in sessions.items() if value is _DELETE],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO media_groups (group_id, user_id, chat_id, message_id, images, caption, "
+                "first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in groups.values() if row is not _DELETE],
+            )
+            self._conn.executemany(
+                "DELETE FROM media_groups WHERE group_id = ?",
+                [(group_id,) for group_id, row in groups.items() if row is _DELETE],
+            )
+        written = len(sessions) + len(groups)
+        self.flushes += 1
+        self.rows_written += written
+        self.last_flush_seconds = time.perf_counter() - start
+        return written
+
+    def _flush_loop(self):
+        while not self._flusher_stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"[SESSION DB] Flush failed: {e}")
+
+    def start_flusher(self) -> threading.Thread:
+        """Фоновый поток, раз в flush_interval секунд сбрасывающий изменения на диск."""
+        if self._flusher is not None and self._flusher.is_alive():
+            return self._flusher
+        self._flusher_stop.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-db-flusher", daemon=True)
+        self._flusher.start()
+        return self._flusher
+
+    def stop_flusher(self):
+        self._flusher_stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+
+    # --- восстановление после перезапуска ---
+
+    def load_sessions(self) -> list[tuple[int, dict, float]]:
+        """(user_id, сессия, сколько секунд назад была активна), от давних к свежим."""
+        now = self._clock()
+        with self._db_lock:
+            rows = self._conn.execute("SELECT user_id, data, touched_at FROM sessions ORDER BY touched_at").fetchall()
+        return [(user_id, json.loads(data), max(now - touched_at, 0.0)) for user_id, data, touched_at in rows]
+
+    def load_media_groups(self) -> list[dict]:
+        """Недособранные альбомы: поля MediaGroup и age — сколько секунд назад пришла последняя часть."""
+        now = self._clock()
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT group_id, user_id, chat_id, message_id, images, caption, first_seen, last_seen "
+                "FROM media_groups ORDER BY first_seen"
+            ).fetchall()
+        return [
+            {"group_id": group_id, "user_id": user_id, "chat_id": chat_id, "message_id": message_id,
+             "images": json.loads(images), "caption": caption, "span": last_seen - first_seen,
+             "age": max(now - last_seen, 0.0)}
+            for group_id, user_id, chat_id, message_id, images, caption, first_seen, last_seen in rows
+        ]
+
+    def close(self):
+        """Останавливает фоновый поток и дописывает всё, что накопилось."""
+        self.stop_flusher()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "last_flush_ms": round(self.last_flush_seconds * 1e3, 2),
+        }
@@ -0,0 +1,234 @@
+"""
+Ограниченное хранилище пользовательских сессий бота.
+
+Сессия — словарь {"images": [file_id, ...], "caption": str}: фото, присланные
+без подписи, ждут текстового описания. Раньше сессии жили в
+defaultdict(dict) бессрочно; теперь у каждой есть TTL от последней
+активности, общее число сессий ограничено (LRU-вытеснение), число фото в
+сессии — тоже, а фоновый поток периодически удаляет истёкшие. Истёкшая
+сессия не отдаётся: старые фото не прикрепятся к новому объявлению.
+С backend (session_db.SessionDatabase) изменения сессий сохраняются и
+восстанавливаются после перезапуска (restore).
+
+    sessions = SessionStore(maxsize=1000, ttl=3600, max_images=20)
+    sessions.start_sweeper(60)
+    sessions.add_image(user_id, file_id)
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionStore:
+    """
+    maxsize    -- сколько сессий держать одновременно (самые давние вытесняются)
+    ttl        -- сколько секунд без активности сессия живёт (None — без ограничения)
+    max_images -- сколько фото хранить в одной сессии (лишние не принимаются)
+    backend    -- куда сохранять изменения (session_db.SessionDatabase) или None
+    Изменять сессии следует через методы хранилища: так обновляется время
+    активности и соблюдаются ограничения.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float | None = 3600, max_images: int = 20, backend=None,
+                 clock=time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_images = max_images
+        self.backend = backend
+        self._clock = clock
+        self._sessions = OrderedDict()  # user_id -> [session, touched_at]
+        self._lock = threading.RLock()
+        self._sweeper = None
+        self._sweeper_stop = threading.Event()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.images_dropped = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id):
+        return self.peek(user_id) is not None
+
+    def _expired(self, touched_at: float, now: float) -> bool:
+        return self.ttl is not None and now - touched_at >= self.ttl
+
+    def _save(self, user_id: int, session: dict):
+        if self.backend is not None:
+            self.backend.save_session(user_id, session)
+
+    def _forget(self, user_id: int):
+        if self.backend is not None:
+            self.backend.delete_session(user_id)
+
+    def _evict_overflow(self):
+        while len(self._sessions) > self.maxsize:
+            evicted_id, _ = self._sessions.popitem(last=False)
+            self._forget(evicted_id)
+            self.evicted += 1
+            logging.info(f"[SESSION] Evicted session of user {evicted_id} (store is full)")
+
+    def peek(self, user_id: int) -> dict | None:
+        """Сессия без продления TTL; None — сессии нет или она истекла."""
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is None:
+                return None
+            if self._expired(entry[1], self._clock()):
+                del self._sessions[user_id]
+                self._forget(user_id)
+                self.expired += 1
+                return None
+            return entry[0]
+
+    def get(self, user_id: int) -> dict:
+        """Сессия пользователя (новая, если её нет или она истекла); продлевает TTL."""
+        with self._lock:
+            now = self._clock()
+            entry = self._sessions.get(user_id)
+            if entry is not None and self._expired(entry[1], now):
+                del self._sessions[user_id]
+                self._forget(user_id)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                # Пустая сессия не сохраняется в backend: сохранять нечего до первого фото или подписи
+                entry = [{"images": []}, now]
+                self._sessions[user_id] = entry
+                self.created += 1
+                self._evict_overflow()
+            else:
+                entry[1] = now
+                self._sessions.move_to_end(user_id)
+            return entry[0]
+
+    def add_image(self, user_id: int, file_id: str) -> bool:
+        """Добавляет фото в сессию; False — фото уже есть или достигнут max_images."""
+        with self._lock:
+            images = self.get(user_id).setdefault("images", [])
+            if file_id in images:
+                return False
+            if len(images) >= self.max_images:
+                self.images_dropped += 1
+                return False
+            images.append(file_id)
+            self._save(user_id, self._sessions[user_id][0])
+            return True
+
+    def images_full(self, user_id: int) -> bool:
+        """В сессии уже max_images фото: следующее add_image не примет."""
+        session = self.peek(user_id)
+        return session is not None and len(session.get("images", ())) >= self.max_images
+
+    def set_caption(self, user_id: int, caption: str) -> dict:
+        with self._lock:
+            session = self.get(user_id)
+            session["caption"] = caption
+            self._save(user_id, session)
+            return session
+
+    def clear(self, user_id: int):
+        """Сессия обработана (или брошена): фото и подпись больше не нужны."""
+        with self._lock:
+            if self._sessions.pop(user_id, None) is not None:
+                self._forget(user_id)
+
+    def consume(self, user_id: int, images: list[str], caption: str = None):
+        """
+        Убирает из сессии то, что ушло в объявление: эти фото и подпись (если
+        она не сменилась). Фото, пришедшие во время разбора, остаются ждать
+        следующего описания; опустевшая сессия удаляется.
+        """
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is None:
+                return
+            session = entry[0]
+            consumed = set(images)
+            session["images"] = [fid for fid in session.get("images", ()) if fid not in consumed]
+            if caption is not None and session.get("caption") == caption:
+                del session["caption"]
+            if session["images"] or "caption" in session:
+                self._save(user_id, session)
+            else:
+                del self._sessions[user_id]
+                self._forget(user_id)
+
+    def restore(self, records) -> int:
+        """
+        Восстанавливает сессии после перезапуска: records — (user_id, сессия,
+        сколько секунд назад была активна), от давних к свежим (SessionDatabase.load_sessions).
+        Истёкшие за время простоя отбрасываются; возвращает число восстановленных.
+        """
+        restored = 0
+        with self._lock:
+            now = self._clock()
+            for user_id, session, age in records:
+                if self._expired(now - age, now):
+                    self._forget(user_id)
+                    self.expired += 1
+                    continue
+                session.setdefault("images", [])
+                self._sessions[user_id] = [session, now - age]
+                self._sessions.move_to_end(user_id)
+                restored += 1
+            self._evict_overflow()
+        return restored
+
+    def sweep(self) -> int:
+        """Удаляет истёкшие сессии; возвращает их число."""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            now = self._clock()
+            # OrderedDict упорядочен по активности: истёкшие — в начале
+            stale = []
+            for user_id, (_, touched_at) in self._sessions.items():
+                if not self._expired(touched_at, now):
+                    break
+                stale.append(user_id)
+            for user_id in stale:
+                del self._sessions[user_id]
+                self._forget(user_id)
+            self.expired += len(stale)
+            return len(stale)
+
+    def _sweep_loop(self, interval: float):
+        while not self._sweeper_stop.wait(interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    logging.info(f"[SESSION] Swept {removed} expired sessions, {len(self)} live")
+            except Exception as e:
+                logging.error(f"[SESSION] Sweep failed: {e}")
+
+    def start_sweeper(self, interval: float = 60.0) -> threading.Thread:
+        """Фоновый поток, раз в interval секунд удаляющий истёкшие сессии."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return self._sweeper
+        self._sweeper_stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,), name="session-sweeper",
+                                         daemon=True)
+        self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "live": len(self._sessions),
+                "images": sum(len(entry[0].get("images", ())) for entry in self._sessions.values()),
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "images_dropped": self.images_dropped,
+            }
@@ -152,9 +152,9 @@ def test_lynk_format():
     # Сначала пробуем прямой парсинг, минуя цепочку
     print("Direct lynk format test:")
     from parser import _try_lynk_format_parse
-    brand_list = []
-    result, failed = _try_lynk_format_parse(test_message, brand_list)
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    from brand_index import get_brand_index
+    result, failed = _try_lynk_format_parse(test_message, get_brand_index())
+    print(json.dumps(result.to_dict(), indent=2, ensure_ascii=False))
     
     # Затем полный парсинг через parse_car_text
     print("\nFull parsing chain test:")
@@ -301,14 +301,15 @@ def test_brand_model_modification_format():
     print("-" * 80)
     
     # Import the function to test from parser module
-    from parser import improved_brand_model_parse, load_brand_list
-    brand_list = load_brand_list()
+    from parser import improved_brand_model_parse
+    from brand_index import get_brand_index
+    brand_index = get_brand_index()
     
     for i, (test_input, expected_brand, expected_model, expected_modification) in enumerate(test_cases, 1):
         print(f"Test case #{i}:")
         print(f"Input: {test_input}")
         
-        brand, model, modifications = improved_brand_model_parse(test_input, brand_list)
+        brand, model, modifications = improved_brand_model_parse(test_input, brand_index)
         
         print(f"Expected: {expected_brand} / {expected_model} / {expected_modification}")
         print(f"Actual  : {brand} / {model} / {modifications}")
@@ -330,6 +331,998 @@ def test_brand_model_modification_format():
     
     print("Brand Model Modification Format testing completed!")
 
+def test_brand_matcher():
+    """
+    Автомат брендов должен выбирать самый длинный вариант, как прежний перебор по длине.
+    """
+    from brand_index import get_brand_index
+    matcher = get_brand_index().matcher
+    cases = [
+        ("li xiang L9 Max", "li xiang"),
+        ("Li 8 Pro", "li"),
+        ("MERCEDES BENZ C CLASS", "mercedes benz"),
+        ("Mercedes-Benz E-Class", "Mercedes-Benz"),
+        ("Продаю авто", None),
+    ]
+    for text, expected in cases:
+        result = matcher.match_prefix(text)
+        print(f"{text!r} -> {result!r}")
+        assert result == expected, f"Expected {expected!r}, got {result!r}"
+
+    # Поиск внутри строки: бренд после эмодзи и русского префикса
+    assert matcher.find("🚗Марка: BMW X5") == ("bmw", 8)
+    # Бренд после латинского текста не считается (начало не позже первой латинской буквы/цифры)
+    assert matcher.find("New BMW X5", max_start=0) is None
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_multi_word_model_names():
+    """
+    Названия моделей из нескольких слов в models.txt распознаются целиком.
+    """
+    from parser import improved_brand_model_parse
+    cases = [
+        ("Toyota Land Cruiser 300 GR Sport", "Toyota", "Land Cruiser", "300 GR Sport"),
+        ("Tesla Model Y Long Range", "Tesla", "Model Y", "Long Range"),
+        ("Volkswagen Tiguan 2.0 TSI 4Motion R-Line", "Volkswagen", "Tiguan", "2.0 TSI 4Motion R-Line"),
+    ]
+    for text, exp_brand, exp_model, exp_mods in cases:
+        brand, model, mods = improved_brand_model_parse(text)
+        print(f"{text!r} -> {brand} / {model} / {mods}")
+        assert (brand, model, mods) == (exp_brand, exp_model, exp_mods)
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_line_classifier():
+    """
+    Классификатор строк помечает строки полями, которые из них можно извлечь.
+    """
+    from line_classifier import classify_lines
+    table = classify_lines("""🔹Geely Coolray
+🔹Год: 10/2020
+🔹Пробег: 35.000km
+🛞Привод: Передний
+💸Цена под ключ в РФ: 1.414.000 руб.""")
+    for line in table.lines:
+        print(f"{line.text!r}: {sorted(line.tags)}")
+    assert table.lines[0].tags == set()
+    assert "year" in table.lines[1].tags
+    assert "mileage" in table.lines[2].tags
+    assert "drive" in table.lines[3].tags
+    assert "price" in table.lines[4].tags
+    line, match = table.first("price_label_currency_i")
+    assert match.group(1).strip() == "1.414.000"
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_format_router():
+    """
+    Роутер форматов выбирает стратегию по внешним признакам сообщения.
+    """
+    from parser import detect_format
+    cases = [
+        ("Марка: Kia Sorento\nГод: 2020", "structured"),
+        ("Lynk&Co 09 MHEV 7 мест\nСтоимость 5.100.000", "lynk"),
+        ("Стоимость – 5 700 000 руб.\n2024 г.в.\n555 лс", "unstructured"),
+        ("🔹Geely Coolray\n🔹Год: 10/2020", "emoji"),
+        ("🔹Lynk & Co 01\nЦена 3 200 000", "lynk"),
+        ("Тестирование парсера для Lynk & Co", "emoji"),
+    ]
+    for text, expected in cases:
+        route = detect_format(text)
+        print(f"{text.splitlines()[0]!r} -> {route}")
+        assert route == expected, f"Expected route '{expected}', got '{route}'"
+
+    data, failed, route = parse_car_text(cases[1][0], return_route=True)
+    assert route == "lynk", f"Expected route 'lynk', got '{route}'"
+    assert data.get("price") == 5100000
+
+    # Упоминание Lynk & Co в середине строки — не заголовок
+    data, failed, route = parse_car_text(cases[-1][0], return_route=True)
+    assert route != "lynk", f"Mid-line Lynk & Co routed to '{route}'"
+    assert data.get("model") != "Тестирование парсера для", f"Got model {data.get('model')!r}"
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_parse_many():
+    """
+    Пакетный парсинг в пуле процессов даёт те же результаты и в том же порядке.
+    """
+    from parser import parse_many
+    texts = [
+        "Li 8 Pro",
+        "Марка: BMW 7 Series (импорт)\nМодель: 735Li M Sport Package",
+        "Стоимость – 5 700 000 руб.\n2024 г.в.\n555 лс",
+        "Volvo XC90 T6 AWD Inscription",
+    ] * 5
+    expected = [parse_car_text(text, return_failures=True) for text in texts]
+    result = list(parse_many(texts, workers=2, chunksize=3))
+    print(f"Parsed {len(result)} messages")
+    assert result == expected
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_benchmark_report():
+    """
+    Бенчмарк собирает отчёт по всем стратегиям и полям на версионированном корпусе.
+    """
+    import json
+    from bench_parser import CORPUS_VERSION, build_corpus, run_benchmark
+    assert build_corpus(5) == build_corpus(5), "Корпус должен быть детерминированным"
+    report = run_benchmark(repeat=1, synthetic=5)
+    print(json.dumps(report["strategies"]["parse_car_text"], indent=2))
+    assert report["corpus"]["version"] == CORPUS_VERSION
+    assert {"parse_car_text", "_try_emoji_format_parse", "_try_lynk_format_parse"} <= set(report["strategies"])
+    assert {"price", "year", "mileage", "engine"} <= set(report["fields"])
+    for entry in report["strategies"].values():
+        assert entry["p50_us"] <= entry["p99_us"] and entry["msgs_per_sec"] > 0
+    json.dumps(report)
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_parse_cache():
+    """
+    Кэш отдаёт копии, различает подписи, отличающиеся только пробелами, и учитывает TTL и размер.
+    """
+    from parse_cache import ParseCache, caption_key
+    from parser import disable_parse_cache, enable_parse_cache, get_parse_cache
+    text = "Марка: Toyota Camry\nМодель: 2.5  Premium\nЦена: 2 500 000 руб"
+    repost = "Марка: Toyota Camry\nМодель: 2.5 Premium\nЦена: 2 500 000 руб"
+    assert caption_key(text, "v1") == caption_key(text, "v1")
+    assert caption_key(text, "v1") != caption_key(repost, "v1"), "Пробелы попадают в поля результата"
+    assert caption_key(text, "v1") != caption_key(text, "v2"), "Ключ должен зависеть от версии словарей"
+
+    uncached = parse_car_text(repost)
+    assert uncached["modification"] == "2.5 Premium"
+    enable_parse_cache(maxsize=8)
+    try:
+        first = parse_car_text(text)
+        first["car_data"] = "mutated"
+        second = parse_car_text(text)
+        assert "car_data" not in second, "Кэш должен отдавать защитную копию"
+        assert parse_car_text(repost) == uncached, "Поля берутся из своей подписи, а не из чужой записи"
+        stats = get_parse_cache().stats()
+        print(stats)
+        assert stats["hits"] == 1 and stats["misses"] == 2
+    finally:
+        disable_parse_cache()
+
+    now = [0.0]
+    cache = ParseCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1, "Вытесняется самая давно использованная запись"
+    now[0] = 11
+    assert cache.get("a") is None and cache.stats()["expirations"] == 1
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_parse_trace():
+    """
+    Трассировка фиксирует этапы, поля и стратегию, а гистограммы копят все вызовы.
+    """
+    from parse_trace import ParseTrace, disable_timing_histograms, enable_timing_histograms
+    text = "🔹Geely Coolray\n🔹Год: 10/2020\n🔹Пробег: 35.000km\n💸Цена под ключ в РФ: 1.414.000 руб."
+    trace = ParseTrace()
+    data = parse_car_text(text, trace=trace)
+    print(trace.to_dict())
+    assert data == parse_car_text(text), "Трассировка не должна менять результат"
+    assert trace.route == "emoji" and trace.predicted == "emoji"
+    assert {"classify_lines", "detect_format", "strategy:emoji"} <= set(trace.stages)
+    assert {"price", "year", "mileage"} <= set(trace.fields)
+    assert trace.total >= sum(trace.stages.values())
+
+    histograms = enable_timing_histograms()
+    try:
+        parse_car_text(text)
+        parse_car_text("Volvo XC90 T6 AWD Inscription")
+        snapshot = histograms.snapshot()
+    finally:
+        disable_timing_histograms()
+    print(snapshot["routes"])
+    assert snapshot["total"]["count"] == 2
+    assert snapshot["stages"]["classify_lines"]["count"] == 2
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_car_listing():
+    """
+    CarListing заполняется парсером напрямую и сериализуется так же, как прежний словарь.
+    """
+    import pickle
+    from car_listing import CarListing
+    text = "🔹Geely Coolray\n🔹Год: 10/2020\n💸Цена под ключ в РФ: 1.414.000 руб."
+    listing, failed = parse_car_text(text, return_failures=True, as_listing=True)
+    print(listing)
+    assert isinstance(listing, CarListing)
+    assert listing.to_dict() == parse_car_text(text)
+    assert listing.brand == "Geely" and listing["year"] == 2020 and "mileage" not in listing
+    assert not hasattr(listing, "__dict__"), "Поля должны храниться в __slots__"
+    assert pickle.loads(pickle.dumps(listing)) == listing
+
+    payload = listing.to_payload(chat_id=1, image_file_ids=["a"])
+    assert payload["chat_id"] == 1 and payload["price"] == 1414000 and "mileage" not in payload
+    try:
+        listing["chat_id"] = 1
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("Неизвестное поле должно давать KeyError")
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_brand_index_reload():
+    """
+    Изменённые словари подхватываются перезагрузкой, индекс подменяется целиком.
+    """
+    import os
+    import shutil
+    import tempfile
+    import brand_index
+    tmp = tempfile.mkdtemp()
+    saved = brand_index.BRANDS_FILE, brand_index.MODELS_FILE, brand_index._brand_index
+    try:
+        brand_index.BRANDS_FILE = shutil.copy(saved[0], tmp)
+        brand_index.MODELS_FILE = shutil.copy(saved[1], tmp)
+        assert brand_index.reload_brand_index(force=True)
+        old = brand_index.get_brand_index()
+        status = brand_index.brand_index_status()
+        assert not brand_index.reload_brand_index(), "Без изменений индекс не пересобирается"
+
+        with open(brand_index.BRANDS_FILE, "a", encoding="utf-8") as f:
+            f.write("\nMersedez = Mercedes-Benz\n")
+        os.utime(brand_index.BRANDS_FILE, ns=(0, os.stat(brand_index.BRANDS_FILE).st_mtime_ns + 10**9))
+        assert brand_index.reload_brand_index()
+        new = brand_index.get_brand_index()
+        new_status = brand_index.brand_index_status()
+        print(new_status)
+        assert new is not old and new.version != old.version
+        assert new_status["generation"] == status["generation"] + 1
+        assert new.canonical("mersedez") == "Mercedes-Benz" and old.canonical("mersedez") == "mersedez"
+    finally:
+        brand_index.BRANDS_FILE, brand_index.MODELS_FILE, brand_index._brand_index = saved
+        shutil.rmtree(tmp)
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_brand_index_snapshot():
+    """
+    Снимок индекса загружается, только если собран из тех же словарей.
+    """
+    import os
+    import tempfile
+    from brand_index import build_brand_index, load_brand_index_snapshot, save_brand_index_snapshot
+    index = build_brand_index()
+    path = os.path.join(tempfile.mkdtemp(), "brand_index.pickle")
+    save_brand_index_snapshot(index, path)
+
+    loaded = load_brand_index_snapshot(path)
+    assert loaded is not None and loaded.version == index.version
+    assert dict(loaded.brand_map) == dict(index.brand_map)
+    assert loaded.matcher.find("продаю toyota camry") == index.matcher.find("продаю toyota camry")
+    text = "Toyota Land Cruiser 300 GR Sport"
+    assert parse_car_text(text, index=loaded) == parse_car_text(text, index=index)
+
+    assert load_brand_index_snapshot(path, version="stale") is None, "Устаревший снимок должен игнорироваться"
+    assert load_brand_index_snapshot(path + ".missing") is None
+    os.remove(path)
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_bulk_cli():
+    """
+    Потоковый разбор JSONL и экспорта Telegram Desktop с продолжением по offset.
+    """
+    import io
+    import json
+    import os
+    import tempfile
+    import parser_cli
+    texts = ["Volvo XC90 T6 AWD Inscription", "", "Toyota Camry 2.5L Prestige Safety", "BMW X5 xDrive30d M Sport"]
+    export = {"name": "Dealer", "messages": [
+        {"id": i, "type": "message", "date": "2025-01-01T00:00:00", "text": [{"type": "bold", "text": t[:5]}, t[5:]]}
+        for i, t in enumerate(texts)
+    ]}
+    jsonl = "".join(json.dumps({"id": i, "date": "2025-01-01T00:00:00", "text": t}, ensure_ascii=False) + "\n" for i, t in enumerate(texts))
+
+    results = []
+    for source in (json.dumps(export, ensure_ascii=False, indent=1), jsonl):
+        out = io.StringIO()
+        assert parser_cli.run(io.StringIO(source), out) == 3, "Сообщения без текста пропускаются"
+        results.append([json.loads(line) for line in out.getvalue().splitlines()])
+    print(results[0][0])
+    assert results[0] == results[1]
+    assert [r["offset"] for r in results[0]] == [0, 2, 3]
+    assert results[0][1]["data"] == parse_car_text(texts[2])
+
+    path = os.path.join(tempfile.mkdtemp(), "parsed.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(results[0][0]) + "\n" + '{"offset": 2, "da')
+    assert parser_cli.last_offset(path) == 0, "Недописанная строка не считается"
+    with open(path, "a", encoding="utf-8") as f:
+        parser_cli.run(io.StringIO(jsonl), f, start=1)
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["offset"] for line in f] == [0, 2, 3]
+    os.remove(path)
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_regex_registry():
+    """
+    Паттерны парсера зарегистрированы по именам; счётчики включаются по требованию.
+    """
+    from regex_registry import (disable_regex_stats, enable_regex_stats, get_pattern,
+                                register, regex_stats)
+    assert get_pattern("structured.brand_model").search("Марка: BMW X5")
+    assert register("structured.brand_model", r"(?:Бренд|Марка):\s*(.+)", re.IGNORECASE) is \
+        get_pattern("structured.brand_model")
+    try:
+        register("structured.brand_model", r"other")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Имя паттерна должно быть уникальным")
+
+    text = "Марка: BMW 4 Series\nМодель: 430i Gran Coupe M Sport Night Edition"
+    expected = parse_car_text(text)
+    assert get_pattern("structured.brand_model").tries == 0, "Без статистики счётчики не растут"
+    enable_regex_stats()
+    try:
+        assert parse_car_text(text) == expected
+        parse_car_text("🔹Geely Coolray\n🔹Год: 10/2020")
+        stats = {row["name"]: row for row in regex_stats()}
+    finally:
+        disable_regex_stats()
+    print(stats["structured.brand_model"])
+    assert stats["structured.brand_model"]["tries"] == 1 and stats["structured.brand_model"]["hits"] == 1
+    assert stats["structured.car_type"]["hits"] == 0
+    assert stats["line.year_label"]["hits"] == 1
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_fuzzy_brand_resolver():
+    """
+    Опечатки и кириллические написания брендов/моделей разрешаются локально.
+    """
+    from brand_index import get_brand_index
+    from parser import improved_brand_model_parse
+    fuzzy = get_brand_index().fuzzy
+    test_cases = [
+        ("Mersedes C200", ("Mercedes-Benz", "C200")),
+        ("Volkswagon Tiguan", ("Volkswagen", "Tiguan")),
+        ("Хавал F7", ("Haval", "F7")),
+        ("Lixiang L9 Max", ("Li Auto", "L9")),
+        ("Lend Rover Defender", ("Land Rover", "Defender")),
+        ("Toyota Camri 2.5", ("Toyota", "Camry")),
+    ]
+    for text, (expected_brand, expected_model) in test_cases:
+        brand, model, modification = improved_brand_model_parse(text)
+        print(f"{text!r} -> {brand!r}, {model!r}, {modification!r}")
+        assert (brand, model) == (expected_brand, expected_model), f"{text}: got {brand!r}, {model!r}"
+
+    assert fuzzy.resolve_brand(["Luxury"]) is None, "Обычные слова не должны становиться брендом"
+    assert fuzzy.resolve_brand(["BMV"]) is None, "Короткие ключи сравниваются только точно"
+    for word in ("Start", "Series", "ли", "max_us"):
+        assert fuzzy.resolve_brand([word]) is None, f"{word!r} не должно становиться брендом"
+    assert improved_brand_model_parse("Mersedes Mercedes-Benz C200")[:2] == ("Mercedes-Benz", "C200"), \
+        "Модель не берётся из слов, называющих сам бренд"
+
+    # Через весь parse_car_text: кириллический бренд без ASCII-слов и обычная фраза
+    result = parse_car_text("Хавал Джолион")
+    assert (result["brand"], result["model"]) == ("Haval", "Джолион"), result
+    result = parse_car_text("Ли time_budget стоит увеличить")
+    assert result["brand"] != "Li Auto" and result["model"] != "time_budget", result
+    result = parse_car_text("🔹Хавал Джолион 1.5T\n🔹Год: 2021\n💸Цена: 1.900.000 руб.")
+    assert result["brand"] == "Haval" and result["year"] == 2021
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_car_catalog():
+    """
+    Локальный справочник марок/моделей: импорт из CSV и ответ в формате API Ninjas.
+    """
+    import os
+    import tempfile
+    from car_catalog import CarCatalog, lookup_car, set_car_catalog
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "cars.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("year,make,model\n"
+                    "2019,Toyota,Camry\n"
+                    "2021,Toyota,Land Cruiser\n"
+                    "2021,Toyota,Land Cruiser Prado\n"
+                    "2018,Nissan,X-Trail\n"
+                    ",Haval,Jolion\n"
+                    "2019,Toyota,Camry\n"
+                    "2008,Mazda,5\n"
+                    "2020,BMW,X5\n")
+        catalog = CarCatalog(os.path.join(tmp, "catalog.sqlite3"))
+        try:
+            assert catalog.import_csv(csv_path) == 7, "Дубликаты не должны импортироваться"
+            test_cases = [
+                ("продаю camry 2.5 2019 года", {"make": "Toyota", "model": "Camry"}),
+                ("Land Cruiser Prado 150", {"make": "Toyota", "model": "Land Cruiser Prado"}),
+                ("Nissan X-Trail полный привод", {"make": "Nissan", "model": "X-Trail"}),
+                ("Jolion 1.5T", {"make": "Haval", "model": "Jolion"}),
+                ("кожаный салон, климат", None),
+                # Короткие и числовые модели — только вместе с маркой или её синонимом
+                ("5 мест, 2019 года", None),
+                ("X5 2020", None),
+                ("BMW X5 2020", {"make": "BMW", "model": "X5"}),
+                ("Mazda 5, 7 мест", {"make": "Mazda", "model": "5"}),
+                ("B.M.W. X5 2020", {"make": "BMW", "model": "X5"}),
+            ]
+            for description, expected in test_cases:
+                result = catalog.lookup(description)
+                print(f"{description!r} -> {result}")
+                assert result == expected, f"{description}: expected {expected}, got {result}"
+
+            set_car_catalog(catalog)
+            assert lookup_car("Camry") == {"make": "Toyota", "model": "Camry"}
+        finally:
+            set_car_catalog(None)
+            catalog.close()
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_async_ninjas_client():
+    """
+    Асинхронный клиент API Ninjas против локальной заглушки: одинаковые
+    одновременные запросы объединяются, темп ограничивается на клиенте.
+    """
+    import asyncio
+    import time
+    from aiohttp import web
+    from api_ninjas import NinjasClient
+    from parser import parse_car_text_async
+
+    async def scenario():
+        queries = []
+
+        async def cars(request):
+            queries.append(request.query["query"])
+            assert request.headers["X-Api-Key"] == "test-token"
+            await asyncio.sleep(0.05)
+            if "camry" in request.query["query"].lower():
+                return web.json_response([{"make": "toyota", "model": "camry", "year": 2019}])
+            if "forbidden" in request.query["query"]:
+                return web.json_response({"error": "forbidden"}, status=403)
+            return web.json_response([])
+
+        app = web.Application()
+        app.router.add_get("/v1/cars", cars)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/v1/cars"
+        try:
+            async with NinjasClient(token="test-token", url=url, rate=20, burst=1) as client:
+                results = await asyncio.gather(*(client.get_car_info(q) for q in
+                                                 ["Camry 2.5", "camry  2.5", "CAMRY 2.5", "Camry 2.5"]))
+                print(f"Coalesced results: {results}, stats: {client.stats()}")
+                assert results == [{"make": "toyota", "model": "camry"}] * 4
+                assert len(queries) == 1, f"Ожидался один запрос, было {len(queries)}"
+                assert client.coalesced == 3
+
+                start = time.monotonic()
+                results = await asyncio.gather(client.get_car_info("unknown 1"), client.get_car_info("unknown 2"),
+                                               client.get_car_info("forbidden"))
+                elapsed = time.monotonic() - start
+                print(f"Rate limited results: {results} in {elapsed:.3f}s")
+                assert results == [None, None, None]
+                assert len(queries) == 4
+                # 20 запросов/с без запаса всплеска: три запроса не быстрее чем за ~0.1 с
+                assert elapsed >= 0.09, f"Rate limit not applied: {elapsed:.3f}s"
+        finally:
+            await runner.cleanup()
+
+        # Асинхронный путь парсинга даёт тот же результат, что и синхронный
+        text = "🔹Geely Coolray\n🔹Год: 10/2020\n🔹Пробег: 35.000km\n💸Цена: 1.414.000 руб."
+        assert await parse_car_text_async(text) == parse_car_text(text)
+
+    asyncio.run(scenario())
+
+    # Открытая сессия привязана к своему loop: из другого — ошибка, а не брошенный коннектор
+    client = NinjasClient(token="test-token")
+
+    async def open_session():
+        client._ensure_session()
+
+    first_loop = asyncio.new_event_loop()
+    try:
+        first_loop.run_until_complete(open_session())
+        try:
+            asyncio.run(client.get_car_info("Camry 2.5"))
+            raise AssertionError("Expected RuntimeError for another event loop")
+        except RuntimeError as e:
+            print(f"Other loop: {e}")
+        first_loop.run_until_complete(client.close())
+    finally:
+        first_loop.close()
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_lookup_cache():
+    """
+    Постоянный кэш ответов API Ninjas: длинный TTL для найденного, короткий
+    для пустых ответов и 400/404; 401/403, 429 и 5xx не кэшируются, данные переживают перезапуск.
+    """
+    import asyncio
+    import os
+    import tempfile
+    from aiohttp import web
+    from api_ninjas import NinjasClient
+    from lookup_cache import LookupCache, disable_lookup_cache, enable_lookup_cache, get_lookup_cache
+
+    now = [1000.0]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lookups.sqlite3")
+        cache = LookupCache(path, ttl=100, negative_ttl=10, clock=lambda: now[0])
+        assert cache.get("Camry 2.5") == (False, None)
+        cache.put("Camry 2.5", {"make": "toyota", "model": "camry"})
+        cache.put("кожаный салон", None)
+        assert cache.get("  camry   2.5 ") == (True, {"make": "toyota", "model": "camry"})
+        assert cache.get("Кожаный салон") == (True, None)
+        now[0] += 50
+        assert cache.get("кожаный салон") == (False, None), "Отрицательный ответ должен истечь раньше"
+        assert cache.get("camry 2.5")[0]
+        stats = cache.stats()
+        print(f"Lookup cache stats: {stats}")
+        assert stats["hits"] == 2 and stats["negative_hits"] == 1 and stats["misses"] == 2
+        assert stats["expirations"] == 1 and stats["hit_ratio"] == 0.6
+        cache.close()
+
+        async def scenario():
+            queries = []
+
+            async def cars(request):
+                query = request.query["query"]
+                queries.append(query)
+                if query == "broken":
+                    return web.json_response({"error": "unavailable"}, status=503)
+                if query == "forbidden":
+                    return web.json_response({"error": "forbidden"}, status=403)
+                if query == "throttled":
+                    return web.json_response({"error": "rate limit"}, status=429)
+                if query == "bad request":
+                    return web.json_response({"error": "invalid query"}, status=400)
+                if query == "nothing":
+                    return web.json_response([])
+                return web.json_response([{"make": "nissan", "model": "x-trail"}])
+
+            app = web.Application()
+            app.router.add_get("/v1/cars", cars)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1/cars"
+            try:
+                async with NinjasClient(token="test-token", url=url, rate=0) as client:
+                    for _ in range(2):
+                        for query in ("X-Trail 2.0", "forbidden", "broken", "throttled", "bad request", "nothing"):
+                            await client.get_car_info(query)
+            finally:
+                await runner.cleanup()
+            return queries
+
+        enable_lookup_cache(path)
+        try:
+            queries = asyncio.run(scenario())
+            print(f"Requests sent: {queries}")
+            # Кэшируются найденное, пустой ответ и 400; 401/403, 429 и 5xx спрашиваются снова
+            assert queries == ["X-Trail 2.0", "forbidden", "broken", "throttled", "bad request", "nothing",
+                               "forbidden", "broken", "throttled"], queries
+            assert get_lookup_cache().get("throttled") == (False, None), "429 не должен попадать в кэш"
+            disable_lookup_cache()
+
+            # После "перезапуска" ответ берётся с диска
+            enable_lookup_cache(path)
+            assert get_lookup_cache().get("x-trail 2.0") == (True, {"make": "nissan", "model": "x-trail"})
+        finally:
+            disable_lookup_cache()
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_parse_executor():
+    """
+    Разбор в пуле потоков/процессов: результат тот же, что у parse_car_text,
+    семафор ограничивает число одновременных разборов, лишние ждут в очереди.
+    """
+    import asyncio
+    from bench_parser import BASE_MESSAGES
+    from parse_executor import ParseExecutor
+    from parser import parse_car_text_async
+
+    texts = list(BASE_MESSAGES)[:6]
+    expected = [parse_car_text(text, return_failures=True) for text in texts]
+
+    async def scenario(executor):
+        ticks = 0
+        done = False
+
+        async def ticker():
+            nonlocal ticks
+            while not done:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        tick_task = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(parse_car_text_async(text, return_failures=True, executor=executor)
+                                         for text in texts))
+        done = True
+        await tick_task
+        return results, ticks
+
+    for kind in ("thread", "process"):
+        executor = ParseExecutor(kind=kind, workers=2, max_in_flight=2)
+        try:
+            results, ticks = asyncio.run(scenario(executor))
+        finally:
+            executor.shutdown()
+        stats = executor.stats()
+        print(f"{kind}: ticks={ticks}, queue={stats['max_queue_depth']}, wait={stats['wait']['p99_us']}us")
+        assert results == expected, f"{kind}: results differ from parse_car_text"
+        assert stats["completed"] == len(texts) and stats["in_flight"] == 0 and stats["queue_depth"] == 0
+        assert stats["max_queue_depth"] >= len(texts) - 2, "Лишние разборы должны ждать семафор"
+        assert stats["wait"]["count"] == len(texts)
+        assert ticks > 0, "Event loop должен работать, пока идёт разбор"
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_parse_limits():
+    """
+    Ограниченный разбор: вход обрезается до лимитов, по дедлайну возвращается
+    частичный результат, враждебные входы укладываются в бюджет времени.
+    """
+    import time
+    from fuzz_parser import run_fuzz
+    from line_classifier import classify_lines
+    from parse_limits import ParseLimits
+    from parser import disable_parse_cache, enable_parse_cache
+
+    limits = ParseLimits(max_chars=100, max_lines=3, max_line_length=10, time_budget=None)
+    clipped = limits.clip("a" * 30 + "\n\n" + "b\nc\nd\ne")
+    assert clipped == "a" * 10 + "\n\nb\nc", f"Unexpected clip: {clipped!r}"
+    assert limits.clip("short\ntext") == "short\ntext"
+    assert len(ParseLimits(max_chars=50).clip("1 " * 1000)) == 50
+
+    text = "🔹Geely Coolray\n🔹Год: 10/2020\n🔹Пробег: 35.000km\n💸Цена: 1.414.000 руб."
+    assert parse_car_text(text, limits=ParseLimits()) == parse_car_text(text)
+
+    cache = enable_parse_cache()
+    try:
+        # Нулевой бюджет: первая стратегия отрабатывает, остальные пропускаются
+        data, failed = parse_car_text("Просто текст без марки\nГод: 2020", return_failures=True,
+                                      limits=ParseLimits(time_budget=0))
+        print(f"Deadline result: {data}, {failed}")
+        assert failed[-1] == "deadline" and data.get("year") is not None
+        assert len(cache) == 0, "Прерванный дедлайном результат не должен кэшироваться"
+    finally:
+        disable_parse_cache()
+
+    # Раньше эти строки разбирались за секунды из-за вложенных квантификаторов
+    for line in ("Двигатель:" + "0" * 500, "Пробег " + "1" * 500 + " x"):
+        start = time.perf_counter()
+        classify_lines(line)
+        assert time.perf_counter() - start < 0.1, f"Slow line: {line[:20]!r}"
+
+    report = run_fuzz(cases=25, seed=1, budget=0.25)
+    print(f"Fuzz worst times: {report['worst_ms']}")
+    assert not report["violations"], report["violations"]
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_message_edits():
+    """
+    Правка подписи: заново классифицируются только изменившиеся строки,
+    на сервер уходит дельта полей.
+    """
+    import asyncio
+    from bench_parser import BASE_MESSAGES
+    from car_listing import CarListing
+    from message_edits import MessageEdits, listing_key
+    from parse_executor import ParseExecutor
+    from parser import parse_car_text_async
+
+    original = list(BASE_MESSAGES)[0]
+    edited = original.replace("1.414.000 руб.", "1.390.000 руб.")
+    total_lines = len([line for line in edited.splitlines() if line.strip()])
+
+    async def scenario(executor):
+        edits = MessageEdits(maxsize=10)
+        listing, failed, table = await parse_car_text_async(original, return_failures=True, as_listing=True,
+                                                            executor=executor, return_table=True)
+        assert table is not None, "Без пула процессов таблица строк должна возвращаться"
+        edits.remember(1, 100, original, listing, table)
+
+        result = await edits.apply_edit(1, 100, edited, executor=executor)
+        print(f"Edit result: {result}")
+        assert result.changes == {"price": 1390000}, f"Unexpected delta: {result.changes}"
+        assert result.changed_lines == 1 and result.reused_lines == total_lines - 1
+        assert result.listing == parse_car_text(edited, as_listing=True)
+
+        # Правка находит объявление по тому же ключу, с которым оно импортировано
+        imported = listing.to_payload(car_data="Geely Coolray", image_file_ids=["a"], **listing_key(1, 100))
+        update = result.update_payload(1, 100)
+        assert {k: imported[k] for k in ("chat_id", "message_id")} == listing_key(1, 100)
+        assert {k: update[k] for k in ("chat_id", "message_id")} == listing_key(1, 100)
+        assert update["changes"] == {"price": 1390000} and "car_data" not in update
+
+        assert await edits.apply_edit(1, 999, edited) is None, "Неизвестное сообщение не обрабатывается"
+        same = await edits.apply_edit(1, 100, edited.replace("\n", "\n\n") + "  ")
+        assert same.changes == {} and same.changed_lines == 0
+        return edits.stats()
+
+    stats = asyncio.run(scenario(None))
+    assert stats == {"messages": 1, "edits": 1, "unchanged": 1, "unknown": 1,
+                     "lines_reused": total_lines - 1, "lines_classified": 1}, stats
+
+    executor = ParseExecutor(kind="thread", workers=2)
+    try:
+        asyncio.run(scenario(executor))
+    finally:
+        executor.shutdown()
+
+    before = CarListing(brand="Geely", model="Coolray", price=1414000, mileage=35000)
+    after = CarListing(brand="Geely", model="Coolray", price=1390000)
+    assert before.diff(after) == {"price": 1390000, "mileage": None}
+    assert before.diff(before) == {}
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_number_lexer():
+    """
+    Лексер чисел: разделители разрядов (включая неразрывные пробелы), единицы,
+    множители и даты; экстракторы берут значения из токенов строк.
+    """
+    from number_lexer import tokenize
+
+    cases = [
+        ("💸Цена под ключ в РФ: 1.414.000 руб.", [("currency", 1414000, "RUB")]),
+        ("Стоимость – 5\u00a0700\u00a0000 руб.", [("currency", 5700000, "RUB")]),
+        ("$25\u202f000", [("currency", 25000, "USD")]),
+        ("Цена: 45 000 €", [("currency", 45000, "EUR")]),
+        ("🔹Пробег: 35.000km", [("km", 35000, "км")]),
+        ("Пробег 35 тыс. км", [("km", 35000, "км")]),
+        ("⚙️ДВС: 1.5Т 177 л.с.", [("number", 1.5, None), ("hp", 177, "л.с.")]),
+        ("Мощность 150 кВт, батарея 40 кВтч", [("kw", 150, "кВт"), ("kwh", 40, "кВт·ч")]),
+        ("🔹Год: 10/2020", [("month_year", 2020, None)]),
+        ("2024 г.в.", [("year", 2024, "г.в.")]),
+        ("Максималка 180 км/ч", [("speed", 180, "км/ч")]),
+    ]
+    for line, expected in cases:
+        tokens = [(t.kind, t.value, t.unit) for t in tokenize(line)]
+        assert tokens == expected, f"{line!r}: {tokens}"
+    assert tokenize("🔹Год: 10/2020")[0].month == 10
+
+    # Валюта берётся у самого числа, а не у примечания в скобках
+    data = parse_car_text("Стоимость 5 700 000 руб ($63 000)\n2024 г.в.\n555 лс")
+    assert data["price"] == 5700000 and data["currency"] == "RUB", data
+    assert data["year"] == 2024 and data["engine"] == "555 л.с."
+
+    data = parse_car_text("🔹Toyota Camry\n🔹Год: 2019/07\n🔹Пробег: 35,5 тыс км\n💸Цена: 2\u00a0500\u00a0000 ₽")
+    assert data["mileage"] == 35500 and data["price"] == 2500000 and data["year"] == 2019, data
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_media_group_aggregator():
+    """
+    Альбом отдаётся один раз, когда части перестали приходить на quiet_interval,
+    а не через фиксированную паузу; опоздавшие части отбрасываются и считаются.
+    """
+    import asyncio
+    import time
+    from media_groups import MediaGroupAggregator
+
+    async def scenario():
+        completed = []
+
+        async def on_complete(group):
+            completed.append((group, time.monotonic()))
+
+        aggregator = MediaGroupAggregator(on_complete, quiet_interval=0.05, max_wait=1.0)
+        aggregator.add("album", 1, "photo1", None, "msg1")
+        await asyncio.sleep(0.02)
+        aggregator.add("album", 1, "photo2", "Toyota Camry\nЦена 2 500 000 руб", "msg2")
+        await asyncio.sleep(0.02)
+        last_part = time.monotonic()
+        aggregator.add("album", 1, "photo3", None, "msg3")
+        aggregator.add("album", 1, "photo3", None, "msg3")  # повтор не дублирует фото
+        assert len(aggregator) == 1 and not completed
+
+        await asyncio.sleep(0.15)
+        assert len(completed) == 1, "Альбом должен отдаваться ровно один раз"
+        group, flushed_at = completed[0]
+        assert group.images == ["photo1", "photo2", "photo3"] and group.message == "msg2"
+        assert group.caption.startswith("Toyota") and group.parts == 4
+        assert flushed_at - last_part < 0.12, "Альбом отдаётся вскоре после тишины, без долгой паузы"
+
+        # Часть после отдачи альбома отбрасывается, а не становится группой без подписи
+        assert aggregator.add("album", 1, "photo4", None, "msg4") is None
+        assert len(aggregator) == 0
+        # Части, которые всё идут, не задерживают альбом дольше max_wait
+        aggregator.max_wait = 0.1
+        start = time.monotonic()
+        while time.monotonic() - start < 0.2:
+            aggregator.add("endless", 2, None, None, "msg")
+            await asyncio.sleep(0.01)
+        await aggregator.flush_all()
+        assert len(aggregator) == 0
+        assert [g.group_id for g, _ in completed].count("album") == 1
+        endless = [g for g, _ in completed if g.group_id == "endless"]
+        assert len(endless) == 1 and endless[0].last_seen - endless[0].first_seen < 0.15
+        late_parts = aggregator.late_parts
+
+        # После late_grace тот же media_group_id снова начинает новый альбом
+        aggregator.late_grace = 0
+        assert aggregator.add("album", 1, "photo5", None, "msg5") is not None
+        await aggregator.flush_all()
+        assert aggregator.late_parts == late_parts
+        return aggregator.stats()
+
+    stats = asyncio.run(scenario())
+    print(f"Album stats: completion p50={stats['completion']['p50_us']}us, late={stats['late_parts']}")
+    assert stats["late_parts"] >= 2 and stats["pending"] == 0
+    assert stats["completion"]["count"] == stats["completed"] and stats["max_part_gap"]["count"] >= 1
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_session_store():
+    """
+    Сессии пользователей: TTL от последней активности, LRU-вытеснение,
+    предел фото в сессии и фоновая очистка истёкших.
+    """
+    import time
+    from session_store import SessionStore
+
+    now = [0.0]
+    store = SessionStore(maxsize=2, ttl=10, max_images=2, clock=lambda: now[0])
+
+    assert store.add_image(1, "a") and not store.add_image(1, "a"), "Повторное фото не добавляется"
+    assert store.add_image(1, "b") and not store.add_image(1, "c"), "Больше max_images фото не принимается"
+    assert store.images_full(1) and store.get(1)["images"] == ["a", "b"]
+    store.set_caption(1, "Toyota Camry")
+
+    # Истёкшая сессия не отдаётся: старые фото не попадут в новое объявление
+    now[0] = 10.0
+    assert store.peek(1) is None and store.get(1) == {"images": []}
+
+    # LRU: обращение к сессии продлевает её, вытесняется самая давняя
+    store.add_image(2, "x")
+    now[0] = 11.0
+    store.get(1)
+    store.add_image(3, "y")
+    assert 2 not in store and 1 in store and 3 in store
+
+    store.clear(1)
+    assert 1 not in store
+    now[0] = 25.0
+    assert store.sweep() == 1 and len(store) == 0
+
+    stats = store.stats()
+    print(f"Session stats: {stats}")
+    assert stats == {"live": 0, "images": 0, "created": 4, "expired": 2, "evicted": 1, "images_dropped": 1}
+
+    # Обработанное объявление забирает только свои фото: пришедшие во время разбора остаются
+    store = SessionStore()
+    store.add_image(1, "a")
+    session = store.set_caption(1, "Toyota Camry")
+    images, caption = list(session["images"]), session["caption"]
+    store.add_image(1, "b")
+    store.consume(1, images, caption)
+    assert store.peek(1) == {"images": ["b"]}
+    store.consume(1, ["b"])
+    assert 1 not in store, "Опустевшая сессия удаляется"
+
+    # Фоновая очистка с настоящими часами
+    store = SessionStore(ttl=0.05)
+    store.add_image(1, "a")
+    store.start_sweeper(0.02)
+    try:
+        deadline = time.monotonic() + 1
+        while len(store) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        store.stop_sweeper()
+    assert len(store) == 0 and store.expired == 1
+    print("Test passed!")
+    print("-" * 50)
+
+
+def test_session_db():
+    """
+    Постоянные сессии и альбомы: изменения пишутся пачкой, после перезапуска
+    сессии восстанавливаются, а недособранные альбомы снова запускают таймеры.
+    """
+    import asyncio
+    import os
+    import tempfile
+    from media_groups import MediaGroupAggregator
+    from session_db import SessionDatabase
+    from session_store import SessionStore
+
+    now = [1000.0]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.sqlite3")
+        db = SessionDatabase(path, clock=lambda: now[0])
+        store = SessionStore(ttl=600, backend=db)
+        for i in range(10):
+            store.add_image(1, f"photo{i}")
+        store.set_caption(2, "Toyota Camry")
+        store.add_image(3, "old")
+        store.clear(2)
+        assert db.pending == 3, "Изменения одной сессии схлопываются до одной записи"
+        assert db.flush() == 3 and db.pending == 0 and db.flushes == 1
+
+        async def collect_album():
+            aggregator = MediaGroupAggregator(on_complete, quiet_interval=60, backend=db)
+            aggregator.add("album", 5, "a1", None, None)
+            aggregator.add("album", 5, "a2", "Kia Sorento\nЦена 2 900 000 ₽", None)
+
+        async def on_complete(group):
+            completed.append(group)
+
+        completed = []
+        asyncio.run(collect_album())  # процесс «упал», не дождавшись таймера альбома
+        db.close()
+        assert not completed
+
+        # Перезапуск через 5 минут: сессия 3 активна 5 минут назад, TTL 10 минут
+        now[0] += 300
+        db = SessionDatabase(path, clock=lambda: now[0])
+        store = SessionStore(ttl=600, backend=db)
+        assert store.restore(db.load_sessions()) == 2
+        assert store.peek(1)["images"] == [f"photo{i}" for i in range(10)] and 2 not in store
+        assert store.restore([(4, {"images": ["x"]}, 700)]) == 0 and 4 not in store, \
+            "Истёкшая за время простоя сессия не восстанавливается"
+
+        async def restore_album():
+            aggregator = MediaGroupAggregator(on_complete, quiet_interval=60, backend=db)
+            assert aggregator.restore(db.load_media_groups()) == 1
+            await asyncio.sleep(0.05)  # тишина дольше quiet_interval уже наступила за время простоя
+            return aggregator.stats()
+
+        stats = asyncio.run(restore_album())
+        assert len(completed) == 1, "Восстановленный альбом должен отдаваться по таймеру"
+        album = completed[0]
+        assert album.images == ["a1", "a2"] and album.caption.startswith("Kia") and album.restored
+        assert stats["restored"] == 1 and stats["completion"]["count"] == 0
+        db.flush()
+        assert db.load_media_groups() == [], "Отданный альбом удаляется из базы"
+        print(f"Session DB stats: {db.stats()}")
+        db.close()
+    print("Test passed!")
+    print("-" * 50)
+
+
 if __name__ == "__main__":
     test_emoji_format()
     test_lynk_format()
@@ -340,3 +1333,27 @@ if __name__ == "__main__":
     test_european_and_chinese_model_extraction()
     test_more_european_model_cases()
     test_brand_model_modification_format()
+    test_brand_matcher()
+    test_multi_word_model_names()
+    test_line_classifier()
+    test_format_router()
+    test_parse_many()
+    test_benchmark_report()
+    test_parse_cache()
+    test_parse_trace()
+    test_car_listing()
+    test_brand_index_reload()
+    test_brand_index_snapshot()
+    test_bulk_cli()
+    test_regex_registry()
+    test_fuzzy_brand_resolver()
+    test_car_catalog()
+    test_async_ninjas_client()
+    test_lookup_cache()
+    test_parse_executor()
+    test_parse_limits()
+    test_message_edits()
+    test_number_lexer()
+    test_media_group_aggregator()
+    test_session_store()
+    test_session_db()
@@ -7,7 +7,7 @@ logging.basicConfig(
     format='[%(levelname)s] %(message)s'
 )
 
-from config import ENDPOINT_URL, API_TIMEOUT
+from config import ENDPOINT_URL, UPDATE_ENDPOINT_URL, API_TIMEOUT
 
 
 async def send_to_api(data: dict, api_token: str):
@@ -15,24 +15,37 @@ async def send_to_api(data: dict, api_token: str):
     Asynchronously sends data to the API endpoint
     Returns the API response
     """
+    return await _post_json(ENDPOINT_URL, data, api_token, "IMPORT")
+
+
+async def send_update_to_api(update: dict, api_token: str):
+    """
+    Sends a field-level update of an already imported listing
+    ({"chat_id", "message_id", "changes": {field: value or None}, ...}).
+    Returns the API response
+    """
+    return await _post_json(UPDATE_ENDPOINT_URL, update, api_token, "UPDATE")
+
+
+async def _post_json(url: str, data: dict, api_token: str, label: str):
     headers = {
         "X-API-TOKEN": api_token,
         "Content-Type": "application/json"
     }
 
-    print(f"[API IMPORT REQUEST] URL: {ENDPOINT_URL}\nPayload: {data}")
-    logging.info(f"[API IMPORT REQUEST] URL: {ENDPOINT_URL}\nPayload: {data}")
+    print(f"[API {label} REQUEST] URL: {url}\nPayload: {data}")
+    logging.info(f"[API {label} REQUEST] URL: {url}\nPayload: {data}")
     
     try:
         async with aiohttp.ClientSession() as session:
             async with session.post(
-                ENDPOINT_URL, 
+                url, 
                 json=data, 
                 headers=headers, 
                 timeout=API_TIMEOUT
             ) as response:
-                print(f"[API IMPORT RESPONSE] Status: {response.status}, Body: {await response.text()}")
-                logging.info(f"[API IMPORT RESPONSE] Status: {response.status}, Body: {await response.text()}")
+                print(f"[API {label} RESPONSE] Status: {response.status}, Body: {await response.text()}")
+                logging.info(f"[API {label} RESPONSE] Status: {response.status}, Body: {await response.text()}")
                 
                 # Create a response object similar to requests for compatibility
                 class AsyncResponse: